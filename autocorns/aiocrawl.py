@@ -0,0 +1,313 @@
+"""
+Asyncio engine for multicall crawls.
+
+Instead of a thread per in-flight multicall, the engine runs every multicall of a crawl as a
+coroutine on a single event loop, and sends them as raw JSON-RPC batch requests over a pooled aiohttp
+session. The number of requests in flight is capped by the engine's concurrency, which can be much
+higher than a sensible number of threads.
+
+The event loop runs in a background thread owned by the engine, so that synchronous code (like the
+crawl functions in multicall.py and the unicorn_* functions in biologist.py) can submit coroutines
+to it and wait on their results like any other future.
+"""
+
+import asyncio
+import collections
+from concurrent.futures import Future
+import itertools
+import sys
+import threading
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import aiohttp
+
+from .jsonrpc import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_TIMEOUT,
+    JSONRPCError,
+    parse_try_aggregate_response,
+    try_aggregate_payload,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY = 16
+
+TryAggregateResult = List[Union[List[Tuple[bool, bytes]], JSONRPCError]]
+
+
+class AsyncEngine:
+    """
+    Sends tryAggregate calls from coroutines running on an event loop in a background thread, with
+    at most `concurrency` HTTP requests in flight at a time. Requests go to endpoint_uris in turn.
+
+    Call close() when done with the engine.
+    """
+
+    def __init__(
+        self,
+        endpoint_uris: Sequence[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> None:
+        assert len(endpoint_uris) > 0, "At least one endpoint is required"
+        assert batch_size >= 1, "Batch size must be at least 1"
+        assert concurrency >= 1, "Concurrency must be at least 1"
+        self.endpoint_uris = list(endpoint_uris)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.next_endpoint = itertools.cycle(self.endpoint_uris)
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        # The session and semaphore belong to the engine's loop, so they are created on it.
+        self.session: aiohttp.ClientSession = self.run(self.open_session())
+        self.semaphore: asyncio.Semaphore = self.run(self.create_semaphore())
+
+    async def open_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            headers={"Content-Type": "application/json"},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def create_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.concurrency)
+
+    def submit(self, coroutine: Awaitable[R]) -> "Future[R]":
+        """
+        Schedules a coroutine on the engine's event loop. Can be called from any thread.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)  # type: ignore
+
+    def run(self, coroutine: Awaitable[R]) -> R:
+        """
+        Runs a coroutine on the engine's event loop and waits for its result.
+        """
+        return self.submit(coroutine).result()
+
+    def close(self) -> None:
+        if not self.loop.is_running():
+            return
+        self.run(self.session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def try_aggregate(
+        self,
+        multicall_address: str,
+        batches: Sequence[Sequence[Tuple[str, Union[str, bytes]]]],
+        block_number: Any = "latest",
+    ) -> TryAggregateResult:
+        """
+        Async version of JSONRPCBatchTransport.try_aggregate.
+        """
+        payload = try_aggregate_payload(multicall_address, batches, block_number)
+        endpoint_uri = next(self.next_endpoint)
+        async with self.semaphore:
+            try:
+                async with self.session.post(endpoint_uri, json=payload) as response:
+                    response.raise_for_status()
+                    response_body = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                raise JSONRPCError(f"JSON-RPC batch request failed: {repr(e)}")
+
+        return parse_try_aggregate_response(response_body, len(batches))
+
+
+def dispatch_async(
+    engine: AsyncEngine,
+    fn: Callable[[T], Awaitable[R]],
+    jobs: Iterable[T],
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Like multicall.dispatch, but runs fn(job) as a coroutine on the engine's event loop. At most
+    max_in_flight (default: the engine's concurrency) jobs are in flight at a time.
+    """
+    if max_in_flight is None:
+        max_in_flight = engine.concurrency
+    assert max_in_flight >= 1, "In-flight limit must be at least 1"
+
+    pending: Deque[Tuple[T, "Future[R]"]] = collections.deque()
+    try:
+        for job in jobs:
+            if len(pending) >= max_in_flight:
+                head_job, head_future = pending.popleft()
+                yield head_job, head_future.result()
+            pending.append((job, engine.submit(fn(job))))
+
+        while pending:
+            head_job, head_future = pending.popleft()
+            yield head_job, head_future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def async_group_caller(
+    engine: AsyncEngine,
+    multicall_address: str,
+    encode: Callable[[Sequence[Any]], List[Tuple[str, Any]]],
+    decode: Callable[[Sequence[Tuple[bool, Any]]], List[Any]],
+    block_number: Any,
+    retry_policy: Any,
+    chunk_sizer: Any,
+    key: str,
+    call_cache: Any,
+) -> Callable[
+    [List[Tuple[int, Sequence[Any]]]], Awaitable[Tuple[List[Any], Dict[int, str]]]
+]:
+    """
+    Returns a coroutine function that crawls a group of (offset, inputs chunk) pairs with a single
+    JSON-RPC batch request, with the same retries and bisection as the threaded crawl in
+    multicall.iter_crawl_calls (see multicall.RetryPolicy). Only calls missing from call_cache are
+    sent.
+    """
+
+    async def run_call_cache(method: Callable[..., R], *args: Any) -> R:
+        """
+        Calls a method of call_cache. A cache that is in use reads from and writes (and syncs) to
+        SQLite, which would hold up every other coroutine on the loop, so it runs in the loop's
+        default executor instead.
+        """
+        if not call_cache.enabled_for(block_number):
+            return method(*args)
+        return await asyncio.get_event_loop().run_in_executor(None, method, *args)
+
+    async def send(batches: List[List[Tuple[str, Any]]]) -> List[Any]:
+        """
+        Sends the uncached calls of the given batches in one request, and returns the full results
+        of each batch (or the error its uncached calls failed with).
+        """
+        lookups, to_send = await run_call_cache(
+            call_cache.prepare, batches, block_number
+        )
+        sent_results: List[Any] = []
+        if to_send:
+            sent_results = await engine.try_aggregate(
+                multicall_address, to_send, block_number
+            )
+        return await run_call_cache(
+            call_cache.complete, batches, block_number, lookups, sent_results
+        )
+
+    async def call_chunk(
+        offset: int, inputs_chunk: Sequence[Any], bisected: bool = False
+    ) -> Tuple[List[Any], Dict[int, str]]:
+        attempts = retry_policy.attempts
+        if bisected and len(inputs_chunk) > 1:
+            attempts = 1
+
+        error: Optional[ValueError] = None
+        for attempt in range(attempts):
+            if attempt > 0:
+                retry_policy.spend(str(error))
+                await asyncio.sleep(retry_policy.delay(attempt - 1))
+
+            started_at = time.monotonic()
+            try:
+                multicall_result = (await send([encode(inputs_chunk)]))[0]
+                if isinstance(multicall_result, Exception):
+                    raise multicall_result
+                chunk_results = decode(multicall_result)
+            except ValueError as e:
+                error = e
+                if chunk_sizer is not None and not bisected and attempt == 0:
+                    chunk_sizer.failure(key, len(inputs_chunk))
+                continue
+
+            if chunk_sizer is not None and not bisected:
+                chunk_sizer.success(
+                    key, len(inputs_chunk), time.monotonic() - started_at
+                )
+            return chunk_results, {}
+
+        if len(inputs_chunk) == 1:
+            print(
+                f"Giving up on input {inputs_chunk[0]}: {str(error)}", file=sys.stderr
+            )
+            return [None], {offset: str(error)}
+
+        retry_policy.spend(str(error))
+        middle = len(inputs_chunk) // 2
+        (left_results, left_failures), (
+            right_results,
+            right_failures,
+        ) = await asyncio.gather(
+            call_chunk(offset, inputs_chunk[:middle], bisected=True),
+            call_chunk(offset + middle, inputs_chunk[middle:], bisected=True),
+        )
+        return left_results + right_results, {**left_failures, **right_failures}
+
+    async def call_group(
+        group: List[Tuple[int, Sequence[Any]]],
+    ) -> Tuple[List[Any], Dict[int, str]]:
+        if len(group) == 1:
+            offset, inputs_chunk = group[0]
+            return await call_chunk(offset, inputs_chunk)
+
+        started_at = time.monotonic()
+        batch_results: List[Union[Sequence[Tuple[bool, Any]], Exception, None]]
+        try:
+            batch_results = list(
+                await send([encode(inputs_chunk) for _, inputs_chunk in group])
+            )
+        except ValueError:
+            batch_results = [None] * len(group)
+        # The chunks of a group share one round trip, so each is credited with its share of it.
+        latency_per_call = (time.monotonic() - started_at) / sum(
+            len(inputs_chunk) for _, inputs_chunk in group
+        )
+
+        async def finish_chunk(
+            offset: int,
+            inputs_chunk: Sequence[Any],
+            multicall_result: Union[Sequence[Tuple[bool, Any]], Exception, None],
+        ) -> Tuple[List[Any], Dict[int, str]]:
+            if multicall_result is None or isinstance(multicall_result, Exception):
+                # Chunks whose eth_calls failed go through the usual retries on their own.
+                return await call_chunk(offset, inputs_chunk)
+            if chunk_sizer is not None:
+                chunk_sizer.success(
+                    key, len(inputs_chunk), latency_per_call * len(inputs_chunk)
+                )
+            return decode(multicall_result), {}
+
+        chunk_outcomes = await asyncio.gather(
+            *[
+                finish_chunk(offset, inputs_chunk, multicall_result)
+                for (offset, inputs_chunk), multicall_result in zip(
+                    group, batch_results
+                )
+            ]
+        )
+
+        group_results: List[Any] = []
+        group_failures: Dict[int, str] = {}
+        for chunk_results, chunk_failures in chunk_outcomes:
+            group_results.extend(chunk_results)
+            group_failures.update(chunk_failures)
+        return group_results, group_failures
+
+    return call_group
@@ -0,0 +1,236 @@
+"""
+Benchmarks for the hot paths of autocorns crawls. These run offline, on synthetic data.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from brownie.network.contract import ContractCall
+
+from . import jsonl
+from .decoders import fast_decoder, fast_encoder
+from .StatsFacet import get_abi_json
+from .multicall import decode_multicall_result
+from .binsnapshot import STATS_ORDER
+
+DECODER_BENCHMARK_METHODS = [
+    ("MetadataFacet", "getDNA"),
+    ("StatsFacet", "getStats"),
+    ("StatsFacet", "getUnicornBodyParts"),
+    ("StatsFacet", "getUnicornMetadata"),
+]
+
+# Address is irrelevant to encoding and decoding, but brownie requires one.
+DUMMY_ADDRESS = "0xdC0479CC5BbA033B3e7De9F178607150B3AbCe1f"
+
+
+def offline_contract_method(abi_name: str, method_name: str) -> ContractCall:
+    """
+    Builds a brownie contract method from the ABIs in the build directory without connecting to a
+    network.
+    """
+    abi = [
+        item
+        for item in get_abi_json(abi_name)
+        if item.get("type") == "function" and item.get("name") == method_name
+    ][0]
+    return ContractCall(DUMMY_ADDRESS, abi, f"{abi_name}.{method_name}", None)
+
+
+def random_word(abi_type: str) -> bytes:
+    if abi_type == "bool":
+        return random.randint(0, 1).to_bytes(32, "big")
+    bits = int(abi_type[len("uint") :] or 256) if abi_type.startswith("uint") else 255
+    return random.getrandbits(bits).to_bytes(32, "big")
+
+
+def synthetic_multicall_result(
+    brownie_contract_method: ContractCall, num_calls: int
+) -> List[Tuple[bool, bytes]]:
+    output_types = [output["type"] for output in brownie_contract_method.abi["outputs"]]
+    return [
+        (True, b"".join(random_word(output_type) for output_type in output_types))
+        for _ in range(num_calls)
+    ]
+
+
+def best_time(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started_at)
+    return best, result
+
+
+def synthetic_snapshot_item(token_id: int) -> Dict[str, Any]:
+    """
+    An item shaped like the merged snapshot items the biologist command writes.
+    """
+    item: Dict[str, Any] = {
+        "token_id": token_id,
+        "dna": str(random.getrandbits(256)),
+        "metadata_block_number": 40000000 + token_id,
+        "mythic_body_parts_block_number": 40000000 + token_id,
+        "lifecycle_stage": random.randint(0, 2),
+        "class_number": random.randint(0, 8),
+        "class_name": "Heart",
+        "num_mythic_body_parts": random.randint(0, 6),
+    }
+    for name in STATS_ORDER:
+        item[name] = random.randint(0, 1000)
+    return item
+
+
+def stdlib_write_jsonl(items: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w") as ofp:
+        for item in items:
+            print(json.dumps(item), file=ofp)
+
+
+def stdlib_read_jsonl(path: str) -> List[Dict[str, Any]]:
+    items: List[Dict[str, Any]] = []
+    with open(path, "r") as ifp:
+        for line in ifp:
+            if line.strip():
+                items.append(json.loads(line))
+    return items
+
+
+def fast_write_jsonl(items: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w") as ofp:
+        jsonl.write_jsonl(items, ofp)
+
+
+def handle_jsonl(args: argparse.Namespace) -> None:
+    items = [synthetic_snapshot_item(token_id) for token_id in range(args.num_items)]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stdlib_path = os.path.join(temp_dir, "stdlib.json")
+        fast_path = os.path.join(temp_dir, "fast.json")
+
+        stdlib_write_seconds, _ = best_time(
+            lambda: stdlib_write_jsonl(items, stdlib_path), args.repeat
+        )
+        fast_write_seconds, _ = best_time(
+            lambda: fast_write_jsonl(items, fast_path), args.repeat
+        )
+        stdlib_read_seconds, stdlib_items = best_time(
+            lambda: stdlib_read_jsonl(stdlib_path), args.repeat
+        )
+        fast_read_seconds, fast_items = best_time(
+            lambda: jsonl.read_jsonl(fast_path), args.repeat
+        )
+        assert stdlib_items == items, "Standard library codec did not round trip"
+        assert fast_items == items, f"{jsonl.CODEC} codec did not round trip"
+        file_size = os.path.getsize(fast_path)
+
+    report: Dict[str, Any] = {
+        "codec": jsonl.CODEC,
+        "num_items": args.num_items,
+        "file_size": file_size,
+        "stdlib_write_seconds": stdlib_write_seconds,
+        "fast_write_seconds": fast_write_seconds,
+        "write_speedup": stdlib_write_seconds / fast_write_seconds,
+        "stdlib_read_seconds": stdlib_read_seconds,
+        "fast_read_seconds": fast_read_seconds,
+        "read_speedup": stdlib_read_seconds / fast_read_seconds,
+    }
+    print(json.dumps(report))
+
+
+def handle_decoder(args: argparse.Namespace) -> None:
+    for abi_name, method_name in DECODER_BENCHMARK_METHODS:
+        method = offline_contract_method(abi_name, method_name)
+        multicall_result = synthetic_multicall_result(method, args.num_calls)
+        inputs = [random.getrandbits(256) for _ in range(args.num_calls)]
+
+        generic_decode_seconds, generic_outputs = best_time(
+            lambda: [method.decode_output(data) for _, data in multicall_result],
+            args.repeat,
+        )
+        fast_decode_seconds, fast_outputs = best_time(
+            lambda: decode_multicall_result(method, multicall_result), args.repeat
+        )
+        assert [tuple(output) if isinstance(output, tuple) else output for output in generic_outputs] == fast_outputs, f"Decoders disagree on {abi_name}.{method_name}"  # type: ignore
+
+        encoder = fast_encoder(method)
+        generic_encode_seconds, generic_calldata = best_time(
+            lambda: [method.encode_input(input) for input in inputs], args.repeat
+        )
+        fast_encode_seconds, fast_calldata = best_time(
+            lambda: [encoder.encode(input) for input in inputs], args.repeat  # type: ignore
+        )
+        assert [bytes.fromhex(calldata[2:]) for calldata in generic_calldata] == fast_calldata, f"Encoders disagree on {abi_name}.{method_name}"  # type: ignore
+
+        report: Dict[str, Any] = {
+            "method": f"{abi_name}.{method_name}",
+            "num_calls": args.num_calls,
+            "fast_path": fast_decoder(method) is not None,
+            "generic_decode_seconds": generic_decode_seconds,
+            "fast_decode_seconds": fast_decode_seconds,
+            "decode_speedup": generic_decode_seconds / fast_decode_seconds,
+            "generic_encode_seconds": generic_encode_seconds,
+            "fast_encode_seconds": fast_encode_seconds,
+            "encode_speedup": generic_encode_seconds / fast_encode_seconds,
+        }
+        print(json.dumps(report))
+
+
+def generate_cli() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for autocorns crawl internals"
+    )
+    parser.set_defaults(func=lambda _: parser.print_help())
+    subparsers = parser.add_subparsers()
+
+    decoder_parser = subparsers.add_parser(
+        "decoder",
+        description="Compares brownie's generic ABI codec with the fixed-layout codec used for multicall crawls",
+    )
+    decoder_parser.add_argument(
+        "-n",
+        "--num-calls",
+        type=int,
+        default=10000,
+        help="Number of calls to encode and decode per method (default: 10000)",
+    )
+    decoder_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of times to repeat each measurement; the best time is reported (default: 3)",
+    )
+    decoder_parser.set_defaults(func=handle_decoder)
+
+    jsonl_parser = subparsers.add_parser(
+        "jsonl",
+        description="Compares line by line JSON lines I/O through the json module with the codec used for snapshots and checkpoints",
+    )
+    jsonl_parser.add_argument(
+        "-n",
+        "--num-items",
+        type=int,
+        default=100000,
+        help="Number of items in the synthetic snapshot (default: 100000)",
+    )
+    jsonl_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of times to repeat each measurement; the best time is reported (default: 3)",
+    )
+    jsonl_parser.set_defaults(func=handle_jsonl)
+
+    return parser
+
+
+if __name__ == "__main__":
+    parser = generate_cli()
+    args = parser.parse_args()
+    args.func(args)
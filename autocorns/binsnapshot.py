@@ -0,0 +1,384 @@
+"""
+Binary snapshot format.
+
+A snapshot in JSON lines files costs a dictionary per unicorn per file, and a json.loads per line,
+to load. A binary snapshot stores the same data in fixed-width columns indexed by token ID, which
+are memory mapped and read through NumPy views, so only the rows that are used are ever read.
+
+Layout (all integers little endian):
+
+- A HEADER_SIZE byte header: MAGIC, the format version, the first token ID, the number of rows and
+  the block number of the snapshot (the latest block number of its items), followed by padding.
+- One column per entry of COLUMNS, in order, each starting at a multiple of COLUMN_ALIGNMENT
+  bytes. Row i of every column holds the data for token first_token_id + i.
+
+The flags column records which parts of the snapshot (DNA, metadata, mythic body parts, stats)
+each row has data for, and the block_numbers column the block number of the item of each part, in
+the order of PART_FLAGS (items from checkpointed crawls were crawled at different blocks). DNAs
+are stored as four 64-bit words, least significant word first (the layout of
+dnadecoder.dna_words). Values that do not fit their columns are rejected when the snapshot is
+written.
+
+Binary snapshots are recognized by their first bytes, so commands that read snapshot parts accept
+either a JSON lines file or a binary snapshot.
+"""
+
+import collections.abc
+import mmap
+import os
+import struct
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from .dnadecoder import dna_words, STATS_ORDER
+
+MAGIC = b"ACSNAP\x00\x00"
+VERSION = 2
+HEADER = struct.Struct("<8sIQQQ")
+HEADER_SIZE = 64
+COLUMN_ALIGNMENT = 8
+
+# (name, dtype, shape of each row)
+COLUMNS: List[Tuple[str, str, Tuple[int, ...]]] = [
+    ("flags", "u1", ()),
+    ("dna", "<u8", (4,)),
+    ("lifecycle_stage", "u1", ()),
+    ("class_number", "u1", ()),
+    ("num_mythic_body_parts", "u1", ()),
+    ("stats", "<u2", (len(STATS_ORDER),)),
+    ("block_numbers", "<u8", (4,)),
+]
+
+PART_FLAGS = {
+    "dnas": 1,
+    "metadata": 2,
+    "mythic_body_parts": 4,
+    "stats": 8,
+}
+COLUMN_DTYPES = {name: np.dtype(dtype) for name, dtype, _ in COLUMNS}
+# Position of each part in the rows of the block_numbers column.
+PART_INDEXES = {part: index for index, part in enumerate(PART_FLAGS)}
+
+
+def is_binary_snapshot(path: str) -> bool:
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as ifp:
+        return ifp.read(len(MAGIC)) == MAGIC
+
+
+def column_layout(num_rows: int) -> Dict[str, Tuple[int, np.dtype, Tuple[int, ...]]]:
+    """
+    Maps each column to its offset in the file, its dtype and the shape of its rows.
+    """
+    layout: Dict[str, Tuple[int, np.dtype, Tuple[int, ...]]] = {}
+    offset = HEADER_SIZE
+    for name, dtype, shape in COLUMNS:
+        column_dtype = np.dtype(dtype)
+        layout[name] = (offset, column_dtype, shape)
+        size = num_rows * column_dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        offset += -(-size // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+    return layout
+
+
+def check_column_values(name: str, values: Iterable[Any]) -> None:
+    """
+    Checks that values fit in the dtype of a column, which NumPy would otherwise wrap around.
+    """
+    info = np.iinfo(COLUMN_DTYPES[name])
+    for value in values:
+        assert (
+            info.min <= int(value) <= info.max
+        ), f"Value {value} does not fit in the {name} column (must be between {info.min} and {info.max})"
+
+
+def write_binary_snapshot(
+    path: str,
+    dnas: Sequence[Dict[str, Any]],
+    metadata: Sequence[Dict[str, Any]],
+    mythic_body_parts: Sequence[Dict[str, Any]],
+    stats: Sequence[Dict[str, Any]],
+    block_number: Optional[int] = None,
+) -> int:
+    """
+    Writes the parts of a snapshot (lists of items in the formats of the biologist's dnas,
+    metadata, mythic-body-parts and stats commands) to a binary snapshot at path. The file is
+    written next to path and then moved into place.
+
+    The block number of each item is stored with it. block_number, the block number of the
+    snapshot, defaults to the latest block number of the items. Returns the number of rows.
+    """
+    parts = {
+        "dnas": dnas,
+        "metadata": metadata,
+        "mythic_body_parts": mythic_body_parts,
+        "stats": stats,
+    }
+    token_ids = [int(item["token_id"]) for items in parts.values() for item in items]
+    first_token_id = min(token_ids, default=0)
+    num_rows = max(token_ids, default=-1) - first_token_id + 1
+    if block_number is None:
+        block_number = max(
+            (
+                int(item.get("block_number", 0))
+                for items in parts.values()
+                for item in items
+            ),
+            default=0,
+        )
+
+    columns = {
+        name: np.zeros((num_rows, *shape), dtype=dtype)
+        for name, dtype, shape in COLUMNS
+    }
+
+    def rows(items: Sequence[Dict[str, Any]]) -> np.ndarray:
+        return np.array(
+            [int(item["token_id"]) - first_token_id for item in items], dtype=np.int64
+        )
+
+    def add_part(part: str, items: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """
+        Flags the rows of the items as having data for the part and records their block numbers.
+        Returns the rows.
+        """
+        part_rows = rows(items)
+        columns["flags"][part_rows] |= PART_FLAGS[part]
+        block_numbers = [int(item.get("block_number", 0)) for item in items]
+        check_column_values("block_numbers", block_numbers)
+        columns["block_numbers"][part_rows, PART_INDEXES[part]] = block_numbers
+        return part_rows
+
+    present_dnas = [
+        item for item in dnas if item.get("dna") is not None and item["dna"] != "None"
+    ]
+    dna_rows = add_part("dnas", present_dnas)
+    if present_dnas:
+        columns["dna"][dna_rows] = dna_words([item["dna"] for item in present_dnas])
+
+    metadata_rows = add_part("metadata", metadata)
+    for name in ["lifecycle_stage", "class_number"]:
+        values = [item[name] for item in metadata]
+        check_column_values(name, values)
+        columns[name][metadata_rows] = values
+
+    present_mythic_body_parts = [
+        item
+        for item in mythic_body_parts
+        if item.get("num_mythic_body_parts") is not None
+    ]
+    mythic_body_parts_rows = add_part("mythic_body_parts", present_mythic_body_parts)
+    values = [item["num_mythic_body_parts"] for item in present_mythic_body_parts]
+    check_column_values("num_mythic_body_parts", values)
+    columns["num_mythic_body_parts"][mythic_body_parts_rows] = values
+
+    stats_rows = add_part("stats", stats)
+    if stats:
+        values = [[item[stat_name] for stat_name in STATS_ORDER] for item in stats]
+        check_column_values("stats", (value for row in values for value in row))
+        columns["stats"][stats_rows] = values
+
+    layout = column_layout(num_rows)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as ofp:
+        header = HEADER.pack(MAGIC, VERSION, first_token_id, num_rows, block_number)
+        ofp.write(header.ljust(HEADER_SIZE, b"\x00"))
+        for name, _, _ in COLUMNS:
+            offset, _, _ = layout[name]
+            ofp.write(b"\x00" * (offset - ofp.tell()))
+            ofp.write(columns[name].tobytes())
+        ofp.flush()
+        os.fsync(ofp.fileno())
+    os.replace(temporary_path, path)
+    return num_rows
+
+
+class BinarySnapshot:
+    """
+    A memory mapped binary snapshot. Each column is available as a NumPy array attribute of the
+    same name (flags, dna, lifecycle_stage, class_number, num_mythic_body_parts, stats,
+    block_numbers), with row token_id - first_token_id for each token.
+
+    The arrays are views of the mapped file, so they must not be used after the snapshot is closed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as ifp:
+            self.mmap = mmap.mmap(ifp.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            self.version,
+            self.first_token_id,
+            self.num_rows,
+            self.block_number,
+        ) = HEADER.unpack_from(self.mmap, 0)
+        assert magic == MAGIC, f"Not a binary snapshot: {path}"
+        assert (
+            self.version == VERSION
+        ), f"Unsupported binary snapshot version {self.version} (pack it again): {path}"
+
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, (offset, dtype, shape) in column_layout(self.num_rows).items():
+            count = self.num_rows * int(np.prod(shape, dtype=np.int64))
+            column = np.frombuffer(self.mmap, dtype=dtype, count=count, offset=offset)
+            self.columns[name] = column.reshape((self.num_rows, *shape))
+        self.flags = self.columns["flags"]
+        self.dna = self.columns["dna"]
+        self.lifecycle_stage = self.columns["lifecycle_stage"]
+        self.class_number = self.columns["class_number"]
+        self.num_mythic_body_parts = self.columns["num_mythic_body_parts"]
+        self.stats = self.columns["stats"]
+        self.block_numbers = self.columns["block_numbers"]
+
+    def row(self, token_id: Any, part: str) -> Optional[int]:
+        """
+        Row of the given token, or None if the snapshot has no data for it in the given part.
+        """
+        row = int(token_id) - self.first_token_id
+        if row < 0 or row >= self.num_rows:
+            return None
+        if not self.flags[row] & PART_FLAGS[part]:
+            return None
+        return row
+
+    def part_rows(self, part: str) -> np.ndarray:
+        return np.flatnonzero(self.flags & PART_FLAGS[part])
+
+    def items(
+        self, part: str, rows: Optional[Sequence[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Items of a part of the snapshot, in the format of the biologist command that crawls it, for
+        the given rows (by default, every row with data for that part).
+        """
+        if rows is None:
+            rows = self.part_rows(part)
+        rows = np.asarray(rows, dtype=np.int64)
+        token_ids = (rows + self.first_token_id).tolist()
+        block_numbers = self.block_numbers[rows, PART_INDEXES[part]].tolist()
+
+        if part == "metadata":
+            return [
+                {
+                    "token_id": token_id,
+                    "block_number": block_number,
+                    "lifecycle_stage": lifecycle_stage,
+                    "class_number": class_number,
+                }
+                for token_id, block_number, lifecycle_stage, class_number in zip(
+                    token_ids,
+                    block_numbers,
+                    self.lifecycle_stage[rows].tolist(),
+                    self.class_number[rows].tolist(),
+                )
+            ]
+
+        dna_bytes = self.dna[rows].tobytes()
+        items = [
+            {
+                "token_id": token_id,
+                "block_number": block_number,
+                "dna": str(int.from_bytes(dna_bytes[32 * i : 32 * (i + 1)], "little")),
+            }
+            for i, (token_id, block_number) in enumerate(zip(token_ids, block_numbers))
+        ]
+        if part == "mythic_body_parts":
+            for item, num_mythic_body_parts in zip(
+                items, self.num_mythic_body_parts[rows].tolist()
+            ):
+                item["num_mythic_body_parts"] = num_mythic_body_parts
+        elif part == "stats":
+            for item, token_stats in zip(items, self.stats[rows].tolist()):
+                item.update(zip(STATS_ORDER, token_stats))
+                item["sum_stats"] = sum(token_stats)
+        else:
+            assert part == "dnas", f"Unknown snapshot part: {part}"
+        return items
+
+    def item(self, part: str, token_id: Any) -> Optional[Dict[str, Any]]:
+        row = self.row(token_id, part)
+        if row is None:
+            return None
+
+        # Same items as items(part, [row]), without the overhead of NumPy fancy indexing.
+        item: Dict[str, Any] = {
+            "token_id": row + self.first_token_id,
+            "block_number": int(self.block_numbers[row, PART_INDEXES[part]]),
+        }
+        if part == "metadata":
+            item["lifecycle_stage"] = int(self.lifecycle_stage[row])
+            item["class_number"] = int(self.class_number[row])
+            return item
+
+        item["dna"] = str(int.from_bytes(self.dna[row].tobytes(), "little"))
+        if part == "mythic_body_parts":
+            item["num_mythic_body_parts"] = int(self.num_mythic_body_parts[row])
+        elif part == "stats":
+            token_stats = self.stats[row].tolist()
+            item.update(zip(STATS_ORDER, token_stats))
+            item["sum_stats"] = sum(token_stats)
+        return item
+
+    def close(self) -> None:
+        self.columns = {}
+        del self.flags, self.dna, self.lifecycle_stage, self.class_number
+        del self.num_mythic_body_parts, self.stats, self.block_numbers
+        self.mmap.close()
+
+
+class BinarySnapshotIndex(collections.abc.Mapping):
+    """
+    Read-only mapping from token IDs (converted to keys by key, e.g. str or int) to the items of a
+    part of a binary snapshot. Items are built when they are looked up, so it can stand in for a
+    dictionary of all the items of a JSON lines file without loading them.
+    """
+
+    def __init__(
+        self, snapshot: BinarySnapshot, part: str, key: Callable[[int], Any] = int
+    ) -> None:
+        assert part in PART_FLAGS, f"Unknown snapshot part: {part}"
+        self.snapshot = snapshot
+        self.part = part
+        self.key = key
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        try:
+            item = self.snapshot.item(self.part, key)
+        except ValueError:
+            raise KeyError(key)
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def __iter__(self) -> Iterator[Any]:
+        for row in self.snapshot.part_rows(self.part).tolist():
+            yield self.key(row + self.snapshot.first_token_id)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.snapshot.flags & PART_FLAGS[self.part]))
+
+    def __contains__(self, key: Any) -> bool:
+        try:
+            return self.snapshot.row(key, self.part) is not None
+        except ValueError:
+            return False
+
+    # Iterating over all the items of a part builds them in bulk, which is much faster than looking
+    # them up one by one.
+    def values(self) -> List[Dict[str, Any]]:  # type: ignore
+        return self.snapshot.items(self.part)
+
+    def items(self) -> List[Tuple[Any, Dict[str, Any]]]:  # type: ignore
+        return [(self.key(item["token_id"]), item) for item in self.values()]
@@ -1,12 +1,27 @@
 import argparse
+import asyncio
+import collections
+import collections.abc
 import csv
-import datetime
-import json
 import os
 import random
 import sys
 import time
-from typing import Any, cast, Dict, List, Optional, Set, Tuple
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+)
 import uuid
 
 
@@ -15,10 +30,84 @@ from brownie.network import chain
 import requests
 from tqdm import tqdm
 
+from . import DNAMigrationFacet
 from . import ERC721WithDiamondStorage
 from . import MetadataFacet
 from . import Multicall2
 from . import StatsFacet
+from .binsnapshot import (
+    BinarySnapshot,
+    BinarySnapshotIndex,
+    is_binary_snapshot,
+    STATS_ORDER,
+    write_binary_snapshot,
+)
+from .checkpoints import (
+    Checkpoint,
+    CheckpointStore,
+    index_checkpoint,
+    JSONLCheckpoint,
+    open_checkpoint,
+)
+from .dnacache import (
+    add_dna_cache_arguments,
+    dna_cache_from_args,
+    DNACache,
+    memoized,
+)
+from .dnadecoder import DNADecoder, fetch_decoder_tables, verify_decoder
+from .eventwindows import (
+    add_window_arguments,
+    fetch_windows,
+    time_windows,
+    WindowCache,
+    write_merged_results,
+)
+from .jsonl import (
+    dump,
+    iter_json_array,
+    iter_jsonl,
+    load,
+    loads,
+    print_json,
+    read_jsonl,
+    write_jsonl,
+)
+from .logscan import (
+    add_incremental_arguments,
+    DEFAULT_LOG_RANGE,
+    changed_tokens,
+    checkpoint_start_block,
+    expire_changed_checkpoint_data,
+)
+from .moonstream import (
+    DEFAULT_MAX_INTERVAL,
+    INITIAL_INTERVAL,
+    MoonstreamClient,
+    run,
+)
+from .multicall import (
+    add_multicall_arguments,
+    iter_crawl_fused_multicall,
+    iter_crawl_multicall,
+    MULTICALL2_ADDRESS,
+    multicall_settings_from_args,
+    MulticallSettings,
+    prefetch,
+)
+from .refresh import (
+    add_refresh_arguments,
+    iter_scheduled,
+    lifecycle_stages,
+    refresh_budgeted,
+    RefreshSchedule,
+    schedule_refresh,
+)
+from .tokenbitmap import (
+    add_token_bitmap_arguments,
+    load_token_bitmap,
+    updated_token_bitmap,
+)
 from eth_typing.evm import ChecksumAddress
 
 
@@ -27,25 +116,42 @@ CALL_CHUNK_SIZE = 500
 # us close to 24 hours of freshness in a checkpoint:
 # (3600/2.3)*24 is 37565.2173913.
 BLOCK_STALENESS_THRESHOLD = 37565
+DEFAULT_PIPELINE_BUFFER = 10000
 
+SNAPSHOT_FILES = {
+    "dnas": "dnas.json",
+    "metadata": "metadata.json",
+    "mythic_body_parts": "mythic-body-parts.json",
+    "stats": "stats.json",
+}
+SNAPSHOT_STORE_FILE = "snapshot.sqlite"
 
-Multicall2_address = "0xc8E51042792d7405184DfCa245F2d27B94D013b6"
+
+Multicall2_address = MULTICALL2_ADDRESS
+
+HIDDEN_CLASSES = {1, 5, 8}
 
 
 def load_checkpoint_data(checkpoint_file: Optional[str]) -> List[Dict[str, Any]]:
-    checkpoint_data: List[Dict[str, Any]] = []
     if checkpoint_file is None or not os.path.exists(checkpoint_file):
         return []
 
-    with open(checkpoint_file, "r") as ifp:
-        for line in ifp:
-            stripped_line = line.strip()
-            if stripped_line:
-                item = cast(Dict[str, Any], json.loads(stripped_line))
-                checkpoint_data.append(item)
+    checkpoint = open_checkpoint(checkpoint_file)
+    checkpoint_data = checkpoint.load()
+    checkpoint.close()
     return checkpoint_data
 
 
+def load_checkpoint_index(checkpoint_file: Optional[str]) -> List[Dict[str, Any]]:
+    if checkpoint_file is None or not os.path.exists(checkpoint_file):
+        return []
+
+    checkpoint = open_checkpoint(checkpoint_file)
+    checkpoint_index = index_checkpoint(checkpoint)
+    checkpoint.close()
+    return checkpoint_index
+
+
 def expire_stale_checkpoint_data(
     checkpoint_data: List[Dict[str, Any]], min_block_number: int
 ) -> List[Dict[str, Any]]:
@@ -64,6 +170,111 @@ def leak_checkpoint_data(
     return [item for item in checkpoint_data if random.random() > leak_rate]
 
 
+def refresh_checkpoint_data(
+    args: argparse.Namespace,
+    *checkpoints: List[Dict[str, Any]],
+    calls_per_token: int = 1,
+) -> Tuple[List[List[Dict[str, Any]]], RefreshSchedule]:
+    """
+    Drops the items that need to be recrawled from each of the given checkpoints (or checkpoint
+    indices, from index_checkpoint).
+
+    With --incremental, those are the items for tokens that events show have changed since the
+    block the item was crawled at. With a refresh budget (--refresh-calls or --refresh-seconds),
+    they are (also) the items for the tokens the returned schedule refreshes, at calls_per_token
+    RPC calls per token. Otherwise, they are the items older than BLOCK_STALENESS_THRESHOLD blocks,
+    and a random --leak-rate fraction of the rest.
+    """
+    current_block_number = len(chain)
+    refreshed_checkpoints = list(checkpoints)
+    if args.incremental:
+        from_block = checkpoint_start_block(*checkpoints)
+        # Events after the block the crawl is pinned to do not change what it sees.
+        to_block = args.block_number
+        if to_block is None:
+            to_block = current_block_number - 1
+        if from_block is not None:
+            last_changed = changed_tokens(
+                web3.eth.get_logs,
+                args.address,
+                from_block,
+                to_block,
+                initial_range=args.log_range,
+            )
+            refreshed_checkpoints = [
+                expire_changed_checkpoint_data(checkpoint_data, last_changed)
+                for checkpoint_data in checkpoints
+            ]
+
+    if refresh_budgeted(args):
+        stages: Dict[int, int] = {}
+        if args.lifecycle_weights is not None:
+            stages = lifecycle_stages(
+                *refreshed_checkpoints, load_checkpoint_index(args.refresh_metadata)
+            )
+        max_tokens = None
+        if args.refresh_calls is not None:
+            max_tokens = args.refresh_calls // calls_per_token
+        schedule = schedule_refresh(
+            current_block_number,
+            refreshed_checkpoints,
+            max_tokens,
+            args.refresh_seconds,
+            args.lifecycle_weights,
+            stages,
+        )
+        return [
+            schedule.drop(checkpoint_data) for checkpoint_data in refreshed_checkpoints
+        ], schedule
+
+    if args.incremental:
+        return refreshed_checkpoints, RefreshSchedule([])
+
+    refreshed_checkpoints = []
+    for checkpoint_data in checkpoints:
+        fresh_checkpoint_data = expire_stale_checkpoint_data(
+            checkpoint_data, current_block_number - BLOCK_STALENESS_THRESHOLD
+        )
+        if args.leak_rate is not None:
+            fresh_checkpoint_data = leak_checkpoint_data(
+                fresh_checkpoint_data, args.leak_rate
+            )
+        refreshed_checkpoints.append(fresh_checkpoint_data)
+    return refreshed_checkpoints, RefreshSchedule([])
+
+
+def existing_token_ids(args: argparse.Namespace, token_ids: Iterable[int]) -> List[int]:
+    """
+    Brings the --token-bitmap up to the block the crawl runs at, and returns the token IDs from
+    token_ids that exist according to it.
+    """
+    assert args.address is not None, "--token-bitmap requires --address"
+    to_block = args.block_number
+    if to_block is None:
+        to_block = len(chain) - 1
+    bitmap = updated_token_bitmap(
+        args.token_bitmap,
+        args.address,
+        web3.eth.get_logs,
+        to_block,
+        initial_range=args.log_range,
+    )
+    if bitmap.block_number > to_block:
+        print(
+            f"Token bitmap is at block {bitmap.block_number}, after block {to_block}: tokens "
+            "burned in between are not crawled",
+            file=sys.stderr,
+        )
+    token_ids = list(token_ids)
+    existing = bitmap.existing(token_ids)
+    if len(existing) < len(token_ids):
+        print(
+            f"Skipping {len(token_ids) - len(existing)} token IDs that do not exist",
+            file=sys.stderr,
+        )
+    return existing
+
+
 def apply_checkpoint(
     job_list: List[Any],
     checkpoint_data: List[Dict[str, Any]],
@@ -80,53 +291,70 @@ def apply_checkpoint(
     return uncheckpointed_jobs
 
 
-def make_multicall(
-    multicall_method: Any,
-    brownie_contract_method: Any,
-    address: web3.toChecksumAddress,
-    inputs: List[Any],
-    block_number: str = "latest",
-) -> Any:
-    multicall_result = multicall_method.call(
-        False,  # success not required
-        [
-            (
-                address,
-                brownie_contract_method.encode_input(input),
-            )
-            for input in inputs
-        ],
-        block_identifier=block_number,
-    )
+def dna_result(token_id: int, block_number: int, token_dna: Any) -> Dict[str, Any]:
+    return {
+        "token_id": token_id,
+        "block_number": block_number,
+        "dna": str(token_dna),
+    }
 
-    results = []
 
-    # Handle the case with not successful calls
-    for encoded_data in multicall_result:
-        if encoded_data[0]:
-            results.append(brownie_contract_method.decode_output(encoded_data[1]))
-        else:
-            print(encoded_data, file=sys.stderr)
-            results.append(None)
-    return results
+def metadata_result(
+    token_id: int, block_number: int, token_data: Any
+) -> Dict[str, Any]:
+    return {
+        "token_id": token_id,
+        "block_number": block_number,
+        "lifecycle_stage": token_data[3],
+        "class_number": token_data[-2],
+    }
+
+
+def mythic_body_parts_result(item: Dict[str, Any], token_data: Any) -> Dict[str, Any]:
+    return {
+        **item,
+        "num_mythic_body_parts": token_data[-1],
+    }
+
+
+def stats_result(item: Dict[str, Any], token_data: Any) -> Dict[str, Any]:
+    stats_data = {
+        stat_name: stat_value for stat_name, stat_value in zip(STATS_ORDER, token_data)
+    }
+    return {**item, **stats_data, "sum_stats": sum(token_data)}
 
 
 def unicorn_dnas(
     contract_address: ChecksumAddress,
     token_ids: List[int],
     block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    results: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for chunk_results, chunk_errors in iter_unicorn_dnas(
+        contract_address, token_ids, block_number, settings
+    ):
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
+    return results, errors
+
+
+def iter_unicorn_dnas(
+    contract_address: ChecksumAddress,
+    token_ids: List[int],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Streaming version of unicorn_dnas. Yields results and errors for each group of chunks as soon
+    as it is crawled.
+    """
     if block_number is None:
         block_number = len(chain) - 1
 
     contract = MetadataFacet.MetadataFacet(contract_address)
 
-    results: List[Dict[str, Any]] = []
-
-    errors: List[Dict[str, Any]] = []
-
-    tokens_dnas = []
-
     dna_progress_bar = tqdm(
         total=len(token_ids),
         desc="Retrieving unicorn DNAs",
@@ -138,61 +366,75 @@ def unicorn_dnas(
 
     multicall_method = multicaller.contract.tryAggregate
 
-    for tokens_ids_chunk in [
-        token_ids[i : i + CALL_CHUNK_SIZE_DNA]
-        for i in range(0, len(token_ids), CALL_CHUNK_SIZE_DNA)
-    ]:
-        while True:
-            try:
-                make_multicall_result = make_multicall(
-                    multicall_method,
-                    contract.contract.getDNA,
-                    contract_address,
-                    tokens_ids_chunk,
-                    block_number=block_number,
+    for offset, chunk_token_ids, tokens_dnas, failures in iter_crawl_multicall(
+        multicall_method,
+        contract.contract.getDNA,
+        contract_address,
+        token_ids,
+        CALL_CHUNK_SIZE_DNA,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=dna_progress_bar,
+    ):
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, (token_id, token_dna) in enumerate(
+            zip(chunk_token_ids, tokens_dnas), start=offset
+        ):
+            if index in failures:
+                errors.append(
+                    {
+                        "token_id": token_id,
+                        "block_number": block_number,
+                        "error": f"Failed to retrieve DNA: {failures[index]}",
+                    }
                 )
-                tokens_dnas.extend(make_multicall_result)
-                dna_progress_bar.update(len(tokens_ids_chunk))
-                break
-            except ValueError:
-                time.sleep(1)
                 continue
+            try:
+                result = dna_result(token_id, block_number, token_dna)
+                results.append(result)
+            except Exception as e:
+                error = {
+                    "token_id": token_id,
+                    "block_number": block_number,
+                    "error": f"Failed to retrieve DNA: {str(e)}",
+                }
+                errors.append(error)
 
-    for token_id, token_dna in zip(token_ids, tokens_dnas):
-        try:
-            result = {
-                "token_id": token_id,
-                "block_number": block_number,
-                "dna": str(token_dna),
-            }
-            results.append(result)
-        except Exception as e:
-            error = {
-                "token_id": token_id,
-                "block_number": block_number,
-                "error": f"Failed to retrieve DNA: {str(e)}",
-            }
-            errors.append(error)
-
-    return results, errors
+        yield results, errors
 
 
 def unicorn_metadata(
     contract_address: ChecksumAddress,
     token_ids: List[int],
     block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    results: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for chunk_results, chunk_errors in iter_unicorn_metadata(
+        contract_address, token_ids, block_number, settings
+    ):
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
+    return results, errors
+
+
+def iter_unicorn_metadata(
+    contract_address: ChecksumAddress,
+    token_ids: List[int],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Streaming version of unicorn_metadata. Yields results and errors for each group of chunks as
+    soon as it is crawled.
+    """
     if block_number is None:
         block_number = len(chain) - 1
 
     contract = StatsFacet.StatsFacet(contract_address)
 
-    results: List[Dict[str, Any]] = []
-
-    errors: List[Dict[str, Any]] = []
-
-    tokens_metadata = []
-
     calls_progress_bar = tqdm(
         total=len(token_ids),
         desc="Submitting requests for unicorn on-chain metadata",
@@ -202,57 +444,116 @@ def unicorn_metadata(
 
     multicall_method = multicaller.contract.tryAggregate
 
-    for tokens_ids_chunk in [
-        token_ids[i : i + CALL_CHUNK_SIZE]
-        for i in range(0, len(token_ids), CALL_CHUNK_SIZE)
-    ]:
-        while True:
-            try:
-                make_multicall_result = make_multicall(
-                    multicall_method,
-                    contract.contract.getUnicornMetadata,
-                    contract_address,
-                    tokens_ids_chunk,
-                    block_number=block_number,
+    for offset, chunk_token_ids, tokens_metadata, failures in iter_crawl_multicall(
+        multicall_method,
+        contract.contract.getUnicornMetadata,
+        contract_address,
+        token_ids,
+        CALL_CHUNK_SIZE,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=calls_progress_bar,
+    ):
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, (token_id, token_data) in enumerate(
+            zip(chunk_token_ids, tokens_metadata), start=offset
+        ):
+            if index in failures:
+                errors.append(
+                    {
+                        "token_id": token_id,
+                        "block_number": block_number,
+                        "error": f"Failed retrive unicorns metadata: {failures[index]}",
+                    }
                 )
-                tokens_metadata.extend(make_multicall_result)
-                calls_progress_bar.update(len(tokens_ids_chunk))
-                break
-            except ValueError:
-                time.sleep(1)
                 continue
+            try:
+                result = metadata_result(token_id, block_number, token_data)
+                results.append(result)
+            except Exception as e:
+                error = {
+                    "token_id": token_id,
+                    "block_number": block_number,
+                    "error": f"Failed retrive unicorns metadata: {str(e)}",
+                }
+                errors.append(error)
 
-    for token_id, token_data in zip(token_ids, tokens_metadata):
-        try:
-            result = {
-                "token_id": token_id,
-                "block_number": block_number,
-                "lifecycle_stage": token_data[3],
-                "class_number": token_data[-2],
-            }
-            results.append(result)
-        except Exception as e:
-            error = {
-                "token_id": token_id,
-                "block_number": block_number,
-                "error": f"Failed retrive unicorns metadata: {str(e)}",
-            }
-            errors.append(error)
-    return results, errors
+        yield results, errors
+
+
+def iter_memoized_crawl(
+    multicall_method: Any,
+    brownie_contract_method: Any,
+    contract_address: ChecksumAddress,
+    items: List[Dict[str, Any]],
+    chunk_size: int,
+    block_number: Any,
+    settings: Optional[MulticallSettings],
+    dna_cache: Optional[DNACache],
+    progress_bar: tqdm,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Any], Dict[int, str]]]:
+    """
+    Calls a method that only depends on DNA for each of the given DNA items. Yields the items whose
+    outputs are in dna_cache first, and then each group of crawled chunks, as (items, outputs,
+    failures keyed by position in the items) triples. Crawled outputs are added to dna_cache.
+    """
+    method_name = brownie_contract_method.abi["name"]
+    hits, misses = memoized(dna_cache, [method_name], [item["dna"] for item in items])
+    if hits:
+        progress_bar.update(len(hits))
+        yield [items[index] for index in hits], [
+            outputs[0] for outputs in hits.values()
+        ], {}
+
+    items_to_crawl = [items[index] for index in misses]
+    for offset, chunk_dnas, chunk_outputs, failures in iter_crawl_multicall(
+        multicall_method,
+        brownie_contract_method,
+        contract_address,
+        [item["dna"] for item in items_to_crawl],
+        chunk_size,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    ):
+        if dna_cache is not None:
+            dna_cache.put_many(method_name, chunk_dnas, chunk_outputs)
+        yield items_to_crawl[offset : offset + len(chunk_dnas)], chunk_outputs, {
+            index - offset: error for index, error in failures.items()
+        }
 
 
 def unicorn_mythic_body_parts(
     contract_address: ChecksumAddress,
     dnas: List[Dict[str, Any]],
     block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+    dna_cache: Optional[DNACache] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    if block_number is None:
-        block_number = len(chain) - 1
-
     results: List[Dict[str, Any]] = []
     errors: List[Dict[str, Any]] = []
+    for chunk_results, chunk_errors in iter_unicorn_mythic_body_parts(
+        contract_address, dnas, block_number, settings, dna_cache
+    ):
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
+    return results, errors
+
 
-    tokens_metadata = []
+def iter_unicorn_mythic_body_parts(
+    contract_address: ChecksumAddress,
+    dnas: List[Dict[str, Any]],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+    dna_cache: Optional[DNACache] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Streaming version of unicorn_mythic_body_parts. Yields results and errors for the DNAs in
+    dna_cache, and then for each group of chunks as soon as it is crawled.
+    """
+    if block_number is None:
+        block_number = len(chain) - 1
 
     mythic_progress_bar = tqdm(
         total=len(dnas),
@@ -261,7 +562,8 @@ def unicorn_mythic_body_parts(
 
     contract = StatsFacet.StatsFacet(contract_address)
 
-    block_number = dnas[0]["block_number"]
+    if dnas:
+        block_number = dnas[0]["block_number"]
 
     multicaller = Multicall2.Multicall2(Multicall2_address)
 
@@ -271,67 +573,75 @@ def unicorn_mythic_body_parts(
         dna for dna in dnas if dna["dna"] is not None and dna["dna"] != "None"
     ]
 
-    for dnas_chunk in [
-        dnas_is_present[i : i + CALL_CHUNK_SIZE]
-        for i in range(0, len(dnas), CALL_CHUNK_SIZE)
-    ]:
-        while True:
-            try:
-
-                send_to_multicall_dnas = [dna["dna"] for dna in dnas_chunk]
-
-                make_multicall_result = make_multicall(
-                    multicall_method,
-                    contract.contract.getUnicornBodyParts,
-                    contract_address,
-                    send_to_multicall_dnas,
-                    block_number=block_number,
+    for chunk_items, tokens_metadata, failures in iter_memoized_crawl(
+        multicall_method,
+        contract.contract.getUnicornBodyParts,
+        contract_address,
+        dnas_is_present,
+        CALL_CHUNK_SIZE,
+        block_number,
+        settings,
+        dna_cache,
+        mythic_progress_bar,
+    ):
+        results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for index, (item, token_data) in enumerate(zip(chunk_items, tokens_metadata)):
+            if index in failures:
+                errors.append(
+                    {
+                        **item,
+                        "error": f"Failed to retrieve num_mythic_body_parts: {failures[index]}",
+                    }
                 )
-                tokens_metadata.extend(make_multicall_result)
-                mythic_progress_bar.update(len(send_to_multicall_dnas))
-                break
-            except ValueError:
-                time.sleep(1)
                 continue
+            if token_data is None:
+                # Token item['token_id']} has no DNA
+                continue
+            try:
+                result = mythic_body_parts_result(item, token_data)
+                results.append(result)
             except Exception as e:
-                print(e, file=sys.stderr)
-                print(send_to_multicall_dnas, file=sys.stderr)
-                raise e
+                error = {
+                    **item,
+                    "error": f"Failed to retrieve num_mythic_body_parts: {str(e)}",
+                }
+                errors.append(error)
 
-    for item, token_data in zip(dnas_is_present, tokens_metadata):
-        if token_data is None:
-            # Token item['token_id']} has no DNA
-            continue
-        try:
-            result = {
-                **item,
-                "num_mythic_body_parts": token_data[-1],
-            }
-            results.append(result)
-        except Exception as e:
-            error = {
-                **item,
-                "error": f"Failed to retrieve num_mythic_body_parts: {str(e)}",
-            }
-            errors.append(error)
-
-    return results, errors
+        yield results, errors
 
 
 def unicorn_stats(
     contract_address: ChecksumAddress,
     dnas: List[Dict[str, Any]],
     block_number: Optional[int] = None,
-) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    settings: Optional[MulticallSettings] = None,
+    dna_cache: Optional[DNACache] = None,
+) -> Tuple[List[Dict[str, Any]], List[Any]]:
+    results: List[Dict[str, Any]] = []
+    errors: List[Any] = []
+    for chunk_results, chunk_errors in iter_unicorn_stats(
+        contract_address, dnas, block_number, settings, dna_cache
+    ):
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
+    return results, errors
 
+
+def iter_unicorn_stats(
+    contract_address: ChecksumAddress,
+    dnas: List[Dict[str, Any]],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+    dna_cache: Optional[DNACache] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Any]]]:
+    """
+    Streaming version of unicorn_stats. Yields results and errors for the DNAs in dna_cache, and
+    then for each group of chunks as soon as it is crawled.
+    """
     if block_number is None:
         block_number = len(chain) - 1
 
-    results: List[Dict[str, Any]] = []
-    errors: List[Dict[str, Any]] = []
-
-    tokens_metadata = []
-
     mythic_progress_bar = tqdm(
         total=len(dnas),
         desc="Retrieving unicorn stats",
@@ -339,7 +649,8 @@ def unicorn_stats(
 
     contract = StatsFacet.StatsFacet(contract_address)
 
-    block_number = dnas[0]["block_number"]
+    if dnas:
+        block_number = dnas[0]["block_number"]
 
     multicaller = Multicall2.Multicall2(Multicall2_address)
 
@@ -350,263 +661,930 @@ def unicorn_stats(
     ]
 
     CALL_CHUNK_SIZE_STATS = int(CALL_CHUNK_SIZE / 6)
-    for dnas_chunk in [
-        dnas_is_present[i : i + CALL_CHUNK_SIZE_STATS]
-        for i in range(0, len(dnas), CALL_CHUNK_SIZE_STATS)
-    ]:
-        while True:
+    for chunk_items, tokens_metadata, failures in iter_memoized_crawl(
+        multicall_method,
+        contract.contract.getStats,
+        contract_address,
+        dnas_is_present,
+        CALL_CHUNK_SIZE_STATS,
+        block_number,
+        settings,
+        dna_cache,
+        mythic_progress_bar,
+    ):
+        results: List[Dict[str, Any]] = []
+        errors: List[Any] = []
+        for index, (item, token_data) in enumerate(zip(chunk_items, tokens_metadata)):
+            if index in failures:
+                errors.append(
+                    f"Could not retrieve stats for token ID: {item['token_id']}: {failures[index]}"
+                )
+                continue
+            if token_data is None:
+                errors.append(f"No DNA for token ID: {item['token_id']}")
+                # Token item['token_id']} has no DNA
+                continue
             try:
+                result = stats_result(item, token_data)
+                results.append(result)
+            except:
+                errors.append(
+                    f"Could not process stats for token ID: {item['token_id']}"
+                )
+
+        yield results, errors
 
-                send_to_multicall_dnas = [dna["dna"] for dna in dnas_chunk]
 
-                make_multicall_result = make_multicall(
-                    multicall_method,
-                    contract.contract.getStats,
-                    contract_address,
-                    send_to_multicall_dnas,
-                    block_number=block_number,
+def unicorn_dnas_and_metadata(
+    contract_address: ChecksumAddress,
+    token_ids: List[int],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Crawls what unicorn_dnas and unicorn_metadata crawl, with the getDNA and getUnicornMetadata
+    calls for each token in the same multicall.
+
+    Returns DNA results, metadata results, and errors.
+    """
+    if block_number is None:
+        block_number = len(chain) - 1
+
+    dna_results: List[Dict[str, Any]] = []
+    metadata_results: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
+    progress_bar = tqdm(
+        total=len(token_ids),
+        desc="Retrieving unicorn DNAs and on-chain metadata",
+    )
+
+    for (
+        chunk_dna_results,
+        chunk_metadata_results,
+        chunk_errors,
+    ) in iter_unicorn_dnas_and_metadata(
+        contract_address, token_ids, block_number, settings, progress_bar
+    ):
+        dna_results.extend(chunk_dna_results)
+        metadata_results.extend(chunk_metadata_results)
+        errors.extend(chunk_errors)
+
+    return dna_results, metadata_results, errors
+
+
+def iter_unicorn_dnas_and_metadata(
+    contract_address: ChecksumAddress,
+    token_ids: Iterable[int],
+    block_number: int,
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Streaming version of unicorn_dnas_and_metadata. Yields DNA results, metadata results, and
+    errors as each batch of multicalls completes.
+    """
+    metadata_contract = MetadataFacet.MetadataFacet(contract_address)
+    stats_contract = StatsFacet.StatsFacet(contract_address)
+
+    # Two calls per token.
+    CALL_CHUNK_SIZE_DNA_METADATA = int(CALL_CHUNK_SIZE / 2)
+
+    multicaller = Multicall2.Multicall2(Multicall2_address)
+
+    multicall_method = multicaller.contract.tryAggregate
+
+    for offset, chunk_token_ids, tokens_data, failures in iter_crawl_fused_multicall(
+        multicall_method,
+        [metadata_contract.contract.getDNA, stats_contract.contract.getUnicornMetadata],
+        contract_address,
+        token_ids,
+        CALL_CHUNK_SIZE_DNA_METADATA,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    ):
+        dna_results: List[Dict[str, Any]] = []
+        metadata_results: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+
+        for index, (token_id, token_data) in enumerate(
+            zip(chunk_token_ids, tokens_data), start=offset
+        ):
+            if index in failures:
+                errors.append(
+                    {
+                        "token_id": token_id,
+                        "block_number": block_number,
+                        "error": f"Failed to retrieve DNA and metadata: {failures[index]}",
+                    }
                 )
-                tokens_metadata.extend(make_multicall_result)
-                mythic_progress_bar.update(len(send_to_multicall_dnas))
-                break
-            except ValueError:
-                time.sleep(1)
                 continue
+            token_dna, token_metadata = token_data
+            try:
+                dna_results.append(dna_result(token_id, block_number, token_dna))
             except Exception as e:
-                print(e, file=sys.stderr)
-                print(send_to_multicall_dnas, file=sys.stderr)
-                raise e
-
-    stats_order = [
-        "attack",
-        "accuracy",
-        "movement_speed",
-        "attack_speed",
-        "defense",
-        "vitality",
-        "resistance",
-        "magic",
-    ]
+                errors.append(
+                    {
+                        "token_id": token_id,
+                        "block_number": block_number,
+                        "error": f"Failed to retrieve DNA: {str(e)}",
+                    }
+                )
+            try:
+                metadata_results.append(
+                    metadata_result(token_id, block_number, token_metadata)
+                )
+            except Exception as e:
+                errors.append(
+                    {
+                        "token_id": token_id,
+                        "block_number": block_number,
+                        "error": f"Failed retrive unicorns metadata: {str(e)}",
+                    }
+                )
 
-    for item, token_data in zip(dnas_is_present, tokens_metadata):
-        if token_data is None:
-            errors.append(f"No DNA for token ID: {item['token_id']}")
-            # Token item['token_id']} has no DNA
-            continue
-        stats_data = {
-            stat_name: stat_value
-            for stat_name, stat_value in zip(stats_order, token_data)
-        }
-        try:
-            result = {**item, **stats_data, "sum_stats": sum(token_data)}
-            results.append(result)
-        except:
-            errors.append(f"Could not process stats for token ID: {item['token_id']}")
+        yield dna_results, metadata_results, errors
 
-    return results, errors
+
+def unicorn_mythic_body_parts_and_stats(
+    contract_address: ChecksumAddress,
+    dnas: List[Dict[str, Any]],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+    dna_cache: Optional[DNACache] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Any]]:
+    """
+    Crawls what unicorn_mythic_body_parts and unicorn_stats crawl, with the getUnicornBodyParts and
+    getStats calls for each DNA in the same multicall.
+
+    Returns mythic body parts results, stats results, and errors.
+    """
+    if block_number is None:
+        block_number = dnas[0]["block_number"] if dnas else len(chain) - 1
+
+    mythic_body_parts_results: List[Dict[str, Any]] = []
+    stats_results: List[Dict[str, Any]] = []
+    errors: List[Any] = []
+
+    progress_bar = tqdm(
+        total=len(dnas),
+        desc="Retrieving unicorn mythic body parts and stats",
+    )
+
+    for (
+        chunk_mythic_body_parts_results,
+        chunk_stats_results,
+        chunk_errors,
+    ) in iter_unicorn_mythic_body_parts_and_stats(
+        contract_address, dnas, block_number, settings, progress_bar, dna_cache
+    ):
+        mythic_body_parts_results.extend(chunk_mythic_body_parts_results)
+        stats_results.extend(chunk_stats_results)
+        errors.extend(chunk_errors)
+
+    return mythic_body_parts_results, stats_results, errors
+
+
+def iter_unicorn_mythic_body_parts_and_stats(
+    contract_address: ChecksumAddress,
+    dnas: Iterable[Dict[str, Any]],
+    block_number: int,
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+    dna_cache: Optional[DNACache] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Any]]]:
+    """
+    Streaming version of unicorn_mythic_body_parts_and_stats. DNAs are crawled as soon as they
+    arrive from the dnas iterable, and mythic body parts results, stats results, and errors are
+    yielded as each batch of multicalls completes.
+
+    DNAs whose outputs are in dna_cache are not crawled. Their results are yielded along with the
+    next batch of crawled results (or at the end).
+    """
+    contract = StatsFacet.StatsFacet(contract_address)
+
+    multicaller = Multicall2.Multicall2(Multicall2_address)
+
+    multicall_method = multicaller.contract.tryAggregate
+
+    # The crawl only sees the DNAs themselves. Since it consumes its inputs and yields its outputs
+    # in the same order, the items they came from can be matched up with a FIFO queue.
+    pending_items: Deque[Dict[str, Any]] = collections.deque()
+    memoized_items: Deque[Tuple[Dict[str, Any], Tuple[Any, ...]]] = collections.deque()
+    methods = ["getUnicornBodyParts", "getStats"]
+
+    def present_dnas() -> Iterator[str]:
+        for item in dnas:
+            if item["dna"] is None or item["dna"] == "None":
+                continue
+            hits, _ = memoized(dna_cache, methods, [item["dna"]])
+            if hits:
+                memoized_items.append((item, hits[0]))
+                continue
+            pending_items.append(item)
+            yield item["dna"]
+
+    def results_batch(
+        items_data: Sequence[Tuple[Dict[str, Any], Any]], failures: Dict[int, str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Any]]:
+        mythic_body_parts_results: List[Dict[str, Any]] = []
+        stats_results: List[Dict[str, Any]] = []
+        errors: List[Any] = []
+
+        for index, (item, token_data) in enumerate(items_data):
+            if index in failures:
+                errors.append(
+                    {
+                        **item,
+                        "error": f"Failed to retrieve num_mythic_body_parts and stats: {failures[index]}",
+                    }
+                )
+                continue
+            body_parts_data, stats_data = token_data
+            if body_parts_data is not None:
+                try:
+                    mythic_body_parts_results.append(
+                        mythic_body_parts_result(item, body_parts_data)
+                    )
+                except Exception as e:
+                    errors.append(
+                        {
+                            **item,
+                            "error": f"Failed to retrieve num_mythic_body_parts: {str(e)}",
+                        }
+                    )
+            if stats_data is None:
+                errors.append(f"No DNA for token ID: {item['token_id']}")
+                continue
+            try:
+                stats_results.append(stats_result(item, stats_data))
+            except:
+                errors.append(
+                    f"Could not process stats for token ID: {item['token_id']}"
+                )
+
+        return mythic_body_parts_results, stats_results, errors
+
+    def memoized_batch() -> List[Tuple[Dict[str, Any], Any]]:
+        batch = []
+        while memoized_items:
+            batch.append(memoized_items.popleft())
+        if progress_bar is not None:
+            progress_bar.update(len(batch))
+        return batch
+
+    # Each DNA returns 15 words (7 for body parts, 8 for stats), so this keeps the return data of
+    # each multicall close to that of a getStats crawl.
+    CALL_CHUNK_SIZE_MYTHIC_BODY_PARTS_STATS = int(CALL_CHUNK_SIZE / 12)
+
+    for offset, chunk_dnas, tokens_data, failures in iter_crawl_fused_multicall(
+        multicall_method,
+        [contract.contract.getUnicornBodyParts, contract.contract.getStats],
+        contract_address,
+        present_dnas(),
+        CALL_CHUNK_SIZE_MYTHIC_BODY_PARTS_STATS,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    ):
+        chunk_items = [pending_items.popleft() for _ in chunk_dnas]
+        if dna_cache is not None:
+            dna_cache.put_many(
+                "getUnicornBodyParts",
+                chunk_dnas,
+                [token_data[0] for token_data in tokens_data],
+            )
+            dna_cache.put_many(
+                "getStats", chunk_dnas, [token_data[1] for token_data in tokens_data]
+            )
+
+        yield results_batch(
+            list(zip(chunk_items, tokens_data)),
+            {index - offset: error for index, error in failures.items()},
+        )
+        memoized_items_data = memoized_batch()
+        if memoized_items_data:
+            yield results_batch(memoized_items_data, {})
+
+    memoized_items_data = memoized_batch()
+    if memoized_items_data:
+        yield results_batch(memoized_items_data, {})
 
 
 def handle_dnas(args: argparse.Namespace) -> None:
     network.connect(args.network)
-    final_checkpoint_data = []
+    checkpoint: Optional[Checkpoint] = None
+    checkpoint_data: List[Dict[str, Any]] = []
+    final_checkpoint_data: List[Dict[str, Any]] = []
+    schedule = RefreshSchedule([])
     if args.checkpoint:
-        block_number = len(chain)
-        checkpoint_data = load_checkpoint_data(args.checkpoint)
-        fresh_checkpoint_data = expire_stale_checkpoint_data(
-            checkpoint_data, block_number - BLOCK_STALENESS_THRESHOLD
-        )
-        final_checkpoint_data = fresh_checkpoint_data
-        if args.leak_rate is not None:
-            final_checkpoint_data = leak_checkpoint_data(
-                fresh_checkpoint_data, args.leak_rate
-            )
+        checkpoint = open_checkpoint(args.checkpoint)
+        checkpoint_data = index_checkpoint(checkpoint)
+        refreshed_checkpoints, schedule = refresh_checkpoint_data(args, checkpoint_data)
+        final_checkpoint_data = refreshed_checkpoints[0]
     if args.end is None:
         args.end = args.start
     assert args.start <= args.end, "Starting token ID must not exceed ending token ID"
-    all_token_ids = range(args.start, args.end + 1)
+    all_token_ids: Iterable[int] = range(args.start, args.end + 1)
+    if args.token_bitmap is not None:
+        all_token_ids = existing_token_ids(args, all_token_ids)
     token_ids = apply_checkpoint(all_token_ids, final_checkpoint_data, "token_id")
-    results, errors = unicorn_dnas(
-        args.address,
+    refreshed_token_ids: Set[int] = set()
+    settings = multicall_settings_from_args(args)
+    for chunk_results, chunk_errors in iter_scheduled(
+        lambda jobs: iter_unicorn_dnas(args.address, jobs, args.block_number, settings),
         token_ids,
-        args.block_number,
-    )
-
-    if args.checkpoint:
-        with open(args.checkpoint, "w") as ofp:
-            for result in results + final_checkpoint_data:
-                print(json.dumps(result), file=ofp)
-    else:
-        for result in results:
-            print(json.dumps(result))
-
-    for error in errors:
-        print(json.dumps(error), file=sys.stderr)
+        schedule,
+    ):
+        if checkpoint is not None:
+            checkpoint.append(chunk_results)
+            refreshed_token_ids.update(result["token_id"] for result in chunk_results)
+        else:
+            write_jsonl(chunk_results, sys.stdout)
+            sys.stdout.flush()
+        for error in chunk_errors:
+            print_json(error, file=sys.stderr)
+
+    if checkpoint is not None:
+        checkpoint.commit(
+            item["token_id"]
+            for item in final_checkpoint_data
+            + schedule.unrefreshed(checkpoint_data, refreshed_token_ids)
+        )
+        checkpoint.close()
 
 
 def handle_metadata(args: argparse.Namespace) -> None:
     network.connect(args.network)
-    final_checkpoint_data = []
+    checkpoint: Optional[Checkpoint] = None
+    checkpoint_data: List[Dict[str, Any]] = []
+    final_checkpoint_data: List[Dict[str, Any]] = []
+    schedule = RefreshSchedule([])
     if args.checkpoint:
-        block_number = len(chain)
-        checkpoint_data = load_checkpoint_data(args.checkpoint)
-        fresh_checkpoint_data = expire_stale_checkpoint_data(
-            checkpoint_data, block_number - BLOCK_STALENESS_THRESHOLD
-        )
-        final_checkpoint_data = fresh_checkpoint_data
-        if args.leak_rate is not None:
-            final_checkpoint_data = leak_checkpoint_data(
-                fresh_checkpoint_data, args.leak_rate
-            )
+        checkpoint = open_checkpoint(args.checkpoint)
+        checkpoint_data = index_checkpoint(checkpoint)
+        refreshed_checkpoints, schedule = refresh_checkpoint_data(args, checkpoint_data)
+        final_checkpoint_data = refreshed_checkpoints[0]
 
     if args.end is None:
         args.end = args.start
     assert args.start <= args.end, "Starting token ID must not exceed ending token ID"
-    all_token_ids = range(args.start, args.end + 1)
+    all_token_ids: Iterable[int] = range(args.start, args.end + 1)
+    if args.token_bitmap is not None:
+        all_token_ids = existing_token_ids(args, all_token_ids)
     token_ids = apply_checkpoint(all_token_ids, final_checkpoint_data, "token_id")
-    results, errors = unicorn_metadata(
-        args.address,
+    refreshed_token_ids: Set[int] = set()
+    settings = multicall_settings_from_args(args)
+    for chunk_results, chunk_errors in iter_scheduled(
+        lambda jobs: iter_unicorn_metadata(
+            args.address, jobs, args.block_number, settings
+        ),
         token_ids,
-        args.block_number,
-    )
+        schedule,
+    ):
+        if checkpoint is not None:
+            checkpoint.append(chunk_results)
+            refreshed_token_ids.update(result["token_id"] for result in chunk_results)
+        else:
+            write_jsonl(chunk_results, sys.stdout)
+            sys.stdout.flush()
+        for error in chunk_errors:
+            print_json(error, file=sys.stderr)
+
+    if checkpoint is not None:
+        checkpoint.commit(
+            item["token_id"]
+            for item in final_checkpoint_data
+            + schedule.unrefreshed(checkpoint_data, refreshed_token_ids)
+        )
+        checkpoint.close()
 
+
+def handle_mythic_body_parts(args: argparse.Namespace) -> None:
+    network.connect(args.network)
+    checkpoint: Optional[Checkpoint] = None
+    checkpoint_data: List[Dict[str, Any]] = []
+    final_checkpoint_data: List[Dict[str, Any]] = []
+    schedule = RefreshSchedule([])
     if args.checkpoint:
-        with open(args.checkpoint, "w") as ofp:
-            for result in results + final_checkpoint_data:
-                print(json.dumps(result), file=ofp)
-    else:
-        for result in results:
-            print(json.dumps(result))
+        checkpoint = open_checkpoint(args.checkpoint)
+        checkpoint_data = index_checkpoint(checkpoint)
+        refreshed_checkpoints, schedule = refresh_checkpoint_data(args, checkpoint_data)
+        final_checkpoint_data = refreshed_checkpoints[0]
 
-    for error in errors:
-        print(json.dumps(error), file=sys.stderr)
+    all_dnas = load_dnas(args.dnas)
 
+    dnas = apply_checkpoint(all_dnas, final_checkpoint_data, "token_id", "token_id")
 
-def handle_mythic_body_parts(args: argparse.Namespace) -> None:
+    refreshed_token_ids: Set[int] = set()
+    settings = multicall_settings_from_args(args)
+    dna_cache = dna_cache_from_args(args, network.show_active())
+    for chunk_results, chunk_errors in iter_scheduled(
+        lambda jobs: iter_unicorn_mythic_body_parts(
+            args.address, jobs, args.block_number, settings, dna_cache
+        ),
+        dnas,
+        schedule,
+        "token_id",
+    ):
+        if checkpoint is not None:
+            checkpoint.append(chunk_results)
+            refreshed_token_ids.update(result["token_id"] for result in chunk_results)
+        else:
+            write_jsonl(chunk_results, sys.stdout)
+            sys.stdout.flush()
+        for error in chunk_errors:
+            print_json(error, file=sys.stderr)
+
+    if checkpoint is not None:
+        checkpoint.commit(
+            item["token_id"]
+            for item in final_checkpoint_data
+            + schedule.unrefreshed(checkpoint_data, refreshed_token_ids)
+        )
+        checkpoint.close()
+
+
+def handle_stats(args: argparse.Namespace) -> None:
     network.connect(args.network)
-    final_checkpoint_data = []
+    checkpoint: Optional[Checkpoint] = None
+    checkpoint_data: List[Dict[str, Any]] = []
+    final_checkpoint_data: List[Dict[str, Any]] = []
+    schedule = RefreshSchedule([])
     if args.checkpoint:
-        block_number = len(chain)
-        checkpoint_data = load_checkpoint_data(args.checkpoint)
-        fresh_checkpoint_data = expire_stale_checkpoint_data(
-            checkpoint_data, block_number - BLOCK_STALENESS_THRESHOLD
-        )
-        final_checkpoint_data = fresh_checkpoint_data
-        if args.leak_rate is not None:
-            final_checkpoint_data = leak_checkpoint_data(
-                fresh_checkpoint_data, args.leak_rate
-            )
+        checkpoint = open_checkpoint(args.checkpoint)
+        checkpoint_data = index_checkpoint(checkpoint)
+        refreshed_checkpoints, schedule = refresh_checkpoint_data(args, checkpoint_data)
+        final_checkpoint_data = refreshed_checkpoints[0]
 
-    all_dnas: List[Dict[str, Any]] = []
-    with open(args.dnas, "r") as ifp:
-        for line in ifp:
-            all_dnas.append(json.loads(line.strip()))
+    all_dnas = load_dnas(args.dnas)
 
     dnas = apply_checkpoint(all_dnas, final_checkpoint_data, "token_id", "token_id")
 
-    results, errors = unicorn_mythic_body_parts(
-        args.address,
+    refreshed_token_ids: Set[int] = set()
+    settings = multicall_settings_from_args(args)
+    dna_cache = dna_cache_from_args(args, network.show_active())
+    for chunk_results, chunk_errors in iter_scheduled(
+        lambda jobs: iter_unicorn_stats(
+            args.address, jobs, args.block_number, settings, dna_cache
+        ),
         dnas,
-        args.block_number,
-    )
+        schedule,
+        "token_id",
+    ):
+        if checkpoint is not None:
+            checkpoint.append(chunk_results)
+            refreshed_token_ids.update(result["token_id"] for result in chunk_results)
+        else:
+            write_jsonl(chunk_results, sys.stdout)
+            sys.stdout.flush()
+        for error in chunk_errors:
+            print_json(error, file=sys.stderr)
+
+    if checkpoint is not None:
+        checkpoint.commit(
+            item["token_id"]
+            for item in final_checkpoint_data
+            + schedule.unrefreshed(checkpoint_data, refreshed_token_ids)
+        )
+        checkpoint.close()
 
-    if args.checkpoint:
-        with open(args.checkpoint, "w") as ofp:
-            for result in results + final_checkpoint_data:
-                print(json.dumps(result), file=ofp)
-    else:
-        for result in results:
-            print(json.dumps(result))
 
-    for error in errors:
-        json.dump(error, fp=sys.stderr)
-        print("", file=sys.stderr)
+def unreplaced_checkpoint_data(
+    checkpoint_data: List[Dict[str, Any]], token_ids: Set[int]
+) -> List[Dict[str, Any]]:
+    """
+    Drops the checkpointed results for the given (recrawled) token IDs.
+    """
+    return [item for item in checkpoint_data if item.get("token_id") not in token_ids]
 
 
-def handle_stats(args: argparse.Namespace) -> None:
+def open_snapshot_checkpoints(
+    data_dir: str, snapshot_format: str
+) -> Dict[str, Checkpoint]:
+    """
+    Opens the checkpoints for each part of a snapshot: a JSON lines file per part, or a table per
+    part in a single SQLite file.
+    """
+    if snapshot_format == "sqlite":
+        store_file = os.path.join(data_dir, SNAPSHOT_STORE_FILE)
+        return {name: CheckpointStore(store_file, name) for name in SNAPSHOT_FILES}
+    return {
+        name: JSONLCheckpoint(os.path.join(data_dir, filename))
+        for name, filename in SNAPSHOT_FILES.items()
+    }
+
+
+def handle_snapshot(args: argparse.Namespace) -> None:
     network.connect(args.network)
-    final_checkpoint_data = []
+    settings = multicall_settings_from_args(args)
+    dna_cache = dna_cache_from_args(args, network.show_active())
+
+    block_number = args.block_number
+    if block_number is None:
+        block_number = len(chain) - 1
+
+    if args.end is None:
+        args.end = args.start
+    assert args.start <= args.end, "Starting token ID must not exceed ending token ID"
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    checkpoints = open_snapshot_checkpoints(args.data_dir, args.format)
+
+    checkpoints_data: Dict[str, List[Dict[str, Any]]] = {
+        name: [] for name in SNAPSHOT_FILES
+    }
+    dnas_checkpoint: List[Dict[str, Any]] = []
+    metadata_checkpoint: List[Dict[str, Any]] = []
+    mythic_body_parts_checkpoint: List[Dict[str, Any]] = []
+    stats_checkpoint: List[Dict[str, Any]] = []
+    schedule = RefreshSchedule([])
     if args.checkpoint:
-        block_number = len(chain)
-        checkpoint_data = load_checkpoint_data(args.checkpoint)
-        fresh_checkpoint_data = expire_stale_checkpoint_data(
-            checkpoint_data, block_number - BLOCK_STALENESS_THRESHOLD
+        checkpoints_data = {
+            name: index_checkpoint(checkpoints[name]) for name in SNAPSHOT_FILES
+        }
+        # Each token costs 4 calls: getDNA, getUnicornMetadata, getUnicornBodyParts and getStats.
+        (
+            (
+                dnas_checkpoint,
+                metadata_checkpoint,
+                mythic_body_parts_checkpoint,
+                stats_checkpoint,
+            ),
+            schedule,
+        ) = refresh_checkpoint_data(
+            args,
+            checkpoints_data["dnas"],
+            checkpoints_data["metadata"],
+            checkpoints_data["mythic_body_parts"],
+            checkpoints_data["stats"],
+            calls_per_token=4,
         )
-        final_checkpoint_data = fresh_checkpoint_data
-        if args.leak_rate is not None:
-            final_checkpoint_data = leak_checkpoint_data(
-                fresh_checkpoint_data, args.leak_rate
+
+    all_token_ids: Iterable[int] = range(args.start, args.end + 1)
+    if args.token_bitmap is not None:
+        all_token_ids = existing_token_ids(args, all_token_ids)
+    token_ids = sorted(
+        set(apply_checkpoint(all_token_ids, dnas_checkpoint, "token_id"))
+        | set(apply_checkpoint(all_token_ids, metadata_checkpoint, "token_id"))
+    )
+    crawled_token_ids = set(token_ids)
+    dnas_token_ids = {item.get("token_id") for item in dnas_checkpoint}
+    mythic_body_parts_token_ids = {
+        item.get("token_id") for item in mythic_body_parts_checkpoint
+    }
+    stats_token_ids = {item.get("token_id") for item in stats_checkpoint}
+
+    # Token IDs with new results in each part of the snapshot. The results themselves go
+    # straight to the checkpoints.
+    refreshed_token_ids: Dict[str, Set[int]] = {name: set() for name in SNAPSHOT_FILES}
+    recrawled_token_ids: Set[int] = set()
+
+    dna_progress_bar = tqdm(
+        total=len(token_ids),
+        desc="Retrieving unicorn DNAs and on-chain metadata",
+    )
+    body_progress_bar = tqdm(desc="Retrieving unicorn mythic body parts and stats")
+
+    def dnas_to_crawl() -> Iterator[Dict[str, Any]]:
+        """
+        DNAs whose mythic body parts and stats need crawling: checkpointed DNAs for tokens missing
+        from either of those checkpoints, followed by each DNA as soon as it is crawled.
+        """
+        for item in checkpoints["dnas"].scan():
+            if item["token_id"] not in dnas_token_ids:
+                continue
+            if item["token_id"] not in crawled_token_ids and (
+                item["token_id"] not in mythic_body_parts_token_ids
+                or item["token_id"] not in stats_token_ids
+            ):
+                recrawled_token_ids.add(item["token_id"])
+                yield item
+
+        for (
+            chunk_dna_results,
+            chunk_metadata_results,
+            chunk_errors,
+        ) in iter_scheduled(
+            lambda jobs: iter_unicorn_dnas_and_metadata(
+                args.address, jobs, block_number, settings, dna_progress_bar
+            ),
+            token_ids,
+            schedule,
+        ):
+            for name, chunk_results in [
+                ("dnas", chunk_dna_results),
+                ("metadata", chunk_metadata_results),
+            ]:
+                checkpoints[name].append(chunk_results)
+                refreshed_token_ids[name].update(
+                    result["token_id"] for result in chunk_results
+                )
+            for error in chunk_errors:
+                print_json(error, file=sys.stderr)
+            for item in chunk_dna_results:
+                recrawled_token_ids.add(item["token_id"])
+                yield item
+
+    # DNAs stream from the DNA and metadata crawl, which runs in a background thread, into the
+    # mythic body parts and stats crawl as they arrive. The bounded queue between them keeps a
+    # slow second stage from holding up the first one by more than --pipeline-buffer DNAs.
+    for (
+        chunk_mythic_body_parts_results,
+        chunk_stats_results,
+        chunk_errors,
+    ) in iter_unicorn_mythic_body_parts_and_stats(
+        args.address,
+        prefetch(dnas_to_crawl(), args.pipeline_buffer),
+        block_number,
+        settings,
+        body_progress_bar,
+        dna_cache,
+    ):
+        for name, chunk_results in [
+            ("mythic_body_parts", chunk_mythic_body_parts_results),
+            ("stats", chunk_stats_results),
+        ]:
+            checkpoints[name].append(chunk_results)
+            refreshed_token_ids[name].update(
+                result["token_id"] for result in chunk_results
             )
+        for error in chunk_errors:
+            print_json(error, file=sys.stderr)
+
+    for name, checkpoint_data, replaced_token_ids in [
+        ("dnas", dnas_checkpoint, crawled_token_ids),
+        ("metadata", metadata_checkpoint, crawled_token_ids),
+        ("mythic_body_parts", mythic_body_parts_checkpoint, recrawled_token_ids),
+        ("stats", stats_checkpoint, recrawled_token_ids),
+    ]:
+        checkpoints[name].commit(
+            item["token_id"]
+            for item in unreplaced_checkpoint_data(checkpoint_data, replaced_token_ids)
+            + schedule.unrefreshed(checkpoints_data[name], refreshed_token_ids[name])
+        )
+        checkpoints[name].close()
 
-    all_dnas: List[Dict[str, Any]] = []
-    with open(args.dnas, "r") as ifp:
-        for line in ifp:
-            all_dnas.append(json.loads(line.strip()))
 
-    dnas = apply_checkpoint(all_dnas, final_checkpoint_data, "token_id", "token_id")
+def load_dnas(dnas_file: str) -> List[Dict[str, Any]]:
+    if is_binary_snapshot(dnas_file):
+        return BinarySnapshot(dnas_file).items("dnas")
 
-    results, errors = unicorn_stats(
+    return read_jsonl(dnas_file)
+
+
+def load_index(
+    path: str, part: str, key: Callable[[int], Any] = int
+) -> Mapping[Any, Dict[str, Any]]:
+    """
+    Indexes the items in a JSON lines file generated by the biologist command for the given part
+    of a snapshot (dnas, metadata, mythic_body_parts or stats) by key(token_id). If path is a
+    binary snapshot, its items for that part are looked up on demand instead.
+    """
+    if is_binary_snapshot(path):
+        return BinarySnapshotIndex(BinarySnapshot(path), part, key)
+
+    index: Dict[Any, Dict[str, Any]] = {}
+    for item in iter_jsonl(path):
+        index[key(item["token_id"])] = item
+    return index
+
+
+def merge_item(
+    metadata_item: Dict[str, Any], mythic_body_parts_item: Dict[str, Any]
+) -> Dict[str, Any]:
+    result = {**metadata_item, **mythic_body_parts_item}
+    del result["block_number"]
+    result["metadata_block_number"] = metadata_item["block_number"]
+    lifecycle_stage = metadata_item["lifecycle_stage"]
+    result["mythic_body_parts_block_number"] = mythic_body_parts_item["block_number"]
+    if (
+        mythic_body_parts_item.get("num_mythic_body_parts") is None
+        and result["lifecycle_stage"] == 0
+    ):
+        result["num_mythic_body_parts"] = 0
+    if (
+        mythic_body_parts_item.get("num_mythic_body_parts") == 6
+        and lifecycle_stage == 0
+    ):
+        result["num_mythic_body_parts"] = 0
+    result["is_mythic"] = result["num_mythic_body_parts"] > 0
+    result["is_hidden_class"] = result["class_number"] in HIDDEN_CLASSES
+    return result
+
+
+class MergedSnapshotIndex(collections.abc.Mapping):
+    """
+    The items "autocorns biologist merge" would generate from a binary snapshot, indexed by string
+    token ID and built when they are looked up.
+    """
+
+    def __init__(self, snapshot: BinarySnapshot) -> None:
+        self.metadata_index = BinarySnapshotIndex(snapshot, "metadata", str)
+        self.mythic_body_parts_index = BinarySnapshotIndex(
+            snapshot, "mythic_body_parts", str
+        )
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        return merge_item(self.metadata_index[key], self.mythic_body_parts_index[key])
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.metadata_index:
+            if key in self.mythic_body_parts_index:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+def handle_pack(args: argparse.Namespace) -> None:
+    checkpoints = open_snapshot_checkpoints(args.data_dir, args.format)
+    parts = {name: checkpoint.load() for name, checkpoint in checkpoints.items()}
+    for checkpoint in checkpoints.values():
+        checkpoint.close()
+    num_rows = write_binary_snapshot(
+        args.outfile,
+        parts["dnas"],
+        parts["metadata"],
+        parts["mythic_body_parts"],
+        parts["stats"],
+    )
+    print(f"Wrote {num_rows} rows to {args.outfile}", file=sys.stderr)
+
+
+def handle_decoder_tables(args: argparse.Namespace) -> None:
+    network.connect(args.network)
+    block_number = args.block_number
+    if block_number is None:
+        block_number = len(chain) - 1
+
+    contract = DNAMigrationFacet.DNAMigrationFacet(args.address)
+    multicaller = Multicall2.Multicall2(Multicall2_address)
+    tables = fetch_decoder_tables(
+        contract.contract,
+        multicaller.contract.tryAggregate,
+        block_number,
+        multicall_settings_from_args(args),
+    )
+    with open(args.outfile, "w") as ofp:
+        dump(tables, ofp)
+
+
+def handle_decode(args: argparse.Namespace) -> None:
+    with open(args.tables, "r") as ifp:
+        decoder = DNADecoder(load(ifp))
+    dnas = load_dnas(args.dnas)
+
+    mythic_body_parts_results: List[Dict[str, Any]] = []
+    stats_results: List[Dict[str, Any]] = []
+    errors: List[Any] = []
+    for item, outputs in zip(dnas, decoder.decode_items(dnas)):
+        if outputs is None:
+            errors.append({**item, "error": "Could not decode DNA"})
+            continue
+        body_parts_data, stats_data = outputs
+        mythic_body_parts_results.append(
+            mythic_body_parts_result(item, body_parts_data)
+        )
+        stats_results.append(stats_result(item, stats_data))
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    mythic_body_parts_file = os.path.join(args.data_dir, "mythic-body-parts.json")
+    stats_file = os.path.join(args.data_dir, "stats.json")
+    for outfile, items in [
+        (mythic_body_parts_file, mythic_body_parts_results),
+        (stats_file, stats_results),
+    ]:
+        with open(outfile, "w") as ofp:
+            write_jsonl(items, ofp)
+
+    for error in errors:
+        print_json(error, file=sys.stderr)
+
+
+def handle_verify_decoder(args: argparse.Namespace) -> None:
+    network.connect(args.network)
+    block_number = args.block_number
+    if block_number is None:
+        block_number = len(chain) - 1
+
+    with open(args.tables, "r") as ifp:
+        decoder = DNADecoder(load(ifp))
+    contract = DNAMigrationFacet.DNAMigrationFacet(args.address)
+    multicaller = Multicall2.Multicall2(Multicall2_address)
+    report = verify_decoder(
+        decoder,
+        contract.contract,
+        multicaller.contract.tryAggregate,
+        load_dnas(args.dnas),
+        args.sample_size,
+        block_number,
+        multicall_settings_from_args(args),
+        seed=args.seed,
+    )
+    print_json(report, indent=True)
+    if report["mismatched"] > 0 or report["undecodable"] > 0:
+        sys.exit(1)
+
+
+def handle_total_supply(args: argparse.Namespace) -> None:
+    if args.token_bitmap is None:
+        assert not args.max_token_id, "--max-token-id requires --token-bitmap"
+        ERC721WithDiamondStorage.handle_total_supply(args)
+        return
+
+    assert args.address is not None, "--token-bitmap requires --address"
+    # load_token_bitmap starts an empty bitmap for a missing file, which would read as no tokens.
+    if not os.path.exists(args.token_bitmap):
+        print(f"Token bitmap does not exist: {args.token_bitmap}", file=sys.stderr)
+        sys.exit(1)
+    bitmap = load_token_bitmap(args.token_bitmap, args.address)
+    if args.max_token_id:
+        print(bitmap.max_token_id)
+    else:
+        print(bitmap.total_supply())
+
+
+def handle_token_bitmap(args: argparse.Namespace) -> None:
+    assert args.address is not None, "--token-bitmap requires --address"
+    network.connect(args.network)
+    to_block = args.block_number
+    if to_block is None:
+        to_block = len(chain) - 1
+    bitmap = updated_token_bitmap(
+        args.token_bitmap,
         args.address,
-        dnas,
-        args.block_number,
+        web3.eth.get_logs,
+        to_block,
+        initial_range=args.log_range,
     )
+    print_json(bitmap.summary())
 
-    if args.checkpoint:
-        with open(args.checkpoint, "w") as ofp:
-            for result in results + final_checkpoint_data:
-                print(json.dumps(result), file=ofp)
-    else:
-        for result in results:
-            print(json.dumps(result))
 
-    for error in errors:
-        json.dump(error, fp=sys.stderr)
-        print("", file=sys.stderr)
+def handle_merge(args: argparse.Namespace) -> None:
+    metadata_index = load_index(args.metadata, "metadata")
+    mythic_body_parts_index = load_index(args.mythic_body_parts, "mythic_body_parts")
+
+    def merged_items() -> Iterator[Dict[str, Any]]:
+        for token_id, data in metadata_index.items():
+            if token_id not in mythic_body_parts_index:
+                print(
+                    f"Token ID in metadata but not in mythic-body-parts: {token_id}",
+                    file=sys.stderr,
+                )
+            else:
+                yield merge_item(data, mythic_body_parts_index[token_id])
 
+    write_jsonl(merged_items(), sys.stdout)
 
-def handle_merge(args: argparse.Namespace) -> None:
-    metadata_index: Dict[int, Dict[str, Any]] = {}
-    mythic_body_parts_index: Dict[int, Dict[str, Any]] = {}
-
-    with open(args.metadata, "r") as metadata_ifp, open(
-        args.mythic_body_parts, "r"
-    ) as mythic_body_parts_ifp:
-        for line in metadata_ifp:
-            item = json.loads(line.strip())
-            metadata_index[item["token_id"]] = item
-
-        for line in mythic_body_parts_ifp:
-            item = json.loads(line.strip())
-            mythic_body_parts_index[item["token_id"]] = item
-
-    hidden_classes = {1, 5, 8}
-    for token_id, data in metadata_index.items():
-        if token_id not in mythic_body_parts_index:
-            print(
-                f"Token ID in metadata but not in mythic-body-parts: {token_id}",
-                file=sys.stderr,
-            )
-        else:
-            mythic_body_parts_data = mythic_body_parts_index[token_id]
-            result = {**data, **mythic_body_parts_data}
-            del result["block_number"]
-            result["metadata_block_number"] = data["block_number"]
-            lifecycle_stage = data["lifecycle_stage"]
-            result["mythic_body_parts_block_number"] = mythic_body_parts_data[
-                "block_number"
-            ]
-            if (
-                mythic_body_parts_data.get("num_mythic_body_parts") is None
-                and result["lifecycle_stage"] == 0
-            ):
-                result["num_mythic_body_parts"] = 0
-            if (
-                mythic_body_parts_data.get("num_mythic_body_parts") == 6
-                and lifecycle_stage == 0
-            ):
-                result["num_mythic_body_parts"] = 0
-            result["is_mythic"] = result["num_mythic_body_parts"] > 0
-            result["is_hidden_class"] = result["class_number"] in hidden_classes
-            print(json.dumps(result), file=sys.stdout)
+
+async def fetch_events(
+    client: MoonstreamClient,
+    args: argparse.Namespace,
+    query_name: str,
+    params: Dict[str, Any],
+    ofp: TextIO,
+) -> Dict[str, Any]:
+    """
+    Writes the results of a Moonstream query over the timestamps from args.start to args.end
+    (default: now) to ofp, querying windows of args.window_seconds separately if it is set.
+    params are the parameters of the query other than start_timestamp and end_timestamp. Returns a
+    summary of the fetch.
+    """
+    end_timestamp = int(time.time())
+    if args.end is not None:
+        end_timestamp = args.end
+
+    if args.window_seconds is None:
+        response = await client.fetch(
+            query_name,
+            {**params, "start_timestamp": args.start, "end_timestamp": end_timestamp},
+            max_interval=args.interval,
+            max_polls=args.max_retries,
+        )
+        ofp.write(response.content.decode("utf-8"))
+        return {
+            "seconds": response.seconds,
+            "polls": response.polls,
+            "attempts": response.attempts,
+            "size": len(response.content),
+            "last_modified": response.last_modified,
+        }
+
+    contents, summary = await fetch_windows(
+        client,
+        query_name,
+        params,
+        time_windows(args.start, end_timestamp, args.window_seconds),
+        WindowCache(args.window_cache),
+        args.finality_seconds,
+        args.window_concurrency,
+        max_interval=args.interval,
+        max_polls=args.max_retries,
+    )
+    summary["events"] = write_merged_results(contents, ofp)
+    return summary
 
 
 def handle_moonstream_events(args: argparse.Namespace) -> None:
@@ -614,94 +1592,151 @@ def handle_moonstream_events(args: argparse.Namespace) -> None:
     if moonstream_access_token is None:
         raise ValueError("Please set the MOONSTREAM_ACCESS_TOKEN environment variable")
 
-    api_url = args.api.rstrip("/")
-    request_url = f"{api_url}/queries/{args.query_name}/update_data"
-    headers = {
-        "Authorization": f"Bearer {moonstream_access_token}",
-        "Content-Type": "application/json",
-    }
-    # Assume our clock is not drifting too much from AWS clocks.
-    if_modified_since_datetime = datetime.datetime.utcnow()
-    if_modified_since = if_modified_since_datetime.strftime("%a, %d %b %Y %H:%M:%S GMT")
-    time.sleep(4)
-    end_timestamp = int(time.time())
-    if args.end is not None:
-        end_timestamp = args.end
-
-    request_body = {
-        "params": {"start_timestamp": args.start, "end_timestamp": end_timestamp}
-    }
+    async def fetch() -> Dict[str, Any]:
+        async with MoonstreamClient(moonstream_access_token, args.api) as client:
+            return await fetch_events(client, args, args.query_name, {}, args.outfile)
 
-    success = False
-    attempts = 0
+    summary = run(fetch())
+    print_json({"query_name": args.query_name, **summary}, file=sys.stderr)
 
-    while not success and attempts < args.max_retries:
-        attempts += 1
-        response = requests.post(
-            request_url, json=request_body, headers=headers, timeout=10
-        )
-        response.raise_for_status()
-        response_body = response.json()
-        data_url = response_body["url"]
 
-        keep_going = True
-        num_retries = 0
+def handle_moonstream_queries(args: argparse.Namespace) -> None:
+    """
+    Fetches several Moonstream queries at once, and prints a JSON summary of each fetch.
+    """
+    moonstream_access_token = os.environ.get("MOONSTREAM_ACCESS_TOKEN")
+    if moonstream_access_token is None:
+        raise ValueError("Please set the MOONSTREAM_ACCESS_TOKEN environment variable")
 
-        print(f"If-Modified-Since: {if_modified_since}")
-        while keep_going:
-            time.sleep(args.interval)
-            num_retries += 1
-            try:
-                data_response = requests.get(
-                    data_url,
-                    headers={"If-Modified-Since": if_modified_since},
-                    timeout=10,
+    query_params: Dict[str, Dict[str, Any]] = {}
+    for query_name, params in args.query_params:
+        query_params[query_name] = loads(params)
+    outfiles = {query_name: outfile for query_name, outfile in args.query}
+    for query_name in query_params:
+        assert query_name in outfiles, f"--query-params for unknown query: {query_name}"
+
+    async def fetch(client: MoonstreamClient, query_name: str) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            "query_name": query_name,
+            "outfile": outfiles[query_name],
+        }
+        try:
+            with open(outfiles[query_name], "w") as ofp:
+                summary.update(
+                    await fetch_events(
+                        client,
+                        args,
+                        query_name,
+                        query_params.get(query_name, {}),
+                        ofp,
+                    )
                 )
-            except:
-                print(f"Failed to get data from {data_url}", file=sys.stderr)
-                continue
-            print(f"Status code: {data_response.status_code}", file=sys.stderr)
-            print(
-                f"Last-Modified: {data_response.headers['Last-Modified']}",
-                file=sys.stderr,
+        except Exception as e:
+            summary["error"] = str(e)
+        return summary
+
+    async def fetch_all() -> List[Dict[str, Any]]:
+        async with MoonstreamClient(
+            moonstream_access_token, args.api, connections=2 * len(outfiles)
+        ) as client:
+            return await asyncio.gather(
+                *[fetch(client, query_name) for query_name in outfiles]
             )
-            if data_response.status_code == 200:
-                json.dump(data_response.json(), args.outfile)
-                keep_going = False
-                success = True
-            if keep_going and args.max_retries > 0:
-                keep_going = num_retries <= args.max_retries
 
-    if not success:
-        raise Exception("Failed to retrieve data")
+    started_at = time.perf_counter()
+    summaries = run(fetch_all())
+    for summary in summaries:
+        print_json(summary)
+    print(
+        f"Fetched {len(summaries)} queries in "
+        f"{time.perf_counter() - started_at:.1f} seconds",
+        file=sys.stderr,
+    )
+    if any("error" in summary for summary in summaries):
+        sys.exit(1)
 
 
-def handle_sob(args: argparse.Namespace) -> None:
-    milestone_2_cutoff = 29254405
-    milestone_3_cutoff = 30192250
-    milestone_3_end = 31372175
+# Kinds of events scored by the season handlers, in the order in which they are scored.
+BREEDING_EVENTS = 0
+HATCHING_EVENTS = 1
+EVOLUTION_EVENTS = 2
+
+
+class PlayerPoints:
+    """
+    The points of each player in a season event, built up one Moonstream event at a time so that
+    event files can be streamed rather than loaded whole.
 
-    token_metadata_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.merged, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            token_metadata_index[str(item["token_id"])] = item
+    Players are listed in the order in which they would show up if all events of the first kind
+    (breeding, say) were scored, then all events of the next kind, and so on, regardless of how
+    events of different kinds are interleaved in the event files. Players with tied scores keep
+    that order on leaderboards.
+    """
+
+    def __init__(self, default_points: Dict[str, int]) -> None:
+        self.default_points = default_points
+        self.points: Dict[str, Dict[str, int]] = {}
+        self.first_events: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+
+    def get(self, event: Dict[str, Any], kind: int, position: int) -> Dict[str, int]:
+        """
+        Returns the points of the player of an event of the given kind at the given position in
+        its event file, starting them at default_points if the player has none yet.
+        """
+        player = event["player_wallet"]
+        first_event = self.first_events.get(player)
+        if first_event is None:
+            self.points[player] = {**self.default_points}
+        if first_event is None or (kind, position) < first_event[:2]:
+            self.first_events[player] = (kind, position, event)
+        return self.points[player]
 
-    with open(args.moonstream, "r") as ifp:
-        full_data = json.load(ifp)
+    def first_event(self, player: str) -> Dict[str, Any]:
+        return self.first_events[player][2]
 
-    with open(args.evolution, "r") as ifp:
-        evolution_data = json.load(ifp)
+    def items(self) -> List[Tuple[str, Dict[str, int]]]:
+        players = sorted(self.points, key=lambda player: self.first_events[player][:2])
+        return [(player, self.points[player]) for player in players]
 
-    moonstream_data: List[Dict[str, Any]] = full_data["data"]
 
-    moonstream_evolution_data: List[Dict[str, Any]] = evolution_data["data"]
+def handle_sob(args: argparse.Namespace) -> None:
+    milestone_2_cutoff = 29254405
+    milestone_3_cutoff = 30192250
+    milestone_3_end = 31372175
 
-    breeding_events: List[Dict[str, Any]] = []
-    hatching_events: List[Dict[str, Any]] = []
-    evolution_events: List[Dict[str, Any]] = []
+    token_metadata_index: Mapping[str, Dict[str, Any]]
+    if is_binary_snapshot(args.merged):
+        token_metadata_index = MergedSnapshotIndex(BinarySnapshot(args.merged))
+    else:
+        token_metadata_index = load_index(args.merged, "metadata", str)
+
+    player_points = PlayerPoints(
+        {
+            "milestone_1": 0,
+            "milestone_2": 0,
+            "milestone_3": 0,
+            "total_score": 0,
+            "num_breeds": 0,
+            "num_hatches": 0,
+            "num_mythic_hatches": 0,
+            "num_evolutions": 0,
+            "num_breeds_1": 0,
+            "num_breeds_2": 0,
+            "num_breeds_3": 0,
+            "num_hatches_1": 0,
+            "num_hatches_2": 0,
+            "num_hatches_3": 0,
+            "num_mythic_hatches_1": 0,
+            "num_mythic_hatches_2": 0,
+            "num_mythic_hatches_3": 0,
+            "num_evolutions_1": 0,
+            "num_evolutions_2": 0,
+            "num_evolutions_3": 0,
+            "num_hidden_class_3": 0,
+        }
+    )
 
-    for event in moonstream_data:
+    for position, event in enumerate(iter_json_array(args.moonstream)):
         if event["event_type"] == "breeding":
             if event["block_number"] < milestone_2_cutoff:
                 event["milestone_1"] = 50
@@ -742,7 +1777,22 @@ def handle_sob(args: argparse.Namespace) -> None:
                     event["milestone_2"] += 0
                     event["milestone_3"] += 0
 
-            breeding_events.append(event)
+            points = player_points.get(event, BREEDING_EVENTS, position)
+            points["milestone_1"] += event["milestone_1"]
+            points["milestone_2"] += event["milestone_2"]
+            points["milestone_3"] += event["milestone_3"]
+            points["total_score"] += (
+                event["milestone_1"] + event["milestone_2"] + event["milestone_3"]
+            )
+
+            points["num_breeds"] += 1
+            if event["block_number"] < milestone_2_cutoff:
+                points["num_breeds_1"] += 1
+            elif event["block_number"] < milestone_3_cutoff:
+                points["num_breeds_2"] += 1
+            elif event["block_number"] <= milestone_3_end:
+                points["num_breeds_3"] += 1
+                points["num_hidden_class_3"] += event["is_hidden_class"]
 
         elif event["event_type"] == "hatchingEggs":
             event["milestone_1"] = 0
@@ -768,12 +1818,32 @@ def handle_sob(args: argparse.Namespace) -> None:
                     event["milestone_2"] = 0
                     event["milestone_3"] = 0
 
-            hatching_events.append(event)
+            points = player_points.get(event, HATCHING_EVENTS, position)
+            points["milestone_1"] += event["milestone_1"]
+            points["milestone_2"] += event["milestone_2"]
+            points["milestone_3"] += event["milestone_3"]
+            points["total_score"] += (
+                event["milestone_1"] + event["milestone_2"] + event["milestone_3"]
+            )
+            points["num_hatches"] += 1
+            if event["block_number"] < milestone_2_cutoff:
+                points["num_hatches_1"] += 1
+            elif event["block_number"] < milestone_3_cutoff:
+                points["num_hatches_2"] += 1
+            elif event["block_number"] <= milestone_3_end:
+                points["num_hatches_3"] += 1
+
+            points["num_mythic_hatches"] += int(
+                event["milestone_1"] + event["milestone_2"] + event["milestone_3"] > 0
+            )
+            points["num_mythic_hatches_1"] += int(event["milestone_1"] > 0)
+            points["num_mythic_hatches_2"] += int(event["milestone_2"] > 0)
+            points["num_mythic_hatches_3"] += int(event["milestone_3"] > 0)
         else:
             # Other conditions in this if statement in the future.
             pass
 
-    for event in moonstream_evolution_data:
+    for position, event in enumerate(iter_json_array(args.evolution)):
         if event["block_number"] < milestone_2_cutoff:
             event["milestone_1"] = 10
             event["milestone_2"] = 50
@@ -791,146 +1861,25 @@ def handle_sob(args: argparse.Namespace) -> None:
             event["milestone_2"] = 0
             event["milestone_3"] = 0
 
-        evolution_events.append(event)
-
-    player_points: Dict[str, Dict[str, int]] = {}
-    for event in breeding_events:
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {
-                "milestone_1": 0,
-                "milestone_2": 0,
-                "milestone_3": 0,
-                "total_score": 0,
-                "num_breeds": 0,
-                "num_hatches": 0,
-                "num_mythic_hatches": 0,
-                "num_evolutions": 0,
-                "num_breeds_1": 0,
-                "num_breeds_2": 0,
-                "num_breeds_3": 0,
-                "num_hatches_1": 0,
-                "num_hatches_2": 0,
-                "num_hatches_3": 0,
-                "num_mythic_hatches_1": 0,
-                "num_mythic_hatches_2": 0,
-                "num_mythic_hatches_3": 0,
-                "num_evolutions_1": 0,
-                "num_evolutions_2": 0,
-                "num_evolutions_3": 0,
-                "num_hidden_class_3": 0,
-                "block_number": event["block_number"],
-            }
-        player_points[player]["milestone_1"] += event["milestone_1"]
-        player_points[player]["milestone_2"] += event["milestone_2"]
-        player_points[player]["milestone_3"] += event["milestone_3"]
-        player_points[player]["total_score"] += (
-            event["milestone_1"] + event["milestone_2"] + event["milestone_3"]
-        )
-
-        player_points[player]["num_breeds"] += 1
-        if event["block_number"] < milestone_2_cutoff:
-            player_points[player]["num_breeds_1"] += 1
-        elif event["block_number"] < milestone_3_cutoff:
-            player_points[player]["num_breeds_2"] += 1
-        elif event["block_number"] <= milestone_3_end:
-            player_points[player]["num_breeds_3"] += 1
-            player_points[player]["num_hidden_class_3"] += event["is_hidden_class"]
-
-    for event in hatching_events:
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {
-                "milestone_1": 0,
-                "milestone_2": 0,
-                "milestone_3": 0,
-                "total_score": 0,
-                "num_breeds": 0,
-                "num_hatches": 0,
-                "num_mythic_hatches": 0,
-                "num_evolutions": 0,
-                "num_breeds_1": 0,
-                "num_breeds_2": 0,
-                "num_breeds_3": 0,
-                "num_hatches_1": 0,
-                "num_hatches_2": 0,
-                "num_hatches_3": 0,
-                "num_mythic_hatches_1": 0,
-                "num_mythic_hatches_2": 0,
-                "num_mythic_hatches_3": 0,
-                "num_evolutions_1": 0,
-                "num_evolutions_2": 0,
-                "num_evolutions_3": 0,
-                "num_hidden_class_3": 0,
-                "block_number": event["block_number"],
-            }
-        player_points[player]["milestone_1"] += event["milestone_1"]
-        player_points[player]["milestone_2"] += event["milestone_2"]
-        player_points[player]["milestone_3"] += event["milestone_3"]
-        player_points[player]["total_score"] += (
-            event["milestone_1"] + event["milestone_2"] + event["milestone_3"]
-        )
-        player_points[player]["num_hatches"] += 1
-        if event["block_number"] < milestone_2_cutoff:
-            player_points[player]["num_hatches_1"] += 1
-        elif event["block_number"] < milestone_3_cutoff:
-            player_points[player]["num_hatches_2"] += 1
-        elif event["block_number"] <= milestone_3_end:
-            player_points[player]["num_hatches_3"] += 1
-
-        player_points[player]["num_mythic_hatches"] += int(
-            event["milestone_1"] + event["milestone_2"] + event["milestone_3"] > 0
-        )
-        player_points[player]["num_mythic_hatches_1"] += int(event["milestone_1"] > 0)
-        player_points[player]["num_mythic_hatches_2"] += int(event["milestone_2"] > 0)
-        player_points[player]["num_mythic_hatches_3"] += int(event["milestone_3"] > 0)
-
-    for event in evolution_events:
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {
-                "milestone_1": 0,
-                "milestone_2": 0,
-                "milestone_3": 0,
-                "total_score": 0,
-                "num_breeds": 0,
-                "num_hatches": 0,
-                "num_mythic_hatches": 0,
-                "num_evolutions": 0,
-                "num_breeds_1": 0,
-                "num_breeds_2": 0,
-                "num_breeds_3": 0,
-                "num_hatches_1": 0,
-                "num_hatches_2": 0,
-                "num_hatches_3": 0,
-                "num_mythic_hatches_1": 0,
-                "num_mythic_hatches_2": 0,
-                "num_mythic_hatches_3": 0,
-                "num_evolutions_1": 0,
-                "num_evolutions_2": 0,
-                "num_evolutions_3": 0,
-                "num_hidden_class_3": 0,
-                "block_number": event["block_number"],
-            }
-
-        player_points[player]["milestone_1"] += event["milestone_1"]
-        player_points[player]["milestone_2"] += event["milestone_2"]
-        player_points[player]["milestone_3"] += event["milestone_3"]
-        player_points[player]["total_score"] += (
-            event["milestone_2"] + event["milestone_3"]
-        )
+        points = player_points.get(event, EVOLUTION_EVENTS, position)
+        points["milestone_1"] += event["milestone_1"]
+        points["milestone_2"] += event["milestone_2"]
+        points["milestone_3"] += event["milestone_3"]
+        points["total_score"] += event["milestone_2"] + event["milestone_3"]
 
-        player_points[player]["num_evolutions"] += 1
+        points["num_evolutions"] += 1
         if event["block_number"] < milestone_2_cutoff:
-            player_points[player]["num_evolutions_1"] += 1
-            player_points[player]["num_evolutions_2"] += 1
+            points["num_evolutions_1"] += 1
+            points["num_evolutions_2"] += 1
         elif event["block_number"] < milestone_3_cutoff:
-            player_points[player]["num_evolutions_2"] += 1
+            points["num_evolutions_2"] += 1
         elif event["block_number"] <= milestone_3_end:
-            player_points[player]["num_evolutions_3"] += 1
+            points["num_evolutions_3"] += 1
 
     scores: List[Dict[str, Any]] = []
     for player, points in player_points.items():
+        # The block number of the event in which the player first showed up.
+        points["block_number"] = player_points.first_event(player)["block_number"]
         scores.append(
             {
                 "address": player,
@@ -941,91 +1890,49 @@ def handle_sob(args: argparse.Namespace) -> None:
 
     scores.sort(key=lambda item: item["score"], reverse=True)
 
-    print(json.dumps(scores))
+    print_json(scores)
 
 
 def handle_fall_event_2022(args: argparse.Namespace) -> None:
-    mythic_body_parts_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.mythic_body_parts, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            mythic_body_parts_index[str(item["token_id"])] = item
-
-    stats_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.stats, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            stats_index[str(item["token_id"])] = item
-
-    metadata_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.metadata, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            metadata_index[str(item["token_id"])] = item
-
-    with open(args.breeding_hatching_events, "r") as ifp:
-        breeding_hatching_data = json.load(ifp)
-
-    with open(args.evolution_events, "r") as ifp:
-        evolution_data = json.load(ifp)
-
-    moonstream_breeding_hatching_data: List[Dict[str, Any]] = breeding_hatching_data[
-        "data"
-    ]
-
-    breeding_events: List[Dict[str, Any]] = [
-        event
-        for event in moonstream_breeding_hatching_data
-        if event["event_type"] == "breeding"
-    ]
-    hatching_events: List[Dict[str, Any]] = [
-        event
-        for event in moonstream_breeding_hatching_data
-        if event["event_type"] == "hatchingEggs"
-    ]
-    evolution_events: List[Dict[str, Any]] = evolution_data["data"]
-
-    default_player_points = {
-        "num_bred": 0,
-        "num_evolved": 0,
-        "num_evolved_with_at_least_1300_stat_points": 0,
-        "num_mythic_body_parts_hatched": 0,
-    }
-
-    player_points: Dict[str, Dict[str, int]] = {}
-    for event in breeding_events:
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {**default_player_points}
-
-        player_points[player]["num_bred"] += 1
-
-    for event in hatching_events:
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {**default_player_points}
-
-        token_id = str(event["token"])
-        mythic_body_parts_info = mythic_body_parts_index[token_id]
-        if metadata_index.get(token_id) is not None:
-            if (
-                metadata_index[token_id].get("lifecycle_stage") is not None
-                and metadata_index[token_id]["lifecycle_stage"] != 0
-            ):
-                player_points[player][
-                    "num_mythic_body_parts_hatched"
-                ] += mythic_body_parts_info["num_mythic_body_parts"]
-
-    for event in evolution_events:
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {**default_player_points}
+    mythic_body_parts_index = load_index(
+        args.mythic_body_parts, "mythic_body_parts", str
+    )
+    stats_index = load_index(args.stats, "stats", str)
+    metadata_index = load_index(args.metadata, "metadata", str)
+
+    player_points = PlayerPoints(
+        {
+            "num_bred": 0,
+            "num_evolved": 0,
+            "num_evolved_with_at_least_1300_stat_points": 0,
+            "num_mythic_body_parts_hatched": 0,
+        }
+    )
+    for position, event in enumerate(iter_json_array(args.breeding_hatching_events)):
+        if event["event_type"] == "breeding":
+            points = player_points.get(event, BREEDING_EVENTS, position)
+            points["num_bred"] += 1
 
-        player_points[player]["num_evolved"] += 1
+        elif event["event_type"] == "hatchingEggs":
+            points = player_points.get(event, HATCHING_EVENTS, position)
+            token_id = str(event["token"])
+            mythic_body_parts_info = mythic_body_parts_index[token_id]
+            if metadata_index.get(token_id) is not None:
+                if (
+                    metadata_index[token_id].get("lifecycle_stage") is not None
+                    and metadata_index[token_id]["lifecycle_stage"] != 0
+                ):
+                    points["num_mythic_body_parts_hatched"] += mythic_body_parts_info[
+                        "num_mythic_body_parts"
+                    ]
+
+    for position, event in enumerate(iter_json_array(args.evolution_events)):
+        points = player_points.get(event, EVOLUTION_EVENTS, position)
+        points["num_evolved"] += 1
         token_id = str(event["token"])
         sum_stats = stats_index.get(token_id, {}).get("sum_stats", 0)
         if sum_stats >= 1300:
-            player_points[player]["num_evolved_with_at_least_1300_stat_points"] += 1
+            points["num_evolved_with_at_least_1300_stat_points"] += 1
 
     scores: List[Dict[str, Any]] = []
     for player, points in player_points.items():
@@ -1045,138 +1952,93 @@ def handle_fall_event_2022(args: argparse.Namespace) -> None:
 
     scores.sort(key=lambda item: item["score"], reverse=True)
 
-    print(json.dumps(scores))
+    print_json(scores)
 
 
 def handle_spring_event_2023(args: argparse.Namespace) -> None:
     # Refer to: https://github.com/bugout-dev/autocorns/issues/23
     milestone_1_cutoff = 1682899200
     milestone_2_cutoff = 1685577600
-    mythic_body_parts_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.mythic_body_parts, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            mythic_body_parts_index[str(item["token_id"])] = item
-
-    stats_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.stats, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            stats_index[str(item["token_id"])] = item
-
-    metadata_index: Dict[str, Dict[str, Any]] = {}
-    with open(args.metadata, "r") as ifp:
-        for line in ifp:
-            item = json.loads(line.strip())
-            metadata_index[str(item["token_id"])] = item
-
-    with open(args.breeding_hatching_events, "r") as ifp:
-        breeding_hatching_data = json.load(ifp)
-
-    with open(args.evolution_events, "r") as ifp:
-        evolution_data = json.load(ifp)
-
-    moonstream_breeding_hatching_data: List[Dict[str, Any]] = breeding_hatching_data[
-        "data"
-    ]
-
-    breeding_events: List[Dict[str, Any]] = [
-        event
-        for event in moonstream_breeding_hatching_data
-        if event["event_type"] == "breeding"
-    ]
-    hatching_events: List[Dict[str, Any]] = [
-        event
-        for event in moonstream_breeding_hatching_data
-        if event["event_type"] == "hatchingEggs"
-    ]
-    evolution_events: List[Dict[str, Any]] = evolution_data["data"]
-
-    default_player_points = {
-        "num_bred": 0,
-        "num_evolved": 0,
-        "num_evolved_with_at_least_1350_stat_points": 0,
-        "num_mythic_body_parts_hatched": 0,
-        "num_bred_milestone_1": 0,
-        "num_evolved_milestone_1": 0,
-        "num_evolved_with_at_least_1350_stat_points_milestone_1": 0,
-        "num_mythic_body_parts_hatched_milestone_1": 0,
-        "num_bred_milestone_2": 0,
-        "num_evolved_milestone_2": 0,
-        "num_evolved_with_at_least_1350_stat_points_milestone_2": 0,
-        "num_mythic_body_parts_hatched_milestone_2": 0,
-        "num_bred_milestone_3": 0,
-        "num_evolved_milestone_3": 0,
-        "num_evolved_with_at_least_1350_stat_points_milestone_3": 0,
-        "num_mythic_body_parts_hatched_milestone_3": 0,
-        "score_milestone_1": 0,
-        "score_milestone_2": 0,
-        "score_milestone_3": 0,
-    }
-
-    player_points: Dict[str, Dict[str, int]] = {}
-    for event in breeding_events:
-        milestone = "milestone_3"
-        if event["block_timestamp"] < milestone_1_cutoff:
-            milestone = "milestone_1"
-        elif event["block_timestamp"] < milestone_2_cutoff:
-            milestone = "milestone_2"
-
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {**default_player_points}
-
-        player_points[player]["num_bred"] += 1
-        player_points[player][f"num_bred_{milestone}"] += 1
-
-    for event in hatching_events:
-        milestone = "milestone_3"
-        if event["block_timestamp"] < milestone_1_cutoff:
-            milestone = "milestone_1"
-        elif event["block_timestamp"] < milestone_2_cutoff:
-            milestone = "milestone_2"
+    mythic_body_parts_index = load_index(
+        args.mythic_body_parts, "mythic_body_parts", str
+    )
+    stats_index = load_index(args.stats, "stats", str)
+    metadata_index = load_index(args.metadata, "metadata", str)
+
+    player_points = PlayerPoints(
+        {
+            "num_bred": 0,
+            "num_evolved": 0,
+            "num_evolved_with_at_least_1350_stat_points": 0,
+            "num_mythic_body_parts_hatched": 0,
+            "num_bred_milestone_1": 0,
+            "num_evolved_milestone_1": 0,
+            "num_evolved_with_at_least_1350_stat_points_milestone_1": 0,
+            "num_mythic_body_parts_hatched_milestone_1": 0,
+            "num_bred_milestone_2": 0,
+            "num_evolved_milestone_2": 0,
+            "num_evolved_with_at_least_1350_stat_points_milestone_2": 0,
+            "num_mythic_body_parts_hatched_milestone_2": 0,
+            "num_bred_milestone_3": 0,
+            "num_evolved_milestone_3": 0,
+            "num_evolved_with_at_least_1350_stat_points_milestone_3": 0,
+            "num_mythic_body_parts_hatched_milestone_3": 0,
+            "score_milestone_1": 0,
+            "score_milestone_2": 0,
+            "score_milestone_3": 0,
+        }
+    )
 
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {**default_player_points}
+    for position, event in enumerate(iter_json_array(args.breeding_hatching_events)):
+        if event["event_type"] == "breeding":
+            milestone = "milestone_3"
+            if event["block_timestamp"] < milestone_1_cutoff:
+                milestone = "milestone_1"
+            elif event["block_timestamp"] < milestone_2_cutoff:
+                milestone = "milestone_2"
+            points = player_points.get(event, BREEDING_EVENTS, position)
+            points["num_bred"] += 1
+            points[f"num_bred_{milestone}"] += 1
 
-        token_id = str(event["token"])
-        mythic_body_parts_info = mythic_body_parts_index.get(token_id)
-        if (
-            mythic_body_parts_info is not None
-            and metadata_index.get(token_id) is not None
-        ):
+        elif event["event_type"] == "hatchingEggs":
+            milestone = "milestone_3"
+            if event["block_timestamp"] < milestone_1_cutoff:
+                milestone = "milestone_1"
+            elif event["block_timestamp"] < milestone_2_cutoff:
+                milestone = "milestone_2"
+            points = player_points.get(event, HATCHING_EVENTS, position)
+            token_id = str(event["token"])
+            mythic_body_parts_info = mythic_body_parts_index.get(token_id)
             if (
-                metadata_index[token_id].get("lifecycle_stage") is not None
-                and metadata_index[token_id]["lifecycle_stage"] != 0
-                and mythic_body_parts_info["num_mythic_body_parts"] != 6
+                mythic_body_parts_info is not None
+                and metadata_index.get(token_id) is not None
             ):
-                player_points[player][
-                    "num_mythic_body_parts_hatched"
-                ] += mythic_body_parts_info["num_mythic_body_parts"]
-                player_points[player][
-                    f"num_mythic_body_parts_hatched_{milestone}"
-                ] += mythic_body_parts_info["num_mythic_body_parts"]
-
-    for event in evolution_events:
+                if (
+                    metadata_index[token_id].get("lifecycle_stage") is not None
+                    and metadata_index[token_id]["lifecycle_stage"] != 0
+                    and mythic_body_parts_info["num_mythic_body_parts"] != 6
+                ):
+                    points["num_mythic_body_parts_hatched"] += mythic_body_parts_info[
+                        "num_mythic_body_parts"
+                    ]
+                    points[
+                        f"num_mythic_body_parts_hatched_{milestone}"
+                    ] += mythic_body_parts_info["num_mythic_body_parts"]
+
+    for position, event in enumerate(iter_json_array(args.evolution_events)):
         milestone = "milestone_3"
         if event["block_timestamp"] < milestone_1_cutoff:
             milestone = "milestone_1"
         elif event["block_timestamp"] < milestone_2_cutoff:
             milestone = "milestone_2"
-        player = event["player_wallet"]
-        if player_points.get(player) is None:
-            player_points[player] = {**default_player_points}
-
-        player_points[player]["num_evolved"] += 1
-        player_points[player][f"num_evolved_{milestone}"] += 1
+        points = player_points.get(event, EVOLUTION_EVENTS, position)
+        points["num_evolved"] += 1
+        points[f"num_evolved_{milestone}"] += 1
         token_id = str(event["token"])
         sum_stats = stats_index.get(token_id, {}).get("sum_stats", 0)
         if sum_stats >= 1350:
-            player_points[player]["num_evolved_with_at_least_1350_stat_points"] += 1
-            player_points[player][
-                f"num_evolved_with_at_least_1350_stat_points_{milestone}"
-            ] += 1
+            points["num_evolved_with_at_least_1350_stat_points"] += 1
+            points[f"num_evolved_with_at_least_1350_stat_points_{milestone}"] += 1
 
     scores: List[Dict[str, Any]] = []
     for player, points in player_points.items():
@@ -1223,14 +2085,15 @@ def handle_spring_event_2023(args: argparse.Namespace) -> None:
                 "MOONSTREAM_LEADERBOARDS_ACCESS_TOKEN not set. If you pass a --leaderboard-id, you need to set MOONSTREAM_LEADERBOARDS_ACCESS_TOKEN."
             )
 
+        engine_api = args.engine_api.rstrip("/")
         response = requests.put(
-            f"https://engineapi.moonstream.to/leaderboard/{str(args.leaderboard_id)}/scores",
+            f"{engine_api}/leaderboard/{str(args.leaderboard_id)}/scores",
             headers={"Authorization": f"Bearer {leaderboards_access_token}"},
             json=scores,
         )
         response.raise_for_status()
 
-    print(json.dumps(scores))
+    print_json(scores)
 
 
 def handle_leaderboard_to_csv(args: argparse.Namespace) -> None:
@@ -1238,7 +2101,7 @@ def handle_leaderboard_to_csv(args: argparse.Namespace) -> None:
     Converts leaderboard JSON file into CSV.
     """
     with open(args.infile, "r") as ifp:
-        leaderboard = json.load(ifp)
+        leaderboard = load(ifp)
 
     if len(leaderboard) == 0:
         raise ValueError("Empty leaderboard")
@@ -1264,6 +2127,10 @@ def generate_cli() -> argparse.ArgumentParser:
 
     dnas_parser = subparsers.add_parser("dnas")
     StatsFacet.add_default_arguments(dnas_parser, False)
+    add_multicall_arguments(dnas_parser)
+    add_incremental_arguments(dnas_parser)
+    add_refresh_arguments(dnas_parser)
+    add_token_bitmap_arguments(dnas_parser)
     dnas_parser.add_argument(
         "--start",
         type=int,
@@ -1277,7 +2144,9 @@ def generate_cli() -> argparse.ArgumentParser:
         help="Ending token ID to get DNA for. (If not set, just gets the DNA for the token with the --start token ID.)",
     )
     dnas_parser.add_argument(
-        "--checkpoint", default=None, help="Checkpoint file (optional)"
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (optional). Files ending in .sqlite, .sqlite3 or .db are SQLite checkpoints, anything else is JSON lines.",
     )
     dnas_parser.add_argument(
         "--leak-rate",
@@ -1291,6 +2160,10 @@ def generate_cli() -> argparse.ArgumentParser:
 
     metadata_parser = subparsers.add_parser("metadata")
     StatsFacet.add_default_arguments(metadata_parser, False)
+    add_multicall_arguments(metadata_parser)
+    add_incremental_arguments(metadata_parser)
+    add_refresh_arguments(metadata_parser)
+    add_token_bitmap_arguments(metadata_parser)
     metadata_parser.add_argument(
         "--start",
         type=int,
@@ -1304,7 +2177,9 @@ def generate_cli() -> argparse.ArgumentParser:
         help="Ending token ID to get DNA for. (If not set, just gets the DNA for the token with the --start token ID.)",
     )
     metadata_parser.add_argument(
-        "--checkpoint", default=None, help="Checkpoint file (optional)"
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (optional). Files ending in .sqlite, .sqlite3 or .db are SQLite checkpoints, anything else is JSON lines.",
     )
     metadata_parser.add_argument(
         "--leak-rate",
@@ -1318,13 +2193,19 @@ def generate_cli() -> argparse.ArgumentParser:
 
     mythic_body_parts_parser = subparsers.add_parser("mythic-body-parts")
     StatsFacet.add_default_arguments(mythic_body_parts_parser, False)
+    add_multicall_arguments(mythic_body_parts_parser)
+    add_incremental_arguments(mythic_body_parts_parser)
+    add_refresh_arguments(mythic_body_parts_parser)
+    add_dna_cache_arguments(mythic_body_parts_parser)
     mythic_body_parts_parser.add_argument(
         "--dnas",
         required=True,
-        help='Path to JSON file containing results of "autocorns biologist dnas".',
+        help='Path to JSON file containing results of "autocorns biologist dnas" (or a binary snapshot).',
     )
     mythic_body_parts_parser.add_argument(
-        "--checkpoint", default=None, help="Checkpoint file (optional)"
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (optional). Files ending in .sqlite, .sqlite3 or .db are SQLite checkpoints, anything else is JSON lines.",
     )
     mythic_body_parts_parser.add_argument(
         "--leak-rate",
@@ -1338,13 +2219,19 @@ def generate_cli() -> argparse.ArgumentParser:
 
     stats_parser = subparsers.add_parser("stats")
     StatsFacet.add_default_arguments(stats_parser, False)
+    add_multicall_arguments(stats_parser)
+    add_incremental_arguments(stats_parser)
+    add_refresh_arguments(stats_parser)
+    add_dna_cache_arguments(stats_parser)
     stats_parser.add_argument(
         "--dnas",
         required=True,
-        help='Path to JSON file containing results of "autocorns biologist dnas".',
+        help='Path to JSON file containing results of "autocorns biologist dnas" (or a binary snapshot).',
     )
     stats_parser.add_argument(
-        "--checkpoint", default=None, help="Checkpoint file (optional)"
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (optional). Files ending in .sqlite, .sqlite3 or .db are SQLite checkpoints, anything else is JSON lines.",
     )
     stats_parser.add_argument(
         "--leak-rate",
@@ -1356,16 +2243,162 @@ def generate_cli() -> argparse.ArgumentParser:
 
     stats_parser.set_defaults(func=handle_stats)
 
+    snapshot_parser = subparsers.add_parser(
+        "snapshot",
+        description="Crawls DNAs, metadata, mythic body parts and stats into dnas.json, metadata.json, mythic-body-parts.json and stats.json in the data directory. Calls for different methods share multicalls, so this takes about half as many RPC requests as running the dnas, metadata, mythic-body-parts and stats commands.",
+    )
+    StatsFacet.add_default_arguments(snapshot_parser, False)
+    add_multicall_arguments(snapshot_parser)
+    add_incremental_arguments(snapshot_parser)
+    add_refresh_arguments(snapshot_parser)
+    add_token_bitmap_arguments(snapshot_parser)
+    add_dna_cache_arguments(snapshot_parser)
+    snapshot_parser.add_argument(
+        "--start",
+        type=int,
+        required=True,
+        help="Starting token ID to crawl.",
+    )
+    snapshot_parser.add_argument(
+        "--end",
+        type=int,
+        required=False,
+        help="Ending token ID to crawl. (If not set, just crawls the token with the --start token ID.)",
+    )
+    snapshot_parser.add_argument(
+        "--data-dir",
+        required=True,
+        help="Directory in which to write the snapshot files",
+    )
+    snapshot_parser.add_argument(
+        "--checkpoint",
+        action="store_true",
+        help="Use the snapshot files already in the data directory as checkpoints",
+    )
+    snapshot_parser.add_argument(
+        "--leak-rate",
+        type=float,
+        required=False,
+        default=None,
+        help="Rate at which data should leak out of checkpoint",
+    )
+    snapshot_parser.add_argument(
+        "--format",
+        choices=["jsonl", "sqlite"],
+        default="jsonl",
+        help=f"Write the snapshot as JSON lines files (default), or as tables in {SNAPSHOT_STORE_FILE} that only get new results appended",
+    )
+    snapshot_parser.add_argument(
+        "--pipeline-buffer",
+        type=int,
+        default=DEFAULT_PIPELINE_BUFFER,
+        help=f"Maximum number of crawled DNAs waiting for their mythic body parts and stats to be crawled (default: {DEFAULT_PIPELINE_BUFFER})",
+    )
+
+    snapshot_parser.set_defaults(func=handle_snapshot)
+
+    pack_parser = subparsers.add_parser(
+        "pack",
+        description="Packs a snapshot into a single memory mapped binary file, indexed by token ID. Any command that reads DNAs, metadata, mythic body parts, stats or merged data accepts the binary file in place of the JSON lines file.",
+    )
+    pack_parser.add_argument(
+        "--data-dir",
+        required=True,
+        help='Directory containing a snapshot generated by "autocorns biologist snapshot"',
+    )
+    pack_parser.add_argument(
+        "--format",
+        choices=["jsonl", "sqlite"],
+        default="jsonl",
+        help="Format of the snapshot (default: jsonl)",
+    )
+    pack_parser.add_argument(
+        "-o",
+        "--outfile",
+        required=True,
+        help="File to write the binary snapshot to",
+    )
+
+    pack_parser.set_defaults(func=handle_pack)
+
+    decoder_tables_parser = subparsers.add_parser(
+        "decoder-tables",
+        description="Reads the tables that the decode command needs to compute mythic body parts and stats from DNAs, through the getters of the DNAMigrationFacet.",
+    )
+    DNAMigrationFacet.add_default_arguments(decoder_tables_parser, False)
+    add_multicall_arguments(decoder_tables_parser)
+    decoder_tables_parser.add_argument(
+        "-o",
+        "--outfile",
+        required=True,
+        help="JSON file to write the tables to",
+    )
+
+    decoder_tables_parser.set_defaults(func=handle_decoder_tables)
+
+    decode_parser = subparsers.add_parser(
+        "decode",
+        description="Computes mythic body parts and stats from DNAs without calling the contract, and writes them to mythic-body-parts.json and stats.json in the data directory. Run verify-decoder first to check the decoder against the contract.",
+    )
+    decode_parser.add_argument(
+        "--dnas",
+        required=True,
+        help='Path to JSON file containing results of "autocorns biologist dnas" (or dnas.json from a snapshot, or a binary snapshot).',
+    )
+    decode_parser.add_argument(
+        "--tables",
+        required=True,
+        help='Tables file generated by "autocorns biologist decoder-tables"',
+    )
+    decode_parser.add_argument(
+        "--data-dir",
+        required=True,
+        help="Directory in which to write mythic-body-parts.json and stats.json",
+    )
+
+    decode_parser.set_defaults(func=handle_decode)
+
+    verify_decoder_parser = subparsers.add_parser(
+        "verify-decoder",
+        description="Reads the DNAs of a random sample of the tokens in a DNA crawl with getDNA, and compares the results of the decode command on them with getUnicornBodyPartsLocal, getUnicornMetadata, getUnicornBodyParts and getStats on the DNAMigrationFacet. Prints a report, and exits with a non-zero status if any DNA was decoded differently.",
+    )
+    DNAMigrationFacet.add_default_arguments(verify_decoder_parser, False)
+    add_multicall_arguments(verify_decoder_parser)
+    verify_decoder_parser.add_argument(
+        "--dnas",
+        required=True,
+        help='Path to JSON file containing results of "autocorns biologist dnas" (or dnas.json from a snapshot, or a binary snapshot).',
+    )
+    verify_decoder_parser.add_argument(
+        "--tables",
+        required=True,
+        help='Tables file generated by "autocorns biologist decoder-tables"',
+    )
+    verify_decoder_parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=1000,
+        help="Number of tokens to check (default: 1000)",
+    )
+    verify_decoder_parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Random seed for the sample (optional)",
+    )
+
+    verify_decoder_parser.set_defaults(func=handle_verify_decoder)
+
     merge_parser = subparsers.add_parser("merge")
     merge_parser.add_argument(
         "--metadata",
         required=True,
-        help='Metadata file generated by "autocorns biologist metadata"',
+        help='Metadata file generated by "autocorns biologist metadata" (or a binary snapshot)',
     )
     merge_parser.add_argument(
         "--mythic-body-parts",
         required=True,
-        help='Mythic body parts file generated by "autocorns biologist mythic-body-parts"',
+        help='Mythic body parts file generated by "autocorns biologist mythic-body-parts" (or a binary snapshot)',
     )
 
     merge_parser.set_defaults(func=handle_merge)
@@ -1374,7 +2407,7 @@ def generate_cli() -> argparse.ArgumentParser:
     sob_parser.add_argument(
         "--merged",
         required=True,
-        help='Merged file generated by "autocorns biologist merge"',
+        help='Merged file generated by "autocorns biologist merge" (or a binary snapshot)',
     )
     sob_parser.add_argument(
         "--moonstream",
@@ -1393,15 +2426,17 @@ def generate_cli() -> argparse.ArgumentParser:
     fall_event_2022_parser.add_argument(
         "--mythic-body-parts",
         required=True,
-        help="Checkpoint file for mythic body parts",
+        help="Checkpoint file for mythic body parts (or a binary snapshot)",
     )
     fall_event_2022_parser.add_argument(
-        "--stats", required=True, help="Checkpoint file for Unicorn stats"
+        "--stats",
+        required=True,
+        help="Checkpoint file for Unicorn stats (or a binary snapshot)",
     )
     fall_event_2022_parser.add_argument(
         "--metadata",
         required=True,
-        help="Checkpoint file for Unicorn metadata",
+        help="Checkpoint file for Unicorn metadata (or a binary snapshot)",
     )
     fall_event_2022_parser.add_argument(
         "--breeding-hatching-events",
@@ -1420,15 +2455,17 @@ def generate_cli() -> argparse.ArgumentParser:
     spring_event_2023_parser.add_argument(
         "--mythic-body-parts",
         required=True,
-        help="Checkpoint file for mythic body parts",
+        help="Checkpoint file for mythic body parts (or a binary snapshot)",
     )
     spring_event_2023_parser.add_argument(
-        "--stats", required=True, help="Checkpoint file for Unicorn stats"
+        "--stats",
+        required=True,
+        help="Checkpoint file for Unicorn stats (or a binary snapshot)",
     )
     spring_event_2023_parser.add_argument(
         "--metadata",
         required=True,
-        help="Checkpoint file for Unicorn metadata",
+        help="Checkpoint file for Unicorn metadata (or a binary snapshot)",
     )
     spring_event_2023_parser.add_argument(
         "--breeding-hatching-events",
@@ -1447,6 +2484,11 @@ def generate_cli() -> argparse.ArgumentParser:
         type=uuid.UUID,
         help="If a Leaderboard ID is provided, the biologist will push the scores to that Moonstream leaderboard. It expects an API access token stored under MOONSTREAM_LEADERBOARDS_ACCESS_TOKEN.",
     )
+    spring_event_2023_parser.add_argument(
+        "--engine-api",
+        default="https://engineapi.moonstream.to",
+        help="Moonstream Engine API URL to push the leaderboard to (default: https://engineapi.moonstream.to)",
+    )
 
     spring_event_2023_parser.set_defaults(func=handle_spring_event_2023)
 
@@ -1476,13 +2518,16 @@ def generate_cli() -> argparse.ArgumentParser:
     )
 
     moonstream_events_parser.add_argument(
-        "--interval", type=float, default=2.0, help="Polling interval for updated data"
+        "--interval",
+        type=float,
+        default=DEFAULT_MAX_INTERVAL,
+        help=f"Maximum number of seconds between polls for updated data. Polls start {INITIAL_INTERVAL} seconds apart and back off exponentially up to this interval. (default: {DEFAULT_MAX_INTERVAL})",
     )
     moonstream_events_parser.add_argument(
         "--max-retries",
         type=int,
         default=0,
-        help="Maximum number of retries for data (0 means unlimited).",
+        help="Maximum number of polls for updated data before the query is requested again (0 means unlimited).",
     )
     moonstream_events_parser.add_argument(
         "-o",
@@ -1492,11 +2537,99 @@ def generate_cli() -> argparse.ArgumentParser:
         help="(Optional) file to write output to. Default: sys.stdout",
     )
 
+    add_window_arguments(moonstream_events_parser)
+
     moonstream_events_parser.set_defaults(func=handle_moonstream_events)
 
-    total_supply_parser = subparsers.add_parser("total-supply")
+    moonstream_queries_parser = subparsers.add_parser(
+        "moonstream-queries",
+        description="Fetches several Moonstream queries at the same time, each into its own file, and prints a JSON summary (with timings) of each fetch",
+    )
+    moonstream_queries_parser.add_argument(
+        "--api",
+        default="https://api.moonstream.to",
+        help="Moonstream API URL (default: https://api.moonstream.to). Access token expected to be set as MOONSTREAM_ACCESS_TOKEN environment variable.",
+    )
+    moonstream_queries_parser.add_argument(
+        "-q",
+        "--query",
+        nargs=2,
+        metavar=("QUERY_NAME", "OUTFILE"),
+        action="append",
+        required=True,
+        help="Name of a Moonstream Query API query, and the file to write its results to. Pass once per query.",
+    )
+    moonstream_queries_parser.add_argument(
+        "--query-params",
+        nargs=2,
+        metavar=("QUERY_NAME", "JSON"),
+        action="append",
+        default=[],
+        help="Parameters for one of the queries, as a JSON object (e.g. '{\"season\": 2}'), on top of (or overriding) start_timestamp and end_timestamp",
+    )
+    moonstream_queries_parser.add_argument(
+        "--start",
+        required=True,
+        type=int,
+        help="Starting timestamp for data generation (the start_timestamp parameter of every query)",
+    )
+    moonstream_queries_parser.add_argument(
+        "--end",
+        type=int,
+        required=False,
+        help="Ending timestamp for data generation (the end_timestamp parameter of every query, default: now)",
+    )
+    moonstream_queries_parser.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_MAX_INTERVAL,
+        help=f"Maximum number of seconds between polls for updated data. Polls start {INITIAL_INTERVAL} seconds apart and back off exponentially up to this interval. (default: {DEFAULT_MAX_INTERVAL})",
+    )
+    moonstream_queries_parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=0,
+        help="Maximum number of polls for updated data before a query is requested again (0 means unlimited).",
+    )
+
+    add_window_arguments(moonstream_queries_parser)
+
+    moonstream_queries_parser.set_defaults(func=handle_moonstream_queries)
+
+    total_supply_parser = subparsers.add_parser(
+        "total-supply",
+        description="Prints the number of unicorns. With --token-bitmap, reads it from the token bitmap instead of calling the contract.",
+    )
     ERC721WithDiamondStorage.add_default_arguments(total_supply_parser, False)
-    total_supply_parser.set_defaults(func=ERC721WithDiamondStorage.handle_total_supply)
+    total_supply_parser.add_argument(
+        "--token-bitmap",
+        default=None,
+        help='Token bitmap file, as kept up to date by "autocorns biologist token-bitmap" or by crawls with --token-bitmap (optional)',
+    )
+    total_supply_parser.add_argument(
+        "--max-token-id",
+        action="store_true",
+        help="Print the highest token ID ever minted instead (requires --token-bitmap)",
+    )
+    total_supply_parser.set_defaults(func=handle_total_supply)
+
+    token_bitmap_parser = subparsers.add_parser(
+        "token-bitmap",
+        description="Creates or updates a bitmap of the token IDs that exist, from the contract's Transfer logs, and prints a summary of it",
+    )
+    ERC721WithDiamondStorage.add_default_arguments(token_bitmap_parser, False)
+    token_bitmap_parser.add_argument(
+        "--token-bitmap",
+        required=True,
+        help="Token bitmap file. It is created if it does not exist.",
+    )
+    token_bitmap_parser.add_argument(
+        "--log-range",
+        type=int,
+        default=DEFAULT_LOG_RANGE,
+        help=f"Number of blocks in the first eth_getLogs request. Later requests adapt their ranges to the number of events. (default: {DEFAULT_LOG_RANGE})",
+    )
+    token_bitmap_parser.set_defaults(func=handle_token_bitmap)
 
     leaderboard_to_csv_parser = subparsers.add_parser(
         "leaderboard-to-csv",
@@ -0,0 +1,174 @@
+"""
+Persistent cache of eth_call results at fixed block numbers.
+
+The result of a call to a contract at a given block can never change, so crawls pinned to a block
+number (like the biologist crawls with --block-number) only need to make each call once. The cache
+is a SQLite database keyed by network, contract address, calldata and block number.
+
+Only successful calls are cached. A call that fails inside a multicall may have failed because of
+the multicall (e.g. by running out of gas) rather than because of the state of the chain.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+from .jsonrpc import hex_to_bytes
+
+DEFAULT_CALL_CACHE_FILE = os.environ.get("AUTOCORNS_CALL_CACHE_FILE")
+
+Call = Tuple[str, Union[str, bytes]]
+CallResult = Tuple[bool, Any]
+
+
+class CallCache:
+    """
+    Cache of (success, returnData) results of the calls that make up multicalls.
+
+    A CallCache with no path caches nothing, so crawls can use one unconditionally. Calls at block
+    numbers that are not integers (like "latest") are never cached.
+    """
+
+    def __init__(self, path: Optional[str] = None, network_name: str = "") -> None:
+        self.path = path
+        self.network_name = network_name
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None:
+            cache_dir = os.path.dirname(path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            # Crawl workers share the connection, behind self.lock.
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS calls (
+                    network TEXT NOT NULL,
+                    address BLOB NOT NULL,
+                    calldata BLOB NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    return_data BLOB NOT NULL,
+                    PRIMARY KEY (network, address, calldata, block_number)
+                ) WITHOUT ROWID
+                """)
+            self.connection.commit()
+
+    def enabled_for(self, block_number: Any) -> bool:
+        return self.connection is not None and isinstance(block_number, int)
+
+    def key(self, call: Call, block_number: int) -> Tuple[str, bytes, bytes, int]:
+        address, calldata = call
+        return (
+            self.network_name,
+            hex_to_bytes(address.lower()),
+            hex_to_bytes(calldata),
+            block_number,
+        )
+
+    def lookup(
+        self, calls: Sequence[Call], block_number: Any
+    ) -> Tuple[List[Optional[CallResult]], List[int]]:
+        """
+        Returns the cached result of each call (None if it is not cached), and the positions of
+        the calls that are not cached.
+        """
+        results: List[Optional[CallResult]] = [None] * len(calls)
+        if not self.enabled_for(block_number) or not calls:
+            return results, list(range(len(calls)))
+
+        assert self.connection is not None
+        with self.lock:
+            for i, call in enumerate(calls):
+                row = self.connection.execute(
+                    "SELECT return_data FROM calls WHERE network = ? AND address = ? AND calldata = ? AND block_number = ?",
+                    self.key(call, block_number),
+                ).fetchone()
+                if row is not None:
+                    results[i] = (True, bytes(row[0]))
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        self.hits += len(calls) - len(misses)
+        self.misses += len(misses)
+        return results, misses
+
+    def store(
+        self,
+        calls: Sequence[Call],
+        block_number: Any,
+        results: Sequence[CallResult],
+    ) -> None:
+        """
+        Caches the results of the successful calls among the given calls.
+        """
+        if not self.enabled_for(block_number):
+            return
+        assert self.connection is not None
+        rows = [
+            self.key(call, block_number) + (hex_to_bytes(result[1]),)
+            for call, result in zip(calls, results)
+            if result[0]
+        ]
+        if rows:
+            with self.lock:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO calls (network, address, calldata, block_number, return_data) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self.connection.commit()
+
+    def prepare(
+        self, batches: Sequence[Sequence[Call]], block_number: Any
+    ) -> Tuple[List[Tuple[List[Optional[CallResult]], List[int]]], List[List[Call]]]:
+        """
+        Looks up every call in a list of multicall batches. Returns the lookups (see lookup), and
+        the batches that still have to be sent, with only their uncached calls. Batches that are
+        entirely cached are left out.
+        """
+        lookups = [self.lookup(calls, block_number) for calls in batches]
+        to_send = [
+            [calls[i] for i in misses]
+            for calls, (_, misses) in zip(batches, lookups)
+            if misses
+        ]
+        return lookups, to_send
+
+    def complete(
+        self,
+        batches: Sequence[Sequence[Call]],
+        block_number: Any,
+        lookups: List[Tuple[List[Optional[CallResult]], List[int]]],
+        sent_results: Sequence[Union[Sequence[CallResult], Exception, None]],
+    ) -> List[Union[List[CallResult], Exception, None]]:
+        """
+        Combines the lookups from prepare with the results of sending the batches it returned (a
+        list of results, an Exception or None for each of them), and caches the new results.
+
+        Returns, for each batch, its full list of results, or the Exception (or None) its uncached
+        calls failed with.
+        """
+        completed: List[Union[List[CallResult], Exception, None]] = []
+        sent_iterator = iter(sent_results)
+        for calls, (results, misses) in zip(batches, lookups):
+            if not misses:
+                completed.append(results)  # type: ignore
+                continue
+            sent = next(sent_iterator)
+            if sent is None or isinstance(sent, Exception):
+                completed.append(sent)
+                continue
+            self.store([calls[i] for i in misses], block_number, sent)
+            for i, result in zip(misses, sent):
+                results[i] = result
+            completed.append(results)  # type: ignore
+        return completed
+
+    def close(self) -> None:
+        if self.connection is not None:
+            with self.lock:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,478 @@
+"""
+Checkpoint storage for crawls.
+
+A checkpoint holds one item (a JSON object with a token_id and, usually, a block_number) per
+crawled token. Checkpoints can be stored in two formats, chosen by file extension:
+
+- JSON lines (any extension other than the SQLite ones): the whole file is read at the start of a
+  crawl and rewritten at the end of it. Chunks of results that are appended during the crawl go to
+  a journal file next to it (<checkpoint>.journal), which is folded into the checkpoint when it is
+  rewritten (or, if the crawl was interrupted, when the checkpoint is next loaded).
+- SQLite (.sqlite, .sqlite3 or .db): items are indexed by token ID and block number. New results
+  are appended, so a crawl only writes what it crawled. An item for a token at a later block
+  supersedes the items for that token at earlier blocks, which stay in the file until it is
+  compacted. Committing a crawl deletes the items for tokens that it neither kept nor recrawled,
+  as rewriting a JSON lines checkpoint does.
+
+Both formats stream their items (scan), so crawls do not need to hold a checkpoint in memory: they
+decide what to recrawl from an index of the token IDs and block numbers in it (index_checkpoint),
+and commit the IDs of the tokens they keep.
+
+Appended results are flushed to disk (and fsynced) as soon as they are appended, and checkpoints
+are rewritten through a temporary file that atomically replaces the old one. If a crawl is
+interrupted, loading its checkpoint returns everything it had appended, so a restarted crawl
+resumes from the first chunk that did not finish.
+
+The checkpoints command converts between the two formats.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Union,
+)
+
+from .jsonl import dumps, iter_jsonl, loads, read_jsonl, write_jsonl
+
+SQLITE_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+DEFAULT_TABLE = "items"
+# Number of rows that CheckpointStore.scan reads at a time.
+SCAN_BATCH_SIZE = 1000
+# Keys of checkpoint items that deciding which tokens to recrawl looks at.
+INDEX_KEYS = ("token_id", "block_number", "lifecycle_stage")
+
+
+def iter_journal(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the items in a journal, skipping a last line that was cut short by a crash.
+    """
+    with open(path, "rb") as ifp:
+        for line in ifp:
+            stripped_line = line.strip()
+            if not stripped_line:
+                continue
+            try:
+                item = loads(stripped_line)
+            except json.JSONDecodeError:
+                break
+            yield item
+
+
+def read_journal(path: str) -> List[Dict[str, Any]]:
+    return list(iter_journal(path))
+
+
+def fsync_file(ofp: TextIO) -> None:
+    ofp.flush()
+    os.fsync(ofp.fileno())
+
+
+def replace_jsonl(path: str, items: Iterable[Dict[str, Any]]) -> None:
+    """
+    Writes items to path as JSON lines, so that path holds either its old contents or all the
+    new items, even if the process dies while writing.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as ofp:
+        write_jsonl(items, ofp)
+        fsync_file(ofp)
+    os.replace(temporary_path, path)
+
+
+class JSONLCheckpoint:
+    """
+    Checkpoint stored as a JSON lines file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.journal: Optional[TextIO] = None
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Returns the items in the checkpoint, after recovering the results in the journal of a crawl
+        that did not finish.
+        """
+        if os.path.exists(self.journal_path):
+            self.recover()
+        return list(self.scan())
+
+    def scan(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the items for tokens with IDs between start and end (inclusive, and unbounded if
+        None), in the order they are in the file, after recovering the results in the journal of a
+        crawl that did not finish.
+        """
+        if os.path.exists(self.journal_path):
+            self.recover()
+        if not os.path.exists(self.path):
+            return
+        for item in iter_jsonl(self.path):
+            token_id = item.get("token_id")
+            if start is not None and token_id < start:
+                continue
+            if end is not None and token_id > end:
+                continue
+            yield item
+
+    def recover(self) -> None:
+        """
+        Folds the journal into the checkpoint. Items in the journal replace the items for the same
+        tokens.
+        """
+        journal_items = read_journal(self.journal_path)
+        journal_token_ids = {item.get("token_id") for item in journal_items}
+        items: List[Dict[str, Any]] = []
+        if os.path.exists(self.path):
+            items = read_jsonl(self.path)
+        replace_jsonl(
+            self.path,
+            journal_items
+            + [item for item in items if item.get("token_id") not in journal_token_ids],
+        )
+        os.remove(self.journal_path)
+
+    def append(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Durably adds results to the journal of the checkpoint.
+        """
+        if not results:
+            return
+        if self.journal is None:
+            self.journal = open(self.journal_path, "a")
+        write_jsonl(results, self.journal)
+        fsync_file(self.journal)
+
+    def save(
+        self, results: List[Dict[str, Any]], kept_token_ids: Iterable[Any]
+    ) -> None:
+        """
+        Atomically rewrites the checkpoint with the given results followed by the items for the
+        kept tokens from the previous checkpoint, and removes the journal.
+        """
+        self.append(results)
+        self.commit(kept_token_ids)
+
+    def commit(self, kept_token_ids: Iterable[Any]) -> None:
+        """
+        Atomically rewrites the checkpoint with the results appended since it was loaded followed
+        by the items for the kept tokens from the previous checkpoint, and removes the journal.
+        Both are streamed from disk, so a crawl does not need to hold on to either.
+        """
+        self.close()
+        kept = set(kept_token_ids)
+        journal_token_ids: Set[Any] = set()
+
+        def items() -> Iterator[Dict[str, Any]]:
+            if os.path.exists(self.journal_path):
+                for item in iter_journal(self.journal_path):
+                    journal_token_ids.add(item.get("token_id"))
+                    yield item
+            if os.path.exists(self.path):
+                for item in iter_jsonl(self.path):
+                    token_id = item.get("token_id")
+                    if token_id in kept and token_id not in journal_token_ids:
+                        yield item
+
+        replace_jsonl(self.path, items())
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+class CheckpointStore:
+    """
+    Checkpoint stored in a table of a SQLite file, indexed by token ID and block number.
+    """
+
+    def __init__(self, path: str, table: str = DEFAULT_TABLE) -> None:
+        assert table.isidentifier(), f"Invalid checkpoint table name: {table}"
+        self.path = path
+        self.table = table
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Crawls can append from a background thread, so connection use is serialized by a lock.
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=FULL")
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                token_id INTEGER NOT NULL,
+                block_number INTEGER NOT NULL,
+                item TEXT NOT NULL,
+                PRIMARY KEY (token_id, block_number)
+            ) WITHOUT ROWID
+            """)
+        self.connection.commit()
+        # Tokens with results appended since the checkpoint was opened, which commit keeps.
+        self.appended_token_ids: Set[Any] = set()
+
+    def __contains__(self, token_id: Any) -> bool:
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT 1 FROM {self.table} WHERE token_id = ? LIMIT 1", (token_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            (num_tokens,) = self.connection.execute(
+                f"SELECT COUNT(DISTINCT token_id) FROM {self.table}"
+            ).fetchone()
+        return num_tokens
+
+    def get(self, token_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        Returns the latest item for the given token, or None if there is none.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT item FROM {self.table} WHERE token_id = ? ORDER BY block_number DESC LIMIT 1",
+                (token_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return loads(row[0])
+
+    def scan(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the latest item for each token with an ID between start and end (inclusive, and
+        unbounded if None), in order of token ID.
+        """
+        conditions = []
+        parameters = []
+        if start is not None:
+            conditions.append("token_id >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("token_id <= ?")
+            parameters.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # SQLite takes the bare item column from the row with the largest block number.
+        with self.lock:
+            cursor = self.connection.execute(
+                f"SELECT item, MAX(block_number) FROM {self.table} {where} GROUP BY token_id ORDER BY token_id",
+                parameters,
+            )
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(SCAN_BATCH_SIZE)
+            if not rows:
+                break
+            for item, _ in rows:
+                yield loads(item)
+
+    def upsert(self, items: Iterable[Dict[str, Any]]) -> int:
+        """
+        Appends items to the checkpoint, replacing any items for the same token at the same block.
+        Returns the number of items written.
+        """
+        rows = [
+            (item["token_id"], item.get("block_number", 0), dumps(item))
+            for item in items
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (token_id, block_number, item) VALUES (?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def load(self) -> List[Dict[str, Any]]:
+        return list(self.scan())
+
+    def append(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Durably adds results to the checkpoint.
+        """
+        self.upsert(results)
+        self.appended_token_ids.update(result["token_id"] for result in results)
+
+    def save(
+        self, results: List[Dict[str, Any]], kept_token_ids: Iterable[Any]
+    ) -> None:
+        """
+        Appends the results, and deletes the items for tokens that are neither in the results nor
+        in kept_token_ids, as commit does.
+        """
+        self.append(results)
+        self.commit(kept_token_ids)
+
+    def commit(self, kept_token_ids: Iterable[Any]) -> None:
+        """
+        Results are upserted as they are appended, and the items for the kept tokens are already
+        in the store. What is left is to delete the items for every other token (the ones that
+        expired or leaked but were not recrawled), so that the store holds the same tokens as a
+        JSONLCheckpoint committed with the same kept tokens.
+        """
+        token_ids = [(token_id,) for token_id in kept_token_ids]
+        token_ids.extend((token_id,) for token_id in self.appended_token_ids)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS committed_token_ids (token_id INTEGER PRIMARY KEY)"
+            )
+            self.connection.execute("DELETE FROM committed_token_ids")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO committed_token_ids (token_id) VALUES (?)",
+                token_ids,
+            )
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE token_id NOT IN (SELECT token_id FROM committed_token_ids)"
+            )
+            self.connection.execute("DELETE FROM committed_token_ids")
+        self.appended_token_ids = set()
+
+    def compact(self) -> int:
+        """
+        Deletes items that are superseded by items for the same token at later blocks. Returns the
+        number of items deleted.
+        """
+        with self.lock:
+            with self.connection:
+                cursor = self.connection.execute(f"""
+                    DELETE FROM {self.table} WHERE EXISTS (
+                        SELECT 1 FROM {self.table} AS later
+                        WHERE later.token_id = {self.table}.token_id
+                        AND later.block_number > {self.table}.block_number
+                    )
+                    """)
+            self.connection.execute("VACUUM")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+Checkpoint = Union[JSONLCheckpoint, CheckpointStore]
+
+
+def is_sqlite_path(path: str) -> bool:
+    return path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def open_checkpoint(path: str, table: str = DEFAULT_TABLE) -> Checkpoint:
+    """
+    Opens the checkpoint at the given path, in the format its extension calls for.
+    """
+    if is_sqlite_path(path):
+        return CheckpointStore(path, table)
+    return JSONLCheckpoint(path)
+
+
+def index_checkpoint(
+    checkpoint: Checkpoint, keys: Sequence[str] = INDEX_KEYS
+) -> List[Dict[str, Any]]:
+    """
+    Returns the latest item for each token in the checkpoint, with only the given keys (those it
+    has). By default, these are the keys that deciding which tokens to recrawl looks at, so that a
+    crawl can decide without holding every crawled item in memory.
+    """
+    return [
+        {key: item[key] for key in keys if key in item} for item in checkpoint.scan()
+    ]
+
+
+def handle_import(args: argparse.Namespace) -> None:
+    store = CheckpointStore(args.store, args.table)
+    num_items = store.upsert(read_jsonl(args.jsonl))
+    store.close()
+    print(
+        f"Imported {num_items} items into {args.store} ({args.table})", file=sys.stderr
+    )
+
+
+def handle_export(args: argparse.Namespace) -> None:
+    store = CheckpointStore(args.store, args.table)
+    write_jsonl(store.scan(args.start, args.end), args.outfile)
+    store.close()
+
+
+def handle_compact(args: argparse.Namespace) -> None:
+    store = CheckpointStore(args.store, args.table)
+    num_deleted = store.compact()
+    store.close()
+    print(f"Deleted {num_deleted} superseded items", file=sys.stderr)
+
+
+def generate_cli() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Convert and maintain crawl checkpoints"
+    )
+    parser.set_defaults(func=lambda _: parser.print_help())
+    subparsers = parser.add_subparsers()
+
+    def add_store_arguments(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument(
+            "--store",
+            required=True,
+            help="SQLite checkpoint file (.sqlite, .sqlite3 or .db)",
+        )
+        subparser.add_argument(
+            "--table",
+            default=DEFAULT_TABLE,
+            help=f"Table in the SQLite file that holds the checkpoint (default: {DEFAULT_TABLE})",
+        )
+
+    import_parser = subparsers.add_parser(
+        "import",
+        description="Appends the items of a JSON lines checkpoint to a SQLite checkpoint",
+    )
+    add_store_arguments(import_parser)
+    import_parser.add_argument(
+        "--jsonl", required=True, help="JSON lines checkpoint file to import"
+    )
+    import_parser.set_defaults(func=handle_import)
+
+    export_parser = subparsers.add_parser(
+        "export",
+        description="Writes the latest item for each token in a SQLite checkpoint as JSON lines",
+    )
+    add_store_arguments(export_parser)
+    export_parser.add_argument(
+        "--start", type=int, default=None, help="Only export tokens from this ID on"
+    )
+    export_parser.add_argument(
+        "--end", type=int, default=None, help="Only export tokens up to this ID"
+    )
+    export_parser.add_argument(
+        "-o",
+        "--outfile",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="(Optional) file to write output to. Default: sys.stdout",
+    )
+    export_parser.set_defaults(func=handle_export)
+
+    compact_parser = subparsers.add_parser(
+        "compact",
+        description="Deletes items in a SQLite checkpoint that are superseded by items at later blocks",
+    )
+    add_store_arguments(compact_parser)
+    compact_parser.set_defaults(func=handle_compact)
+
+    return parser
@@ -1,6 +1,16 @@
 import argparse
 
-from . import warden, biologist, crawl_reports, judge, shadowcorns
+from . import (
+    bench,
+    checkpoints,
+    warden,
+    biologist,
+    crawl_reports,
+    judge,
+    localmoonstream,
+    shadowcorns,
+)
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -24,6 +34,17 @@ def main():
     shadowcorns_parser = shadowcorns.generate_cli()
     subparsers.add_parser("shadowcorns", parents=[shadowcorns_parser], add_help=False)
 
+    checkpoints_parser = checkpoints.generate_cli()
+    subparsers.add_parser("checkpoints", parents=[checkpoints_parser], add_help=False)
+
+    bench_parser = bench.generate_cli()
+    subparsers.add_parser("bench", parents=[bench_parser], add_help=False)
+
+    localmoonstream_parser = localmoonstream.generate_cli()
+    subparsers.add_parser(
+        "local-moonstream", parents=[localmoonstream_parser], add_help=False
+    )
+
     args = parser.parse_args()
     args.func(args)
 
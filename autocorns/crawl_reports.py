@@ -1,18 +1,22 @@
 import argparse
-import json
 import sys
-import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from brownie import network, web3
+from brownie import network
 from brownie.network import chain
 from tqdm import tqdm
 
 from . import DNAMigrationFacet
 from . import Multicall2
+from .jsonl import dumps, loads, print_json, write_jsonl
+from .multicall import (
+    add_multicall_arguments,
+    iter_crawl_multicall,
+    multicall_settings_from_args,
+    MulticallSettings,
+)
 from eth_typing.evm import ChecksumAddress
 
-
 Multicall2_address_mumbay = "0xe9939e7Ea7D7fb619Ac57f648Da7B1D425832631"
 Multicall2_address_mainnet = "0xc8E51042792d7405184DfCa245F2d27B94D013b6"
 
@@ -22,7 +26,7 @@ CALL_CHUNK_SIZE = 1000
 
 def get_json_data(filename: str):
     x = open(filename, "r")
-    y = json.loads(x.read())
+    y = loads(x.read())
     json_token_ids = []
     json_live_dna = []
     for i in y:
@@ -32,35 +36,24 @@ def get_json_data(filename: str):
     return json_token_ids, json_live_dna
 
 
-def make_multicall(
-    multicall_method: Any,
-    brownie_contract_method: Any,
-    address: web3.toChecksumAddress,
-    inputs: List[Any],
-    block_number: str = "latest",
-) -> Any:
-    multicall_result = multicall_method.call(
-        False,  # success not required
-        [
-            (
-                address,
-                brownie_contract_method.encode_input(input),
-            )
-            for input in inputs
-        ],
-        block_identifier=block_number,
-    )
+def output_call_failures(token_ids, failures, errors, block_number):
 
-    results = []
+    for index, error in failures.items():
+        errors.append(
+            {
+                "token_id": token_ids[index],
+                "block_number": block_number,
+                "error": f"Failed to retrieve DNA: {error}",
+            }
+        )
 
-    # Handle the case with not successful calls
-    for encoded_data in multicall_result:
-        if encoded_data[0]:
-            results.append(brownie_contract_method.decode_output(encoded_data[1]))
-        else:
-            print(encoded_data, file=sys.stderr)
-            results.append(None)
-    return results
+
+def drop_call_failures(failures, *columns):
+
+    return tuple(
+        [value for index, value in enumerate(column) if index not in failures]
+        for column in columns
+    )
 
 
 def output_unicorn_dnas(token_ids, tokens_dnas, results, errors, block_number):
@@ -91,83 +84,156 @@ def unicorn_dnas(
     contract_address: ChecksumAddress,
     token_ids: List[int],
     block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    if block_number is None:
-        block_number = len(chain) - 1
-
     results: List[Dict[str, Any]] = []
 
     errors: List[Dict[str, Any]] = []
 
-    tokens_dnas = call_token_dnas(contract_address, token_ids, block_number)
-
-    output_unicorn_dnas(token_ids, tokens_dnas, results, errors, block_number)
+    for chunk_results, chunk_errors in iter_unicorn_dnas(
+        contract_address, token_ids, block_number, settings
+    ):
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
 
     return results, errors
 
 
-def call_token_dnas(contract_address, token_ids, block_number):
+def iter_unicorn_dnas(
+    contract_address: ChecksumAddress,
+    token_ids: List[int],
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Streaming version of unicorn_dnas. Yields results and errors for each group of chunks as soon
+    as it is crawled.
+    """
+    if block_number is None:
+        block_number = len(chain) - 1
+
+    for _, chunk_token_ids, tokens_dnas, failures in iter_call_token_dnas(
+        contract_address, token_ids, block_number, settings
+    ):
+        results: List[Dict[str, Any]] = []
+
+        errors: List[Dict[str, Any]] = []
 
-    contract = DNAMigrationFacet.DNAMigrationFacet(contract_address)
+        output_call_failures(chunk_token_ids, failures, errors, block_number)
+        chunk_token_ids, tokens_dnas = drop_call_failures(
+            failures, chunk_token_ids, tokens_dnas
+        )
 
-    tokens_dnas = []
+        output_unicorn_dnas(chunk_token_ids, tokens_dnas, results, errors, block_number)
+
+        yield results, errors
+
+
+def call_token_dnas(contract_address, token_ids, block_number, settings=None):
+    tokens_dnas: List[Any] = []
+    failures: Dict[int, str] = {}
+    for offset, _, chunk_tokens_dnas, chunk_failures in iter_call_token_dnas(
+        contract_address, token_ids, block_number, settings
+    ):
+        tokens_dnas.extend(chunk_tokens_dnas)
+        failures.update(
+            {offset + index: error for index, error in chunk_failures.items()}
+        )
+
+    return tokens_dnas, failures
+
+
+def iter_call_token_dnas(
+    contract_address, token_ids, block_number, settings=None
+) -> Iterator[Tuple[int, List[Any], List[Any], Dict[int, str]]]:
+    """
+    Streaming version of call_token_dnas. Yields (offset, token IDs, DNA reports, failures) for
+    each group of chunks as soon as it is crawled. offset is the position of the first of those
+    token IDs in token_ids, and failures are keyed by position in the group.
+    """
+    contract = DNAMigrationFacet.DNAMigrationFacet(contract_address)
 
     dna_progress_bar = tqdm(
         total=len(token_ids),
         desc="Retrieving unicorn dnaReports",
     )
 
-    CALL_CHUNK_SIZE_DNA = CALL_CHUNK_SIZE
-
     multicaller = Multicall2.Multicall2(Multicall2_address_mumbay)
 
     multicall_method = multicaller.contract.tryAggregate
-    # multicall_method = multicaller.contract.aggregate
-
-    for tokens_ids_chunk in [
-        token_ids[i : i + CALL_CHUNK_SIZE_DNA]
-        for i in range(0, len(token_ids), CALL_CHUNK_SIZE_DNA)
-    ]:
-        while True:
-            try:
-                make_multicall_result = make_multicall(
-                    multicall_method,
-                    contract.contract.dnaReport,
-                    contract_address,
-                    tokens_ids_chunk,
-                    block_number=block_number,
-                )
-                tokens_dnas.extend(make_multicall_result)
-                dna_progress_bar.update(len(tokens_ids_chunk))
-                break
-            except ValueError:
-                time.sleep(1)
-                continue
 
-    return tokens_dnas
+    for offset, chunk_token_ids, tokens_dnas, failures in iter_crawl_multicall(
+        multicall_method,
+        contract.contract.dnaReport,
+        contract_address,
+        token_ids,
+        CALL_CHUNK_SIZE,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=dna_progress_bar,
+    ):
+        yield offset, chunk_token_ids, tokens_dnas, {
+            index - offset: error for index, error in failures.items()
+        }
 
 
 def check_unicorn_dnas(
     contract_address: ChecksumAddress,
     filename: str,
     block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-    if block_number is None:
-        block_number = len(chain) - 1
-
     results: List[Dict[str, Any]] = []
 
     errors: List[Dict[str, Any]] = []
 
+    for chunk_results, chunk_errors in iter_check_unicorn_dnas(
+        contract_address, filename, block_number, settings
+    ):
+        results.extend(chunk_results)
+        errors.extend(chunk_errors)
+
+    return results, errors
+
+
+def iter_check_unicorn_dnas(
+    contract_address: ChecksumAddress,
+    filename: str,
+    block_number: Optional[int] = None,
+    settings: Optional[MulticallSettings] = None,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Streaming version of check_unicorn_dnas. Yields results and errors for each group of chunks as
+    soon as it is crawled.
+    """
+    if block_number is None:
+        block_number = len(chain) - 1
+
     token_ids, live_before = get_json_data(filename)
 
-    tokens_dnas = call_token_dnas(contract_address, token_ids, block_number)
+    for offset, chunk_token_ids, tokens_dnas, failures in iter_call_token_dnas(
+        contract_address, token_ids, block_number, settings
+    ):
+        results: List[Dict[str, Any]] = []
 
-    verify_unicorn_dnas(
-        token_ids, tokens_dnas, live_before, results, errors, block_number
-    )
+        errors: List[Dict[str, Any]] = []
 
-    return results, errors
+        chunk_live_before = live_before[offset : offset + len(chunk_token_ids)]
+        output_call_failures(chunk_token_ids, failures, errors, block_number)
+        chunk_token_ids, tokens_dnas, chunk_live_before = drop_call_failures(
+            failures, chunk_token_ids, tokens_dnas, chunk_live_before
+        )
+
+        verify_unicorn_dnas(
+            chunk_token_ids,
+            tokens_dnas,
+            chunk_live_before,
+            results,
+            errors,
+            block_number,
+        )
+
+        yield results, errors
 
 
 def verify_unicorn_dnas(
@@ -230,39 +296,46 @@ def handle_dnas(args: argparse.Namespace) -> None:
         ), "Starting token ID must not exceed ending token ID"
         token_ids = range(args.start, args.end + 1)
 
+    settings = multicall_settings_from_args(args)
     if token_ids is None and args.filename is not None:
-        verifyDnaReport(args.filename, args.address, args.block_number)
+        verifyDnaReport(args.filename, args.address, args.block_number, settings)
     else:
-        dnaReport(token_ids, args.address, args.block_number)
+        dnaReport(token_ids, args.address, args.block_number, settings)
 
 
-def verifyDnaReport(filename, token_address, block_number):
-    results, errors = check_unicorn_dnas(
+def verifyDnaReport(filename, token_address, block_number, settings=None):
+    for results, errors in iter_check_unicorn_dnas(
         token_address,
         filename,
         block_number,
-    )
-
-    for result in results:
-        print(json.dumps(result))
+        settings,
+    ):
+        write_jsonl(results, sys.stdout)
+        sys.stdout.flush()
 
-    for error in errors:
-        print(json.dumps(error), file=sys.stderr)
+        for error in errors:
+            print_json(error, file=sys.stderr)
 
 
-def dnaReport(token_ids, token_address, block_number):
-    results, errors = unicorn_dnas(
+def dnaReport(token_ids, token_address, block_number, settings=None):
+    # Streams a JSON array of the results, one chunk at a time.
+    separator = ""
+    sys.stdout.write("[")
+    for results, errors in iter_unicorn_dnas(
         token_address,
         token_ids,
         block_number,
-    )
-
-    print(json.dumps(results))
+        settings,
+    ):
+        if results:
+            sys.stdout.write(separator + ",".join(dumps(result) for result in results))
+            separator = ","
+        sys.stdout.flush()
 
-    for error in errors:
-        print(json.dumps(error), file=sys.stderr)
+        for error in errors:
+            print_json(error, file=sys.stderr)
 
-    
+    sys.stdout.write("]\n")
 
 
 def generate_cli() -> argparse.ArgumentParser:
@@ -271,6 +344,7 @@ def generate_cli() -> argparse.ArgumentParser:
 
     dnas_parser = subparsers.add_parser("crawl", help="Crawl DNA report")
     DNAMigrationFacet.add_default_arguments(dnas_parser, False)
+    add_multicall_arguments(dnas_parser)
     dnas_parser.add_argument(
         "--start",
         type=int,
@@ -0,0 +1,189 @@
+"""
+Fast ABI encoding and decoding for contract methods with fixed-layout inputs and outputs.
+
+Brownie's encode_input and decode_output go through eth-abi's generic codecs and brownie's own
+type conversions for every single call. For methods whose arguments and return values are static
+integers and booleans (like getDNA, getStats and getUnicornBodyParts), each value sits in its own
+32 byte word, so values can be read and written by slicing bytes directly.
+
+Methods with any other argument or return types (like tokenURI, which returns a string) have no
+fast codec, and callers should fall back to brownie.
+"""
+
+import numbers
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+INTEGER_TYPE_PATTERN = re.compile(r"^(u?)int(\d*)$")
+
+
+def word_decoder(abi_type: str) -> Optional[Callable[[bytes], Any]]:
+    """
+    Returns a function that decodes a 32 byte ABI word of the given type, or None if values of
+    that type are not stored in a single word.
+    """
+    if abi_type == "bool":
+        return lambda word: word[-1] != 0
+
+    match = INTEGER_TYPE_PATTERN.match(abi_type)
+    if match is None:
+        return None
+    signed = match.group(1) == ""
+    return lambda word: int.from_bytes(word, "big", signed=signed)
+
+
+def word_encoder(abi_type: str) -> Optional[Callable[[Any], bytes]]:
+    """
+    Returns a function that encodes a value of the given type as a 32 byte ABI word, or None if
+    values of that type are not stored in a single word. The function raises a ValueError for a
+    value that is not an integer (or a decimal string) in the range of the type.
+    """
+    if abi_type == "bool":
+        return lambda value: (1 if value else 0).to_bytes(32, "big")
+
+    match = INTEGER_TYPE_PATTERN.match(abi_type)
+    if match is None:
+        return None
+    signed = match.group(1) == ""
+    bits = int(match.group(2) or 256)
+    if signed:
+        low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    else:
+        low, high = 0, (1 << bits) - 1
+
+    def encode(value: Any) -> bytes:
+        # Token IDs and DNAs are passed around as decimal strings as well as integers. Anything
+        # else (floats, "1 ether", ...) is left to brownie's conversions.
+        if isinstance(value, str):
+            integer = int(value, 10)
+        elif isinstance(value, numbers.Integral) and not isinstance(value, bool):
+            integer = int(value)
+        else:
+            raise ValueError(f"Cannot encode {repr(value)} as {abi_type}")
+        if not low <= integer <= high:
+            raise ValueError(f"Value {integer} is out of range for {abi_type}")
+        return integer.to_bytes(32, "big", signed=signed)
+
+    return encode
+
+
+class FixedLayoutDecoder:
+    """
+    Decodes the return data of a method whose outputs are all single-word static types.
+
+    Like brownie, a method with a single output decodes to that value and a method with several
+    outputs decodes to a tuple.
+    """
+
+    def __init__(self, output_types: Sequence[str]) -> None:
+        decoders = [word_decoder(output_type) for output_type in output_types]
+        assert all(
+            decoder is not None for decoder in decoders
+        ), f"Output types do not have a fixed layout: {output_types}"
+        self.output_types = list(output_types)
+        self.decoders: List[Callable[[bytes], Any]] = decoders  # type: ignore
+        self.size = 32 * len(decoders)
+
+    def decode(self, data: bytes) -> Any:
+        if len(data) < self.size:
+            raise ValueError(
+                f"Expected at least {self.size} bytes of return data, got {len(data)}"
+            )
+        values = tuple(
+            decoder(data[32 * i : 32 * (i + 1)])
+            for i, decoder in enumerate(self.decoders)
+        )
+        if len(values) == 1:
+            return values[0]
+        return values
+
+    def decode_many(self, multicall_result: Sequence[Tuple[bool, bytes]]) -> List[Any]:
+        """
+        Decodes a whole tryAggregate result. Unsuccessful calls, and calls whose return data is too
+        short to hold the outputs, decode to None.
+        """
+        size = self.size
+        decoders = self.decoders
+        offsets = range(0, size, 32)
+        single = len(decoders) == 1
+
+        decoded: List[Any] = []
+        for success, data in multicall_result:
+            if not success or len(data) < size:
+                decoded.append(None)
+            elif single:
+                decoded.append(decoders[0](data[:32]))
+            else:
+                decoded.append(
+                    tuple(
+                        decoder(data[offset : offset + 32])
+                        for decoder, offset in zip(decoders, offsets)
+                    )
+                )
+        return decoded
+
+
+class FixedLayoutEncoder:
+    """
+    Encodes calldata for a method whose inputs are all single-word static types.
+    """
+
+    def __init__(self, selector: bytes, input_types: Sequence[str]) -> None:
+        encoders = [word_encoder(input_type) for input_type in input_types]
+        assert all(
+            encoder is not None for encoder in encoders
+        ), f"Input types do not have a fixed layout: {input_types}"
+        self.selector = selector
+        self.encoders: List[Callable[[Any], bytes]] = encoders  # type: ignore
+
+    def encode(self, *args: Any) -> bytes:
+        return self.selector + b"".join(
+            encoder(arg) for encoder, arg in zip(self.encoders, args)
+        )
+
+
+def abi_types(abi_parameters: Sequence[Dict[str, Any]]) -> List[str]:
+    return [parameter["type"] for parameter in abi_parameters]
+
+
+def has_fixed_layout(types: Sequence[str]) -> bool:
+    return len(types) > 0 and all(word_decoder(item) is not None for item in types)
+
+
+_decoders: Dict[str, Optional[FixedLayoutDecoder]] = {}
+_encoders: Dict[str, Optional[FixedLayoutEncoder]] = {}
+_lock = threading.Lock()
+
+
+def fast_decoder(brownie_contract_method: Any) -> Optional[FixedLayoutDecoder]:
+    """
+    Returns a (cached) FixedLayoutDecoder for the given brownie contract method, or None if its
+    outputs do not have a fixed layout.
+    """
+    output_types = abi_types(brownie_contract_method.abi.get("outputs", []))
+    key = f"{brownie_contract_method.signature}:{','.join(output_types)}"
+    with _lock:
+        if key not in _decoders:
+            decoder: Optional[FixedLayoutDecoder] = None
+            if has_fixed_layout(output_types):
+                decoder = FixedLayoutDecoder(output_types)
+            _decoders[key] = decoder
+        return _decoders[key]
+
+
+def fast_encoder(brownie_contract_method: Any) -> Optional[FixedLayoutEncoder]:
+    """
+    Returns a (cached) FixedLayoutEncoder for the given brownie contract method, or None if its
+    inputs do not have a fixed layout.
+    """
+    signature = brownie_contract_method.signature
+    input_types = abi_types(brownie_contract_method.abi.get("inputs", []))
+    key = f"{signature}:{','.join(input_types)}"
+    with _lock:
+        if key not in _encoders:
+            encoder: Optional[FixedLayoutEncoder] = None
+            if has_fixed_layout(input_types):
+                encoder = FixedLayoutEncoder(bytes.fromhex(signature[2:]), input_types)
+            _encoders[key] = encoder
+        return _encoders[key]
@@ -0,0 +1,234 @@
+"""
+Persistent memo cache for contract methods that only depend on a unicorn's DNA.
+
+getStats and getUnicornBodyParts take a DNA rather than a token ID, so for a given state of the
+game's tuning, their results only change if the DNA does. Crawls that consult this cache only call
+them for DNAs they have not seen before, no matter how stale the checkpoint entry for the token is
+or which block the crawl is at.
+
+The tuning can change on chain without a contract upgrade (addBaseStats, addGeneBonusesTuning and
+addBodyPartTuning on the DNAMigrationFacet), and cached outputs do not follow it: after a tuning
+change, or for a crawl pinned to a block from before the tuning the cache was filled with, the
+cache returns outputs that the contract would not. The cache is therefore only used when it is
+asked for (--dna-cache or the AUTOCORNS_DNA_CACHE_FILE environment variable). Delete the cache file
+whenever the tuning changes.
+
+Entries are keyed by network, contract address, method name and DNA, and the cache keeps at most
+max_entries of them, evicting the least recently used ones first.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_DNA_CACHE_FILE = os.environ.get("AUTOCORNS_DNA_CACHE_FILE")
+DEFAULT_DNA_CACHE_SIZE = 1000000
+
+
+def to_json_value(value: Any) -> Any:
+    if isinstance(value, (tuple, list)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        # Wei and other int subclasses from brownie
+        return int(value)
+    return value
+
+
+def from_json_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return tuple(from_json_value(item) for item in value)
+    return value
+
+
+class DNACache:
+    """
+    Memo cache of the outputs of DNA-only contract methods, stored in a SQLite file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        network_name: str,
+        contract_address: str,
+        max_entries: int = DEFAULT_DNA_CACHE_SIZE,
+    ) -> None:
+        assert max_entries >= 1, "DNA cache must be allowed at least one entry"
+        self.path = path
+        self.network_name = network_name
+        self.contract_address = contract_address.lower()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS outputs (
+                network TEXT NOT NULL,
+                address TEXT NOT NULL,
+                method TEXT NOT NULL,
+                dna TEXT NOT NULL,
+                output TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (network, address, method, dna)
+            )
+            """)
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS outputs_last_used ON outputs (last_used)"
+        )
+        self.connection.commit()
+
+    def get_many(self, method: str, dnas: Sequence[Any]) -> List[Optional[Any]]:
+        """
+        Returns the cached output of the method for each DNA, or None for DNAs that are not cached.
+        """
+        outputs: List[Optional[Any]] = []
+        found: List[Tuple[float, str, str, str, str]] = []
+        now = time.time()
+        with self.lock:
+            for dna in dnas:
+                row = self.connection.execute(
+                    "SELECT output FROM outputs WHERE network = ? AND address = ? AND method = ? AND dna = ?",
+                    (self.network_name, self.contract_address, method, str(dna)),
+                ).fetchone()
+                if row is None:
+                    outputs.append(None)
+                    continue
+                outputs.append(from_json_value(json.loads(row[0])))
+                found.append(
+                    (now, self.network_name, self.contract_address, method, str(dna))
+                )
+            if found:
+                self.connection.executemany(
+                    "UPDATE outputs SET last_used = ? WHERE network = ? AND address = ? AND method = ? AND dna = ?",
+                    found,
+                )
+                self.connection.commit()
+
+        self.hits += len(found)
+        self.misses += len(dnas) - len(found)
+        return outputs
+
+    def put_many(
+        self, method: str, dnas: Sequence[Any], outputs: Sequence[Any]
+    ) -> None:
+        """
+        Caches the outputs of the method for the given DNAs. None outputs (unsuccessful calls) are
+        not cached.
+        """
+        now = time.time()
+        rows = [
+            (
+                self.network_name,
+                self.contract_address,
+                method,
+                str(dna),
+                json.dumps(to_json_value(output)),
+                now,
+            )
+            for dna, output in zip(dnas, outputs)
+            if output is not None
+        ]
+        if not rows:
+            return
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO outputs (network, address, method, dna, output, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.evict()
+            self.connection.commit()
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used entries once the cache holds more than max_entries. Makes
+        room for a tenth of max_entries at a time, so that eviction does not run on every insert.
+
+        Must be called with self.lock held.
+        """
+        (num_entries,) = self.connection.execute(
+            "SELECT COUNT(*) FROM outputs"
+        ).fetchone()
+        if num_entries <= self.max_entries:
+            return
+        num_evicted = num_entries - self.max_entries + self.max_entries // 10
+        self.connection.execute(
+            "DELETE FROM outputs WHERE rowid IN (SELECT rowid FROM outputs ORDER BY last_used LIMIT ?)",
+            (num_evicted,),
+        )
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def memoized(
+    dna_cache: Optional[DNACache],
+    methods: Sequence[str],
+    dnas: Sequence[Any],
+) -> Tuple[Dict[int, Tuple[Any, ...]], List[int]]:
+    """
+    Looks up the outputs of all the given methods for each DNA.
+
+    Returns a dictionary mapping the positions of DNAs for which every method's output is cached
+    to a tuple of those outputs (in the same order as methods), and the positions of the remaining
+    DNAs, which still need to be crawled.
+    """
+    if dna_cache is None:
+        return {}, list(range(len(dnas)))
+
+    outputs_by_method = [dna_cache.get_many(method, dnas) for method in methods]
+    hits: Dict[int, Tuple[Any, ...]] = {}
+    misses: List[int] = []
+    for i, outputs in enumerate(zip(*outputs_by_method)):
+        if any(output is None for output in outputs):
+            misses.append(i)
+        else:
+            hits[i] = outputs
+    return hits, misses
+
+
+def add_dna_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--dna-cache",
+        default=None,
+        help="SQLite file in which to remember the outputs of methods that only depend on DNA and the game's tuning, so that they are only called for new DNAs. Outputs are not refreshed when the tuning changes, and are used whatever --block-number is: delete the file after a tuning change. (default: the file in the AUTOCORNS_DNA_CACHE_FILE environment variable if it is set, otherwise no cache)",
+    )
+    parser.add_argument(
+        "--dna-cache-size",
+        type=int,
+        default=DEFAULT_DNA_CACHE_SIZE,
+        help=f"Maximum number of entries in the DNA cache (default: {DEFAULT_DNA_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--no-dna-cache",
+        action="store_true",
+        help="Do not use a DNA cache, even if AUTOCORNS_DNA_CACHE_FILE is set",
+    )
+
+
+def dna_cache_from_args(
+    args: argparse.Namespace, network_name: str
+) -> Optional[DNACache]:
+    """
+    Builds a DNA cache for the contract at args.address from arguments added by
+    add_dna_cache_arguments.
+    """
+    dna_cache_file = (
+        args.dna_cache if args.dna_cache is not None else DEFAULT_DNA_CACHE_FILE
+    )
+    if dna_cache_file is None or args.no_dna_cache:
+        return None
+    return DNACache(
+        dna_cache_file, network_name, args.address, max_entries=args.dna_cache_size
+    )
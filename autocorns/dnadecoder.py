@@ -0,0 +1,494 @@
+"""
+Offline decoding of unicorn DNAs into body parts and stats.
+
+A unicorn's DNA is a bitfield that holds its class, the local ID of each of its body parts (within
+its class and body part slot) and the genes attached to each body part. getUnicornBodyParts and
+getStats are pure functions of the DNA and of the game's tuning tables, which are read through the
+getters of the DNAMigrationFacet:
+
+- getBodyPartGlobalIdFromLocalId(class, slot, local ID) gives the global ID of each body part
+- getBodyPartIsMythic(global ID) tells which body parts count towards mythicCount
+- getBaseStats(class, stat) gives the stats every unicorn of a class starts with
+- getGeneBonusStatByGeneId and getGeneBonusValueByGeneId give the stat bonuses of each gene
+
+The tables are small and rarely change, so they can be fetched once (fetch_decoder_tables) and
+saved to a JSON file. DNADecoder then decodes any number of DNAs without calling the contract,
+with NumPy operations over all of them at once.
+
+The DNA layout in DNA_FIELDS and the stat IDs in STAT_IDS follow the unicorn DNA and stats
+libraries of the contracts. Before trusting the decoder with a new contract deployment or DNA
+version, run verify_decoder (the biologist verify-decoder command): it checks the layout against
+getUnicornBodyPartsLocal and getUnicornMetadata, and the decoded outputs against
+getUnicornBodyParts and getStats, for the on-chain DNAs of a sample of tokens.
+"""
+
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from .multicall import crawl_fused_multicall, crawl_multicall, MulticallSettings
+
+# (name, width in bits) of each field in the DNA, starting from the least significant bit.
+DNA_FIELDS: List[Tuple[str, int]] = [
+    ("version", 8),
+    ("origin", 1),
+    ("game_locked", 1),
+    ("limited_edition", 1),
+    ("lifecycle_stage", 2),
+    ("breeding_points", 4),
+    ("class", 4),
+    ("body_part", 6),
+    ("face_part", 6),
+    ("horn_part", 6),
+    ("hooves_part", 6),
+    ("mane_part", 6),
+    ("tail_part", 6),
+    ("mythic_count", 2),
+    ("body_major_gene", 8),
+    ("body_mid_gene", 8),
+    ("body_minor_gene", 8),
+    ("face_major_gene", 8),
+    ("face_mid_gene", 8),
+    ("face_minor_gene", 8),
+    ("horn_major_gene", 8),
+    ("horn_mid_gene", 8),
+    ("horn_minor_gene", 8),
+    ("hooves_major_gene", 8),
+    ("hooves_mid_gene", 8),
+    ("hooves_minor_gene", 8),
+    ("mane_major_gene", 8),
+    ("mane_mid_gene", 8),
+    ("mane_minor_gene", 8),
+    ("tail_major_gene", 8),
+    ("tail_mid_gene", 8),
+    ("tail_minor_gene", 8),
+    ("first_name", 10),
+    ("last_name", 10),
+]
+
+
+def field_offsets(fields: Sequence[Tuple[str, int]]) -> Dict[str, Tuple[int, int]]:
+    offsets: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for name, width in fields:
+        offsets[name] = (offset, width)
+        offset += width
+    return offsets
+
+
+DNA_FIELD_OFFSETS = field_offsets(DNA_FIELDS)
+
+# Body part slots, in the order of the outputs of getUnicornBodyParts. Slot IDs start at 1.
+BODY_PART_SLOTS = ["body", "face", "horn", "hooves", "mane", "tail"]
+GENE_FIELDS = [
+    f"{slot}_{rank}_gene"
+    for slot in BODY_PART_SLOTS
+    for rank in ["major", "mid", "minor"]
+]
+# Stats, in the order of the outputs of getStats.
+STATS_ORDER = [
+    "attack",
+    "accuracy",
+    "movement_speed",
+    "attack_speed",
+    "defense",
+    "vitality",
+    "resistance",
+    "magic",
+]
+# Stat IDs on the contract, by stat. The IDs follow the order of the arguments of addBaseStats
+# (vitality, attack, defense, accuracy, magic, resistance, moveSpeed, attackSpeed), which is not
+# the order of the outputs of getStats (STATS_ORDER). The decoder always returns stats in
+# STATS_ORDER.
+STAT_IDS: Dict[str, int] = {
+    "vitality": 1,
+    "attack": 2,
+    "defense": 3,
+    "accuracy": 4,
+    "magic": 5,
+    "resistance": 6,
+    "movement_speed": 7,
+    "attack_speed": 8,
+}
+# Stat ID of each output of getStats.
+STATS_OUTPUT_IDS = [STAT_IDS[name] for name in STATS_ORDER]
+# Fields of the DNA that getUnicornMetadata returns, in the order of its outputs.
+METADATA_FIELDS = [
+    "origin",
+    "game_locked",
+    "limited_edition",
+    "lifecycle_stage",
+    "breeding_points",
+    "class",
+]
+NUM_GENE_BONUS_SLOTS = 3
+
+NUM_CLASSES = 1 << DNA_FIELD_OFFSETS["class"][1]
+NUM_LOCAL_PART_IDS = 1 << DNA_FIELD_OFFSETS["body_part"][1]
+NUM_GENE_IDS = 1 << DNA_FIELD_OFFSETS["body_major_gene"][1]
+
+TABLES_CHUNK_SIZE = 500
+
+
+def dna_words(dnas: Sequence[int]) -> np.ndarray:
+    """
+    Splits 256-bit DNAs into an array of shape (len(dnas), 4) of 64-bit words, least significant
+    word first.
+    """
+    buffer = b"".join(int(dna).to_bytes(32, "little") for dna in dnas)
+    return np.frombuffer(buffer, dtype="<u8").reshape(len(dnas), 4)
+
+
+def extract_field(words: np.ndarray, name: str) -> np.ndarray:
+    """
+    Extracts a DNA field from every row of an array built by dna_words.
+    """
+    offset, width = DNA_FIELD_OFFSETS[name]
+    word, shift = divmod(offset, 64)
+    values = words[:, word] >> np.uint64(shift)
+    if shift + width > 64:
+        values = values | (words[:, word + 1] << np.uint64(64 - shift))
+    return (values & np.uint64((1 << width) - 1)).astype(np.int64)
+
+
+def fetch_decoder_tables(
+    contract: Any,
+    multicall_method: Any,
+    block_number: Any,
+    settings: Optional[MulticallSettings] = None,
+) -> Dict[str, Any]:
+    """
+    Reads the tuning tables that DNADecoder needs from a brownie DNAMigrationFacet contract. Returns
+    them as a JSON-serializable dictionary. Table entries whose calls fail are left as 0.
+
+    Base stats are stored in the order of the outputs of getStats, with the stat ID of each column
+    in "stat_ids".
+    """
+    address = contract.address
+
+    def crawl(method: Any, inputs: List[Any], desc: str) -> List[Any]:
+        outputs, failures = crawl_multicall(
+            multicall_method,
+            method,
+            address,
+            inputs,
+            TABLES_CHUNK_SIZE,
+            block_number=block_number,
+            settings=settings,
+            progress_bar=tqdm(total=len(inputs), desc=desc),
+        )
+        return [
+            0 if index in failures or output is None else int(output)
+            for index, output in enumerate(outputs)
+        ]
+
+    part_inputs = [
+        (class_id, slot_id, local_id)
+        for class_id in range(NUM_CLASSES)
+        for slot_id in range(1, len(BODY_PART_SLOTS) + 1)
+        for local_id in range(NUM_LOCAL_PART_IDS)
+    ]
+    part_global_ids = crawl(
+        contract.getBodyPartGlobalIdFromLocalId, part_inputs, "Body part IDs"
+    )
+
+    global_ids = sorted({global_id for global_id in part_global_ids if global_id != 0})
+    is_mythic = crawl(contract.getBodyPartIsMythic, global_ids, "Mythic body parts")
+
+    base_stat_inputs = [
+        (class_id, stat_id)
+        for class_id in range(NUM_CLASSES)
+        for stat_id in STATS_OUTPUT_IDS
+    ]
+    base_stats = crawl(contract.getBaseStats, base_stat_inputs, "Base stats")
+
+    gene_bonus_inputs = [
+        (gene_id, bonus_slot)
+        for gene_id in range(NUM_GENE_IDS)
+        for bonus_slot in range(1, NUM_GENE_BONUS_SLOTS + 1)
+    ]
+    gene_bonus_stats = crawl(
+        contract.getGeneBonusStatByGeneId, gene_bonus_inputs, "Gene bonus stats"
+    )
+    gene_bonus_values = crawl(
+        contract.getGeneBonusValueByGeneId, gene_bonus_inputs, "Gene bonus values"
+    )
+
+    return {
+        "address": address,
+        "block_number": block_number,
+        "part_global_ids": part_global_ids,
+        "mythic_part_ids": [
+            global_id for global_id, mythic in zip(global_ids, is_mythic) if mythic
+        ],
+        "stat_ids": STATS_OUTPUT_IDS,
+        "base_stats": base_stats,
+        "gene_bonuses": [
+            [stat_id, value]
+            for stat_id, value in zip(gene_bonus_stats, gene_bonus_values)
+        ],
+    }
+
+
+class DNADecoder:
+    """
+    Computes the outputs of getUnicornBodyParts and getStats from DNAs, using tables from
+    fetch_decoder_tables.
+    """
+
+    def __init__(self, tables: Dict[str, Any]) -> None:
+        num_slots = len(BODY_PART_SLOTS)
+        self.part_global_ids = np.array(
+            tables["part_global_ids"], dtype=np.int64
+        ).reshape(NUM_CLASSES, num_slots, NUM_LOCAL_PART_IDS)
+
+        max_global_id = int(self.part_global_ids.max(initial=0))
+        self.part_is_mythic = np.zeros(max_global_id + 1, dtype=np.int64)
+        for global_id in tables["mythic_part_ids"]:
+            if global_id <= max_global_id:
+                self.part_is_mythic[global_id] = 1
+
+        assert (
+            tables.get("stat_ids") == STATS_OUTPUT_IDS
+        ), "Tables were built with a different stat layout, fetch them again"
+        self.base_stats = np.array(tables["base_stats"], dtype=np.int64).reshape(
+            NUM_CLASSES, len(STATS_ORDER)
+        )
+
+        # Total bonus of each gene to each stat, so that a gene's bonuses take a single lookup.
+        self.gene_stat_bonuses = np.zeros(
+            (NUM_GENE_IDS, len(STATS_ORDER)), dtype=np.int64
+        )
+        stat_positions = {
+            stat_id: position for position, stat_id in enumerate(STATS_OUTPUT_IDS)
+        }
+        for index, (stat_id, value) in enumerate(tables["gene_bonuses"]):
+            gene_id = index // NUM_GENE_BONUS_SLOTS
+            if stat_id in stat_positions:
+                self.gene_stat_bonuses[gene_id, stat_positions[stat_id]] += value
+
+    def decode(self, dnas: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Decodes DNAs. Returns three arrays:
+        1. Body parts, of shape (len(dnas), 7): the outputs of getUnicornBodyParts for each DNA
+        2. Stats, of shape (len(dnas), 8): the outputs of getStats for each DNA, in STATS_ORDER
+        3. A boolean mask of the DNAs that could be decoded. DNAs with a body part that is missing
+           from the tables cannot be decoded, and their rows in the other arrays are meaningless.
+        """
+        words = dna_words(dnas)
+        classes = extract_field(words, "class")
+
+        body_parts = np.zeros((len(dnas), len(BODY_PART_SLOTS) + 1), dtype=np.int64)
+        for slot_index, slot in enumerate(BODY_PART_SLOTS):
+            local_ids = extract_field(words, f"{slot}_part")
+            body_parts[:, slot_index] = self.part_global_ids[
+                classes, slot_index, local_ids
+            ]
+        global_ids = body_parts[:, : len(BODY_PART_SLOTS)]
+        decodable = np.all(global_ids != 0, axis=1)
+        body_parts[:, -1] = self.part_is_mythic[global_ids].sum(axis=1)
+
+        stats = self.base_stats[classes].copy()
+        for gene_field in GENE_FIELDS:
+            stats += self.gene_stat_bonuses[extract_field(words, gene_field)]
+
+        return body_parts, stats, decodable
+
+    def decode_items(
+        self, items: Sequence[Dict[str, Any]]
+    ) -> List[Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]]:
+        """
+        Decodes the DNAs of items from a DNA crawl. Returns, for each item, its getUnicornBodyParts
+        and getStats outputs, or None if its DNA is missing or could not be decoded.
+        """
+        present = [
+            index
+            for index, item in enumerate(items)
+            if item["dna"] is not None and item["dna"] != "None"
+        ]
+        results: List[Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]] = [None] * len(
+            items
+        )
+        if not present:
+            return results
+
+        body_parts, stats, decodable = self.decode(
+            [int(items[index]["dna"]) for index in present]
+        )
+        for index, body_parts_row, stats_row, row_decodable in zip(
+            present, body_parts.tolist(), stats.tolist(), decodable.tolist()
+        ):
+            if row_decodable:
+                results[index] = (tuple(body_parts_row), tuple(stats_row))
+        return results
+
+
+# Names of the values that compare_with_contract checks, in the order in which it checks them.
+LAYOUT_OUTPUTS = [f"{slot}_part" for slot in BODY_PART_SLOTS] + METADATA_FIELDS
+BODY_PART_OUTPUTS = [f"{slot}_part_id" for slot in BODY_PART_SLOTS] + ["mythic_count"]
+VERIFIED_OUTPUTS = LAYOUT_OUTPUTS + BODY_PART_OUTPUTS + STATS_ORDER
+
+
+def compare_with_contract(
+    decoder: DNADecoder, records: Sequence[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Compares the decoder with what the contract returned for a number of tokens. Each record holds
+    the outputs of the contract for a token:
+    - "token_id", and "crawled_dna": the DNA of the token in the crawl being verified
+    - "dna": the output of getDNA
+    - "metadata": the outputs of getUnicornMetadata
+    - "local_parts", "body_parts" and "stats": the outputs of getUnicornBodyPartsLocal,
+      getUnicornBodyParts and getStats on the DNA
+
+    Fields of the DNA are checked against getUnicornBodyPartsLocal and getUnicornMetadata, so that
+    a wrong DNA_FIELDS layout shows up as such, and the decoded outputs against getUnicornBodyParts
+    and getStats. Returns a report with the number of mismatches for each value (see
+    VERIFIED_OUTPUTS) and the first few mismatching tokens. Tokens whose crawled DNA differs from
+    getDNA are counted as stale, and checked with the DNA from getDNA.
+    """
+    report: Dict[str, Any] = {
+        "compared": len(records),
+        "stale": 0,
+        "undecodable": 0,
+        "mismatched": 0,
+        "mismatches_by_output": {name: 0 for name in VERIFIED_OUTPUTS},
+        "examples": [],
+    }
+    if not records:
+        return report
+
+    dnas = [int(record["dna"]) for record in records]
+    words = dna_words(dnas)
+    layout = np.stack(
+        [extract_field(words, name) for name in LAYOUT_OUTPUTS], axis=1
+    ).tolist()
+    body_parts, stats, decodable = decoder.decode(dnas)
+
+    for record, layout_row, body_parts_row, stats_row, row_decodable in zip(
+        records, layout, body_parts.tolist(), stats.tolist(), decodable.tolist()
+    ):
+        crawled_dna = record.get("crawled_dna")
+        if crawled_dna is None or int(crawled_dna) != int(record["dna"]):
+            report["stale"] += 1
+
+        expected = [int(value) for value in record["local_parts"]] + [
+            int(value) for value in record["metadata"][: len(METADATA_FIELDS)]
+        ]
+        actual = list(layout_row)
+        if row_decodable:
+            expected += [int(value) for value in record["body_parts"]]
+            expected += [int(value) for value in record["stats"]]
+            actual += body_parts_row + stats_row
+        else:
+            report["undecodable"] += 1
+
+        mismatched = {
+            name: {"on_chain": expected_value, "decoded": actual_value}
+            for name, expected_value, actual_value in zip(
+                VERIFIED_OUTPUTS, expected, actual
+            )
+            if expected_value != actual_value
+        }
+        if not mismatched:
+            continue
+        report["mismatched"] += 1
+        for name in mismatched:
+            report["mismatches_by_output"][name] += 1
+        if len(report["examples"]) < 10:
+            report["examples"].append(
+                {
+                    "token_id": record.get("token_id"),
+                    "dna": str(record["dna"]),
+                    "mismatches": mismatched,
+                }
+            )
+
+    return report
+
+
+def verify_decoder(
+    decoder: DNADecoder,
+    contract: Any,
+    multicall_method: Any,
+    items: Sequence[Dict[str, Any]],
+    sample_size: int,
+    block_number: Any,
+    settings: Optional[MulticallSettings] = None,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Checks the decoder against a brownie DNAMigrationFacet contract, for a random sample of the
+    tokens in a DNA crawl. The DNAs are read again with getDNA at block_number, and the
+    decoder is compared with the contract on those DNAs (see compare_with_contract).
+    """
+    candidates = [item for item in items if item.get("token_id") is not None]
+    sample = random.Random(seed).sample(candidates, min(sample_size, len(candidates)))
+    address = contract.address
+
+    token_outputs, token_failures = crawl_fused_multicall(
+        multicall_method,
+        [contract.getDNA, contract.getUnicornMetadata],
+        address,
+        [int(item["token_id"]) for item in sample],
+        TABLES_CHUNK_SIZE // 12,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=tqdm(total=len(sample), desc="Reading DNAs"),
+    )
+    records: List[Dict[str, Any]] = []
+    for index, (item, outputs) in enumerate(zip(sample, token_outputs)):
+        if index in token_failures or outputs is None or None in outputs:
+            continue
+        dna, metadata = outputs
+        if int(dna) == 0:
+            continue
+        crawled_dna = item.get("dna")
+        records.append(
+            {
+                "token_id": item["token_id"],
+                "crawled_dna": (
+                    None
+                    if crawled_dna is None or crawled_dna == "None"
+                    else crawled_dna
+                ),
+                "dna": int(dna),
+                "metadata": metadata,
+            }
+        )
+
+    dna_outputs, dna_failures = crawl_fused_multicall(
+        multicall_method,
+        [
+            contract.getUnicornBodyPartsLocal,
+            contract.getUnicornBodyParts,
+            contract.getStats,
+        ],
+        address,
+        [record["dna"] for record in records],
+        TABLES_CHUNK_SIZE // 12,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=tqdm(total=len(records), desc="Verifying DNA decoder"),
+    )
+    compared: List[Dict[str, Any]] = []
+    for index, (record, outputs) in enumerate(zip(records, dna_outputs)):
+        if index in dna_failures or outputs is None or None in outputs:
+            continue
+        local_parts, body_parts, stats = outputs
+        compared.append(
+            {
+                **record,
+                "local_parts": local_parts,
+                "body_parts": body_parts,
+                "stats": stats,
+            }
+        )
+
+    return {
+        "block_number": block_number,
+        "sampled": len(sample),
+        **compare_with_contract(decoder, compared),
+    }
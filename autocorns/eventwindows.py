@@ -0,0 +1,199 @@
+"""
+Moonstream event queries sharded into time windows.
+
+A query over a whole season returns every event since the season started, so each refresh costs
+more than the last. Instead, the season can be split into fixed windows (days, say) that are
+queried separately and concatenated. A window that ended more than the finality horizon ago cannot
+get new events, so its results are kept in a local cache and never queried again. A refresh only
+queries the windows that are still open (and any closed windows missing from the cache, in
+parallel), so its cost stays flat as the season goes on.
+
+Queries are passed the window bounds as start_timestamp and end_timestamp, both inclusive, so
+window boundaries fall on multiples of the window size: [k * size, (k + 1) * size - 1].
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
+
+from .jsonl import dumps, loads
+from .moonstream import DEFAULT_MAX_ATTEMPTS, DEFAULT_MAX_INTERVAL, MoonstreamClient
+
+DEFAULT_WINDOW_CACHE_DIR = os.environ.get(
+    "AUTOCORNS_WINDOW_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".autocorns", "moonstream-windows"),
+)
+# Polygon blocks are final within minutes. The rest of the margin covers Moonstream's indexing lag.
+DEFAULT_FINALITY_SECONDS = 3 * 60 * 60
+DEFAULT_WINDOW_CONCURRENCY = 4
+
+Window = Tuple[int, int]
+
+
+def time_windows(start: int, end: int, window_seconds: int) -> List[Window]:
+    """
+    Splits the timestamps from start to end (inclusive) into windows aligned to multiples of
+    window_seconds. The first and last windows are cut short by start and end.
+    """
+    assert window_seconds > 0, "Windows must be at least a second long"
+    assert start <= end, "Start timestamp must not exceed end timestamp"
+    windows: List[Window] = []
+    window_start = start
+    while window_start <= end:
+        window_end = min((window_start // window_seconds + 1) * window_seconds - 1, end)
+        windows.append((window_start, window_end))
+        window_start = window_end + 1
+    return windows
+
+
+class WindowCache:
+    """
+    Results of closed windows, one file per window, under
+    <directory>/<query name>/<hash of the API URL and other parameters>/<start>-<end>.json.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def path(
+        self, api_url: str, query_name: str, params: Dict[str, Any], window: Window
+    ) -> str:
+        # Encoded with the json module so that the key does not depend on the installed codec.
+        encoded = json.dumps([api_url, params], separators=(",", ":"), sort_keys=True)
+        key = hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+        start, end = window
+        return os.path.join(self.directory, query_name, key, f"{start}-{end}.json")
+
+    def get(
+        self, api_url: str, query_name: str, params: Dict[str, Any], window: Window
+    ) -> Optional[bytes]:
+        path = self.path(api_url, query_name, params, window)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as ifp:
+            return ifp.read()
+
+    def put(
+        self,
+        api_url: str,
+        query_name: str,
+        params: Dict[str, Any],
+        window: Window,
+        content: bytes,
+    ) -> None:
+        path = self.path(api_url, query_name, params, window)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as ofp:
+            ofp.write(content)
+            ofp.flush()
+            os.fsync(ofp.fileno())
+        os.replace(temporary_path, path)
+
+
+async def fetch_windows(
+    client: MoonstreamClient,
+    query_name: str,
+    params: Dict[str, Any],
+    windows: List[Window],
+    cache: Optional[WindowCache] = None,
+    finality_seconds: float = DEFAULT_FINALITY_SECONDS,
+    concurrency: int = DEFAULT_WINDOW_CONCURRENCY,
+    max_interval: float = DEFAULT_MAX_INTERVAL,
+    max_polls: int = 0,
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+) -> Tuple[List[bytes], Dict[str, Any]]:
+    """
+    Returns the raw results of the query for each window, in order, and a summary of how they were
+    obtained. params are the parameters of the query other than start_timestamp and end_timestamp.
+    At most concurrency windows are queried at a time.
+    """
+    assert concurrency >= 1, "Need to query at least one window at a time"
+    started_at = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    horizon = time.time() - finality_seconds
+    num_cached = 0
+
+    async def fetch(window: Window) -> bytes:
+        nonlocal num_cached
+        start, end = window
+        closed = end < horizon
+        if closed and cache is not None:
+            content = cache.get(client.api_url, query_name, params, window)
+            if content is not None:
+                num_cached += 1
+                return content
+        async with semaphore:
+            response = await client.fetch(
+                query_name,
+                {**params, "start_timestamp": start, "end_timestamp": end},
+                max_interval=max_interval,
+                max_polls=max_polls,
+                max_attempts=max_attempts,
+            )
+        if closed and cache is not None:
+            cache.put(client.api_url, query_name, params, window, response.content)
+        return response.content
+
+    contents = await asyncio.gather(*[fetch(window) for window in windows])
+    summary = {
+        "windows": len(windows),
+        "cached_windows": num_cached,
+        "fetched_windows": len(windows) - num_cached,
+        "seconds": time.perf_counter() - started_at,
+    }
+    return list(contents), summary
+
+
+def write_merged_results(contents: Iterable[bytes], ofp: TextIO) -> int:
+    """
+    Writes the results of consecutive windows as the results of a single query: their data arrays
+    concatenated in order, and the other fields of the last window. Only one window is decoded at
+    a time. Returns the number of events written.
+    """
+    ofp.write('{"data":[')
+    num_events = 0
+    last_result: Dict[str, Any] = {}
+    for content in contents:
+        result = loads(content)
+        events = result.pop("data", [])
+        if events:
+            separator = "," if num_events > 0 else ""
+            ofp.write(separator + ",".join(dumps(event) for event in events))
+            num_events += len(events)
+        last_result = result
+    ofp.write("]")
+    for key, value in last_result.items():
+        ofp.write(f",{dumps(key)}:{dumps(value)}")
+    ofp.write("}")
+    return num_events
+
+
+def add_window_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--window-seconds",
+        type=int,
+        default=None,
+        help="Query the time range in windows of this many seconds (e.g. 86400 for days), aligned to multiples of it, and concatenate their results. Windows that have closed are cached. (default: query the whole range at once)",
+    )
+    parser.add_argument(
+        "--window-cache",
+        default=DEFAULT_WINDOW_CACHE_DIR,
+        help=f"Directory in which to cache the results of closed windows (default: {DEFAULT_WINDOW_CACHE_DIR}). Can also be set with the AUTOCORNS_WINDOW_CACHE_DIR environment variable.",
+    )
+    parser.add_argument(
+        "--finality-seconds",
+        type=float,
+        default=DEFAULT_FINALITY_SECONDS,
+        help=f"Windows that ended more than this many seconds ago are closed: their results are cached and never queried again (default: {DEFAULT_FINALITY_SECONDS})",
+    )
+    parser.add_argument(
+        "--window-concurrency",
+        type=int,
+        default=DEFAULT_WINDOW_CONCURRENCY,
+        help=f"Maximum number of windows to query at the same time, per query (default: {DEFAULT_WINDOW_CONCURRENCY})",
+    )
@@ -0,0 +1,278 @@
+"""
+JSON and JSON lines I/O for autocorns commands.
+
+Snapshots, checkpoints and Moonstream query results are read and written through this module.
+If orjson is installed (pip install "autocorns[fast]"), it encodes and decodes JSON; otherwise the
+json module from the standard library does. Without orjson, JSON is written exactly as json.dumps
+writes it. orjson writes compact JSON (no spaces after separators) instead: files written with and
+without orjson hold the same values and are interchangeable, but are not byte for byte the same.
+NumPy scalars and arrays are encoded as the Python values they hold, by either codec.
+
+orjson only handles integers that fit in 64 bits. Values with larger integers are encoded by the
+json module instead (also as compact JSON), and documents that might contain them are decoded by
+the json module, so that no integer is silently read as a float.
+
+JSON lines are written in batches of lines, one write per batch, rather than one write per line.
+
+The data arrays of large Moonstream query results can be read one item at a time with
+iter_json_array, which decodes the file in chunks instead of all at once.
+"""
+
+import json
+import re
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Union
+
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+CODEC = "orjson" if orjson is not None else "json"
+
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# orjson decodes integers that do not fit in 64 bits (which have at least 20 digits) as floats.
+LONG_DIGITS = re.compile(r"[0-9]{20}")
+LONG_DIGITS_BYTES = re.compile(rb"[0-9]{20}")
+
+# orjson raises a TypeError with this message for integers that do not fit in 64 bits.
+ORJSON_INTEGER_ERROR = "Integer exceeds 64-bit range"
+DECODER = json.JSONDecoder()
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER_CHARACTERS = re.compile(r"[0-9.eE+-]*")
+
+
+def encode_numpy(obj: Any) -> Any:
+    """
+    Converts the NumPy values that neither codec encodes on its own to Python values.
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+ENCODER = json.JSONEncoder(default=encode_numpy)
+COMPACT_ENCODER = json.JSONEncoder(separators=(",", ":"), default=encode_numpy)
+INDENTED_ENCODER = json.JSONEncoder(indent=2, default=encode_numpy)
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def stdlib_dumps(obj: Any, indent: bool = False, compact: bool = False) -> str:
+    if indent:
+        return INDENTED_ENCODER.encode(obj)
+    if compact:
+        return COMPACT_ENCODER.encode(obj)
+    return ENCODER.encode(obj)
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """
+    Encodes obj as a single line of JSON, or as JSON indented by 2 spaces if indent is True.
+    """
+    if orjson is None:
+        return stdlib_dumps(obj, indent)
+    options = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+    try:
+        return orjson.dumps(obj, default=encode_numpy, option=options).decode("utf-8")
+    except TypeError as error:
+        if str(error) != ORJSON_INTEGER_ERROR:
+            raise
+        # The json module encodes integers of any size, in the same format as orjson.
+        return stdlib_dumps(obj, indent, compact=True)
+
+
+def contains_floats(value: Any) -> bool:
+    if isinstance(value, dict):
+        values: Iterable[Any] = value.values()
+    elif isinstance(value, list):
+        values = value
+    else:
+        return isinstance(value, float)
+    types = set(map(type, values))
+    if float in types:
+        return True
+    if dict in types or list in types:
+        return any(
+            contains_floats(item) for item in values if isinstance(item, (dict, list))
+        )
+    return False
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Decodes a JSON document. Raises json.JSONDecodeError if it is not valid JSON.
+    """
+    if orjson is None:
+        return json.loads(data)
+    obj = orjson.loads(data)
+    # Digits in strings (like token DNAs) also match, so only a document that was decoded with
+    # floats in it is decoded again, by the json module, which keeps integers exact.
+    long_digits = LONG_DIGITS_BYTES if isinstance(data, bytes) else LONG_DIGITS
+    if long_digits.search(data) is not None and contains_floats(obj):  # type: ignore
+        return json.loads(data)
+    return obj
+
+
+def load(ifp: Any) -> Any:
+    return loads(ifp.read())
+
+
+def dump(obj: Any, ofp: TextIO, indent: bool = False) -> None:
+    ofp.write(dumps(obj, indent))
+
+
+def print_json(obj: Any, file: Optional[TextIO] = None, indent: bool = False) -> None:
+    """
+    Writes obj as a line of JSON to file (standard output by default).
+    """
+    if file is None:
+        file = sys.stdout
+    file.write(dumps(obj, indent) + "\n")
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the items in a JSON lines file, skipping blank lines.
+    """
+    # orjson decodes bytes directly; the json module decodes str faster than bytes.
+    with open(path, "rb" if orjson is not None else "r") as ifp:
+        for line in ifp:
+            if line.strip():
+                yield loads(line)
+
+
+def read_jsonl(path: str) -> List[Dict[str, Any]]:
+    return list(iter_jsonl(path))
+
+
+def write_jsonl(
+    items: Iterable[Any], ofp: TextIO, batch_size: int = DEFAULT_BATCH_SIZE
+) -> None:
+    """
+    Writes items to ofp as JSON lines, batch_size lines per write.
+    """
+    assert batch_size > 0, "Batch size must be positive"
+    lines: List[str] = []
+    for item in items:
+        lines.append(dumps(item))
+        if len(lines) >= batch_size:
+            ofp.write("\n".join(lines) + "\n")
+            lines = []
+    if lines:
+        ofp.write("\n".join(lines) + "\n")
+
+
+class StreamDecoder:
+    """
+    Decodes the JSON values in a text file one at a time, reading the file in chunks. Only the
+    value being decoded (and the rest of its chunk) is held in memory.
+    """
+
+    def __init__(self, ifp: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        assert chunk_size > 0, "Chunk size must be positive"
+        self.ifp = ifp
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def read_more(self) -> bool:
+        """
+        Drops the part of the buffer that has been decoded and reads the next chunk. Returns False
+        at the end of the file.
+        """
+        if self.eof:
+            return False
+        self.buffer = self.buffer[self.position :]
+        self.position = 0
+        # At least as much as is left over, so that a value longer than a chunk takes a number of
+        # reads (and of attempts to decode it) logarithmic in its length.
+        chunk = self.ifp.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips whitespace and returns the next character, or "" at the end of the file.
+        """
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()  # type: ignore
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                return ""
+
+    def expect(self, character: str) -> None:
+        if self.peek() != character:
+            raise json.JSONDecodeError(
+                f"Expecting {repr(character)}", self.buffer, self.position
+            )
+        self.position += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # The value continues in the next chunk (or is not valid JSON).
+                if self.read_more():
+                    continue
+                raise
+            # So might a number that reaches the end of the buffer (like 1 of 12, or 1 of 1e2).
+            if (
+                isinstance(value, (int, float))
+                and NUMBER_CHARACTERS.match(self.buffer, end).end()  # type: ignore
+                == len(self.buffer)
+                and self.read_more()
+            ):
+                continue
+            self.position = end
+            return value
+
+
+def iter_json_array(
+    path: str, key: str = "data", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Any]:
+    """
+    Yields the items of the array under key in the JSON object in the file at path (like the data
+    array of Moonstream query results), one at a time. Other fields of the object are decoded and
+    discarded. Raises json.JSONDecodeError if the file is not a JSON object or key is not an array,
+    and KeyError if the object has no key (once the whole object has been read).
+    """
+    found = False
+    with open(path, "r") as ifp:
+        decoder = StreamDecoder(ifp, chunk_size)
+        decoder.expect("{")
+        if decoder.peek() != "}":
+            while True:
+                field = decoder.value()
+                decoder.expect(":")
+                if field != key:
+                    decoder.value()
+                else:
+                    found = True
+                    decoder.expect("[")
+                    if decoder.peek() != "]":
+                        while True:
+                            yield decoder.value()
+                            if decoder.peek() == "]":
+                                break
+                            decoder.expect(",")
+                    decoder.expect("]")
+                if decoder.peek() == "}":
+                    break
+                decoder.expect(",")
+    if not found:
+        raise KeyError(key)
@@ -0,0 +1,214 @@
+"""
+Raw JSON-RPC transport for Multicall2 tryAggregate calls.
+
+Brownie makes one HTTP request per contract call and runs every request through web3 middleware
+and result formatters. This transport skips all of that: it encodes tryAggregate calldata by hand
+and sends many eth_calls as a single JSON-RPC batch request over a pooled keep-alive session.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# keccak256("tryAggregate(bool,(address,bytes)[])")[:4]
+TRY_AGGREGATE_SELECTOR = bytes.fromhex("bce38bd7")
+# tryAggregate(False, calls) always starts with the selector, the (false) requireSuccess flag and
+# the offset of the calls array, which immediately follows these two head words.
+TRY_AGGREGATE_PREFIX = (
+    TRY_AGGREGATE_SELECTOR + (0).to_bytes(32, "big") + (64).to_bytes(32, "big")
+)
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_TIMEOUT = 30.0
+
+
+class JSONRPCError(ValueError):
+    """
+    Raised when an eth_call fails, either because of the HTTP request carrying it or because of
+    the JSON-RPC error it returned.
+
+    This is a ValueError for consistency with the errors that brownie raises on failed calls, so
+    that callers retry it in the same way.
+    """
+
+
+def hex_to_bytes(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if value.startswith("0x"):
+        value = value[2:]
+    return bytes.fromhex(value)
+
+
+def pad32(data: bytes) -> bytes:
+    return data + b"\x00" * (-len(data) % 32)
+
+
+def encode_try_aggregate(calls: Sequence[Tuple[str, Union[str, bytes]]]) -> bytes:
+    """
+    ABI-encodes tryAggregate(False, calls), where calls is a list of (target address, calldata)
+    pairs.
+    """
+    encoded_calls: List[bytes] = []
+    for target, calldata in calls:
+        calldata_bytes = hex_to_bytes(calldata)
+        encoded_calls.append(
+            hex_to_bytes(target).rjust(32, b"\x00")
+            + (64).to_bytes(32, "big")
+            + len(calldata_bytes).to_bytes(32, "big")
+            + pad32(calldata_bytes)
+        )
+
+    offsets: List[bytes] = []
+    offset = 32 * len(encoded_calls)
+    for encoded_call in encoded_calls:
+        offsets.append(offset.to_bytes(32, "big"))
+        offset += len(encoded_call)
+
+    return b"".join(
+        [TRY_AGGREGATE_PREFIX, len(encoded_calls).to_bytes(32, "big")]
+        + offsets
+        + encoded_calls
+    )
+
+
+def decode_try_aggregate(return_data: bytes) -> List[Tuple[bool, bytes]]:
+    """
+    ABI-decodes the (bool success, bytes returnData)[] returned by tryAggregate.
+    """
+    array_start = int.from_bytes(return_data[0:32], "big")
+    num_results = int.from_bytes(return_data[array_start : array_start + 32], "big")
+    items_start = array_start + 32
+
+    results: List[Tuple[bool, bytes]] = []
+    for i in range(num_results):
+        item_start = items_start + int.from_bytes(
+            return_data[items_start + 32 * i : items_start + 32 * (i + 1)], "big"
+        )
+        success = return_data[item_start + 31] != 0
+        data_start = item_start + int.from_bytes(
+            return_data[item_start + 32 : item_start + 64], "big"
+        )
+        data_length = int.from_bytes(return_data[data_start : data_start + 32], "big")
+        results.append(
+            (success, return_data[data_start + 32 : data_start + 32 + data_length])
+        )
+
+    return results
+
+
+def block_tag(block_number: Any) -> str:
+    if isinstance(block_number, int):
+        return hex(block_number)
+    return str(block_number)
+
+
+def try_aggregate_payload(
+    multicall_address: str,
+    batches: Sequence[Sequence[Tuple[str, Union[str, bytes]]]],
+    block_number: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Builds a JSON-RPC batch request with one tryAggregate eth_call per batch of calls. The ID of
+    each request is the position of its batch.
+    """
+    tag = block_tag(block_number)
+    return [
+        {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": "eth_call",
+            "params": [
+                {
+                    "to": multicall_address,
+                    "data": "0x" + encode_try_aggregate(calls).hex(),
+                },
+                tag,
+            ],
+        }
+        for request_id, calls in enumerate(batches)
+    ]
+
+
+def parse_try_aggregate_response(
+    response_body: Any, num_batches: int
+) -> List[Union[List[Tuple[bool, bytes]], JSONRPCError]]:
+    """
+    Parses the response to a request built by try_aggregate_payload into, for each batch, either
+    the list of (success, returnData) pairs or the JSONRPCError its eth_call failed with.
+    """
+    if not isinstance(response_body, list):
+        # Some providers answer a batch they cannot process with a single error object.
+        raise JSONRPCError(f"Unexpected JSON-RPC batch response: {response_body}")
+
+    responses_by_id = {item.get("id"): item for item in response_body}
+
+    results: List[Union[List[Tuple[bool, bytes]], JSONRPCError]] = []
+    for request_id in range(num_batches):
+        item = responses_by_id.get(request_id)
+        if item is None:
+            results.append(JSONRPCError(f"No response for eth_call {request_id}"))
+        elif item.get("error") is not None:
+            results.append(JSONRPCError(str(item["error"])))
+        else:
+            try:
+                results.append(decode_try_aggregate(hex_to_bytes(item["result"])))
+            except Exception as e:
+                results.append(
+                    JSONRPCError(f"Could not decode tryAggregate result: {str(e)}")
+                )
+
+    return results
+
+
+class JSONRPCBatchTransport:
+    """
+    Sends tryAggregate calls to a JSON-RPC endpoint, batch_size eth_calls per HTTP request.
+
+    The underlying requests session keeps up to pool_size connections to the endpoint alive, so it
+    can be shared by the threads of a crawl.
+    """
+
+    def __init__(
+        self,
+        endpoint_uri: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = 10,
+    ) -> None:
+        assert batch_size >= 1, "Batch size must be at least 1"
+        self.endpoint_uri = endpoint_uri
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def try_aggregate(
+        self,
+        multicall_address: str,
+        batches: Sequence[Sequence[Tuple[str, Union[str, bytes]]]],
+        block_number: Any = "latest",
+    ) -> List[Union[List[Tuple[bool, bytes]], JSONRPCError]]:
+        """
+        Makes one tryAggregate eth_call per batch of (target address, calldata) pairs, all of them
+        in a single JSON-RPC batch request.
+
+        Returns, for each batch, either the list of (success, returnData) pairs or the
+        JSONRPCError its eth_call failed with. Raises JSONRPCError if the HTTP request itself fails.
+        """
+        payload = try_aggregate_payload(multicall_address, batches, block_number)
+
+        try:
+            response = self.session.post(
+                self.endpoint_uri, json=payload, timeout=self.timeout
+            )
+            response.raise_for_status()
+            response_body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise JSONRPCError(f"JSON-RPC batch request failed: {str(e)}")
+
+        return parse_try_aggregate_response(response_body, len(batches))
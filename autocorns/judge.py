@@ -1,5 +1,4 @@
 import argparse
-import json
 import logging
 import os
 from typing import Any, Dict
@@ -9,6 +8,7 @@ from brownie import network
 import requests
 
 from .biologist import load_checkpoint_data
+from .jsonl import print_json, write_jsonl
 from .moonstream import get_results_for_moonstream_query
 from .ERC721WithDiamondStorage import add_default_arguments, ERC721WithDiamondStorage
 from .shadowcorns import crawl, get_rarity, Rarity
@@ -71,11 +71,10 @@ def handle_throwing_shade(args: argparse.Namespace) -> None:
             multipliers[str(item["token_id"])] = multiplier
             item["rarity"] = rarity.value
             item["multiplier"] = multiplier
-            print(json.dumps(item), file=ofp)
+            print_json(item, file=ofp)
 
     with open(args.metadata, "w") as ofp:
-        for result in new_metadata + checkpoint_data:
-            print(json.dumps(result), file=ofp)
+        write_jsonl(new_metadata + checkpoint_data, ofp)
 
     logger.debug("Applying multipliers")
     for row in leaderboard:
@@ -129,13 +128,13 @@ def generate_cli() -> argparse.ArgumentParser:
         "--max-retries",
         type=int,
         default=100,
-        help="Number of times to retry requests for Moonstream Query results",
+        help="Maximum number of polls for Moonstream Query results before the query is requested again (0 means unlimited)",
     )
     shadowcorns_throwing_shade_parser.add_argument(
         "--interval",
         type=float,
         default=30.0,
-        help="Number of seconds to wait between attempts to get results from Moonstream Query API",
+        help="Maximum number of seconds to wait between polls for results from Moonstream Query API. Polls start much closer together and back off exponentially up to this interval.",
     )
     add_default_arguments(shadowcorns_throwing_shade_parser, False)
     shadowcorns_throwing_shade_parser.add_argument(
@@ -0,0 +1,377 @@
+"""
+A local stand-in for the Moonstream Query and Engine APIs.
+
+Serves the parts of the APIs that autocorns uses, so that Moonstream queries and leaderboard pushes
+can be run and benchmarked offline:
+
+- POST /queries/<name>/update_data starts generating the results of a query and returns their data
+  URL. The results are written generation_seconds later.
+- GET /data/<name>/<key>.json serves the results like the presigned URL of an object store: 404
+  until they are first written, 304 if they were last modified no later than If-Modified-Since,
+  and otherwise 200 with a Last-Modified header.
+- PUT /leaderboard/<id>/scores replaces the scores of a leaderboard (and GET returns them).
+
+Results are synthetic and deterministic for a given query and parameters. Queries whose names
+appear in leaderboard_queries return leaderboard rows (address, score, points_data); other queries
+return events with the fields that the season handlers of "autocorns biologist" read, their
+block_timestamp spread evenly over [start_timestamp, end_timestamp] when those parameters are set.
+A query can also be served the contents of a file instead.
+
+Every request waits latency seconds (plus up to jitter seconds), and fails with a 500 with
+probability failure_rate.
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+from .jsonl import dumps, loads, print_json
+from .moonstream import http_date, parse_http_date, utc_now
+
+logging.basicConfig()
+logger = logging.getLogger("autocorns.localmoonstream")
+log_level = logging.INFO
+if os.environ.get("AUTOCORNS_DEBUG") is not None:
+    log_level = logging.DEBUG
+
+logger.setLevel(log_level)
+
+if log_level == logging.DEBUG:
+    logger.debug("DEBUG mode")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_GENERATION_SECONDS = 2.0
+DEFAULT_EVENTS = 1000
+DEFAULT_PLAYERS = 100
+DEFAULT_LEADERBOARD_QUERIES = ["Shadowcorns_Throwing_Shade_Leaderboard"]
+
+# Used when a query is not passed a time range: the Spring 2023 event.
+DEFAULT_START_TIMESTAMP = 1680307200
+DEFAULT_END_TIMESTAMP = 1688169599
+# Polygon produces a block about every 2 seconds.
+BLOCK_SECONDS = 2
+GENESIS_TIMESTAMP = 1590824836
+
+
+def player_wallet(rng: random.Random, num_players: int) -> str:
+    return (
+        "0x" + hashlib.sha256(str(rng.randrange(num_players)).encode()).hexdigest()[:40]
+    )
+
+
+def query_key(query_name: str, params: Dict[str, Any]) -> str:
+    """
+    Identifies a query and its parameters. Encoded with the json module, so that synthetic results
+    are the same whether or not orjson is installed.
+    """
+    return json.dumps([query_name, params], separators=(",", ":"), sort_keys=True)
+
+
+def synthetic_events(
+    query_name: str, params: Dict[str, Any], num_events: int, num_players: int
+) -> List[Dict[str, Any]]:
+    """
+    Events with the fields of the breeding_hatching and evolution queries. Queries with
+    "evolution" in their names return evolution events; other queries alternate between breeding
+    and hatchingEggs events.
+    """
+    rng = random.Random(query_key(query_name, params))
+    start = int(params.get("start_timestamp", DEFAULT_START_TIMESTAMP))
+    end = int(params.get("end_timestamp", DEFAULT_END_TIMESTAMP))
+    event_types = (
+        ["evolution"] if "evolution" in query_name else ["breeding", "hatchingEggs"]
+    )
+    events: List[Dict[str, Any]] = []
+    for i in range(num_events):
+        block_timestamp = start + (end - start) * i // max(num_events, 1)
+        events.append(
+            {
+                "event_type": event_types[i % len(event_types)],
+                "block_number": (block_timestamp - GENESIS_TIMESTAMP) // BLOCK_SECONDS,
+                "block_timestamp": block_timestamp,
+                "transaction_hash": "0x" + "%064x" % rng.getrandbits(256),
+                "player_wallet": player_wallet(rng, num_players),
+                "token": str(rng.randrange(1, 30000)),
+            }
+        )
+    return events
+
+
+def synthetic_leaderboard(
+    query_name: str, params: Dict[str, Any], num_players: int
+) -> List[Dict[str, Any]]:
+    rng = random.Random(query_key(query_name, params))
+    rows = [
+        {
+            "address": "0x" + hashlib.sha256(str(i).encode()).hexdigest()[:40],
+            "score": rng.randrange(1, 10000),
+            "points_data": {"shadowcorns_thrown": rng.randrange(1, 100)},
+        }
+        for i in range(num_players)
+    ]
+    rows.sort(key=lambda row: row["score"], reverse=True)
+    return rows
+
+
+class QueryResults:
+    """
+    The latest results of a query with given parameters, as stored at its data URL.
+    """
+
+    def __init__(self) -> None:
+        self.content: Optional[bytes] = None
+        self.last_modified: Optional[datetime.datetime] = None
+        self.generation: Optional[asyncio.Task] = None
+
+
+class LocalMoonstream:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        generation_seconds: float = DEFAULT_GENERATION_SECONDS,
+        num_events: int = DEFAULT_EVENTS,
+        num_players: int = DEFAULT_PLAYERS,
+        leaderboard_queries: Optional[List[str]] = None,
+        result_files: Optional[Dict[str, str]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        assert 0 <= failure_rate <= 1, "Failure rate must be between 0 and 1"
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.generation_seconds = generation_seconds
+        self.num_events = num_events
+        self.num_players = num_players
+        self.leaderboard_queries = set(
+            leaderboard_queries
+            if leaderboard_queries is not None
+            else DEFAULT_LEADERBOARD_QUERIES
+        )
+        self.result_files = result_files if result_files is not None else {}
+        self.rng = random.Random(seed)
+        self.results: Dict[str, QueryResults] = {}
+        self.leaderboards: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests: Dict[str, int] = {}
+
+    def application(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_post("/queries/{query_name}/update_data", self.update_data)
+        app.router.add_get("/data/{query_name}/{key}.json", self.data)
+        app.router.add_put("/leaderboard/{leaderboard_id}/scores", self.put_scores)
+        app.router.add_get("/leaderboard/{leaderboard_id}/scores", self.get_scores)
+        return app
+
+    @web.middleware
+    async def middleware(
+        self, request: web.Request, handler: Any
+    ) -> web.StreamResponse:
+        route = request.match_info.route.resource
+        route_name = (
+            f"{request.method} {route.canonical}" if route is not None else "unknown"
+        )
+        self.requests[route_name] = self.requests.get(route_name, 0) + 1
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.failure_rate > 0 and self.rng.random() < self.failure_rate:
+            logger.debug(f"Injected failure: {request.method} {request.path}")
+            raise web.HTTPInternalServerError(text="Injected failure")
+        return await handler(request)
+
+    def generate(self, query_name: str, params: Dict[str, Any]) -> bytes:
+        path = self.result_files.get(query_name)
+        if path is not None:
+            with open(path, "rb") as ifp:
+                return ifp.read()
+        if query_name in self.leaderboard_queries:
+            data = synthetic_leaderboard(query_name, params, self.num_players)
+        else:
+            data = synthetic_events(
+                query_name, params, self.num_events, self.num_players
+            )
+        return dumps({"data": data, "block_number": None}).encode("utf-8")
+
+    async def write_results(
+        self, results: QueryResults, query_name: str, params: Dict[str, Any]
+    ) -> None:
+        await asyncio.sleep(self.generation_seconds)
+        results.content = self.generate(query_name, params)
+        results.last_modified = utc_now()
+        results.generation = None
+        logger.debug(
+            f"Generated results for {query_name}: {len(results.content)} bytes"
+        )
+
+    async def update_data(self, request: web.Request) -> web.Response:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            raise web.HTTPUnauthorized(text="Missing access token")
+        query_name = request.match_info["query_name"]
+        body = loads(await request.read())
+        params = body.get("params", {})
+        key = hashlib.sha256(query_key(query_name, params).encode("utf-8")).hexdigest()
+        results = self.results.setdefault(key, QueryResults())
+        # An update requested while one is running joins it rather than starting another.
+        if results.generation is None:
+            results.generation = asyncio.ensure_future(
+                self.write_results(results, query_name, params)
+            )
+        data_url = f"{request.scheme}://{request.host}/data/{query_name}/{key}.json"
+        return web.Response(
+            text=dumps({"url": data_url}), content_type="application/json"
+        )
+
+    async def data(self, request: web.Request) -> web.Response:
+        results = self.results.get(request.match_info["key"])
+        if results is None or results.content is None:
+            raise web.HTTPNotFound()
+        assert results.last_modified is not None
+        last_modified = http_date(results.last_modified)
+        if_modified_since = parse_http_date(request.headers.get("If-Modified-Since"))
+        if if_modified_since is not None and results.last_modified <= if_modified_since:
+            raise web.HTTPNotModified(headers={"Last-Modified": last_modified})
+        return web.Response(
+            body=results.content,
+            content_type="application/json",
+            headers={"Last-Modified": last_modified},
+        )
+
+    async def put_scores(self, request: web.Request) -> web.Response:
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            raise web.HTTPUnauthorized(text="Missing access token")
+        leaderboard_id = request.match_info["leaderboard_id"]
+        scores = loads(await request.read())
+        if not isinstance(scores, list):
+            raise web.HTTPBadRequest(text="Expected a list of scores")
+        self.leaderboards[leaderboard_id] = scores
+        logger.debug(f"Leaderboard {leaderboard_id}: {len(scores)} scores")
+        return web.Response(
+            text=dumps({"leaderboard_id": leaderboard_id, "scores": len(scores)}),
+            content_type="application/json",
+        )
+
+    async def get_scores(self, request: web.Request) -> web.Response:
+        scores = self.leaderboards.get(request.match_info["leaderboard_id"])
+        if scores is None:
+            raise web.HTTPNotFound()
+        return web.Response(text=dumps(scores), content_type="application/json")
+
+
+def handle_serve(args: argparse.Namespace) -> None:
+    result_files = {query_name: path for query_name, path in args.results}
+    server = LocalMoonstream(
+        latency=args.latency,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        generation_seconds=args.generation_seconds,
+        num_events=args.events,
+        num_players=args.players,
+        leaderboard_queries=args.leaderboard_query,
+        result_files=result_files,
+        seed=args.seed,
+    )
+    logger.info(
+        f"Moonstream Query and Engine API stand-in at http://{args.host}:{args.port}"
+    )
+    web.run_app(server.application(), host=args.host, port=args.port, print=None)
+    print_json({"requests": server.requests})
+
+
+def generate_cli() -> argparse.ArgumentParser:
+    """
+    Generates an argument parser for the "autocorns local-moonstream" command.
+    """
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the Moonstream Query and Engine APIs, for tests and benchmarks"
+    )
+    parser.set_defaults(func=lambda _: parser.print_help())
+    subparsers = parser.add_subparsers()
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        description="Serve the stand-in. Point the --api, --query-api and --engine-api arguments of other commands at it (any access token works). Prints request counts on exit.",
+    )
+    serve_parser.add_argument(
+        "--host", default=DEFAULT_HOST, help=f"Host to bind (default: {DEFAULT_HOST})"
+    )
+    serve_parser.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to bind (default: {DEFAULT_PORT})",
+    )
+    serve_parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds to wait before answering each request (default: 0)",
+    )
+    serve_parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Up to this many more seconds, chosen at random, to wait before answering each request (default: 0)",
+    )
+    serve_parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="Probability with which each request fails with a 500 (default: 0)",
+    )
+    serve_parser.add_argument(
+        "--generation-seconds",
+        type=float,
+        default=DEFAULT_GENERATION_SECONDS,
+        help=f"Seconds from an update_data request until the results of the query are written (default: {DEFAULT_GENERATION_SECONDS})",
+    )
+    serve_parser.add_argument(
+        "--events",
+        type=int,
+        default=DEFAULT_EVENTS,
+        help=f"Number of events in the results of each event query (default: {DEFAULT_EVENTS})",
+    )
+    serve_parser.add_argument(
+        "--players",
+        type=int,
+        default=DEFAULT_PLAYERS,
+        help=f"Number of distinct players in events, and of rows in leaderboard query results (default: {DEFAULT_PLAYERS})",
+    )
+    serve_parser.add_argument(
+        "--leaderboard-query",
+        action="append",
+        default=None,
+        help=f"Name of a query that returns leaderboard rows rather than events. Can be passed more than once. (default: {', '.join(DEFAULT_LEADERBOARD_QUERIES)})",
+    )
+    serve_parser.add_argument(
+        "--results",
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("QUERY_NAME", "FILE"),
+        help="Serve the contents of FILE (e.g. results saved by moonstream-events) as the results of QUERY_NAME, whatever its parameters. Can be passed more than once.",
+    )
+    serve_parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for latency jitter and failure injection (synthetic results do not depend on it)",
+    )
+    serve_parser.set_defaults(func=handle_serve)
+
+    return parser
+
+
+if __name__ == "__main__":
+    parser = generate_cli()
+    args = parser.parse_args()
+    args.func(args)
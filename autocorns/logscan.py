@@ -0,0 +1,232 @@
+"""
+Finds the unicorns that changed since a checkpoint by reading the contract's event logs.
+
+Random leaking and block staleness thresholds recrawl tokens that have not changed and can keep
+stale data for tokens that have. Instead, an incremental crawl reads every event that can change a
+unicorn's DNA or metadata (transfers, breeding, hatching, evolution, game locks and DNA updates)
+between the block of the checkpoint and the chain head, and only recrawls the tokens those events
+touch.
+
+eth_getLogs block ranges are sized adaptively: a range that fails (most providers reject ranges
+with too many results, or time out on them) is halved, and ranges grow again while they return few
+logs.
+"""
+
+import argparse
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from tqdm import tqdm
+from web3 import Web3
+from web3.exceptions import Web3Exception
+
+DEFAULT_LOG_RANGE = 2000
+MIN_LOG_RANGE = 1
+MAX_LOG_RANGE = 200000
+# Ranges are sized to return about this many logs per eth_getLogs request.
+TARGET_LOGS_PER_REQUEST = 2000
+DEFAULT_LOG_RETRY_ATTEMPTS = 3
+
+# Where the token ID sits in each event: ("topic", i) for the i-th topic (the event signature is
+# topic 0), or ("data", i) for the i-th word of the log data.
+TokenIdLocation = Tuple[str, int]
+
+TOKEN_EVENTS: Dict[str, List[TokenIdLocation]] = {
+    "Transfer(address,address,uint256)": [("topic", 3)],
+    "BreedingStarted(uint256,uint256,address)": [("topic", 1), ("topic", 2)],
+    "UnicornEggCreated(uint256,uint256,uint256,address)": [
+        ("data", 0),
+        ("data", 1),
+        ("topic", 1),
+    ],
+    "HatchStartedEvent(uint256,uint256,uint256,address)": [("topic", 1)],
+    "HatchFinishedEvent(uint256,uint256,address)": [("topic", 1)],
+    "UnicornLockedIntoGame(uint256,address)": [("data", 0)],
+    "UnicornUnlockedOutOfGame(uint256,address)": [("data", 0)],
+    "UnicornUnlockedOutOfGameForcefully(uint256,uint256,address)": [("data", 1)],
+    "DNAUpdated(uint256,uint256)": [("data", 0)],
+}
+
+
+def hex_value(value: Any) -> str:
+    """
+    Hex string without a 0x prefix, from bytes (including HexBytes) or a hex string.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).hex()
+    value = str(value).lower()
+    if value.startswith("0x"):
+        value = value[2:]
+    return value
+
+
+def event_topic(signature: str) -> str:
+    return hex_value(Web3.keccak(text=signature))
+
+
+TOKEN_EVENT_LOCATIONS: Dict[str, List[TokenIdLocation]] = {
+    event_topic(signature): locations for signature, locations in TOKEN_EVENTS.items()
+}
+
+
+def log_token_ids(log: Dict[str, Any]) -> List[int]:
+    """
+    Returns the IDs of the tokens an event log from TOKEN_EVENTS touches.
+    """
+    topics = [hex_value(topic) for topic in log["topics"]]
+    if not topics or topics[0] not in TOKEN_EVENT_LOCATIONS:
+        return []
+    data = hex_value(log["data"])
+
+    token_ids: List[int] = []
+    for kind, index in TOKEN_EVENT_LOCATIONS[topics[0]]:
+        if kind == "topic":
+            if index < len(topics):
+                token_ids.append(int(topics[index], 16))
+        else:
+            word = data[64 * index : 64 * (index + 1)]
+            if len(word) == 64:
+                token_ids.append(int(word, 16))
+    return token_ids
+
+
+def iter_logs(
+    get_logs: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+    address: str,
+    topics: Sequence[Any],
+    from_block: int,
+    to_block: int,
+    initial_range: int = DEFAULT_LOG_RANGE,
+    retry_attempts: int = DEFAULT_LOG_RETRY_ATTEMPTS,
+    progress_bar: Optional[tqdm] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields the logs matching address and topics between from_block and to_block (inclusive), one
+    eth_getLogs request's worth at a time, in block order.
+
+    get_logs takes an eth_getLogs filter and returns its logs (e.g. web3.eth.get_logs). The block
+    range of each request starts at initial_range, is halved whenever a request fails or returns
+    more than TARGET_LOGS_PER_REQUEST logs, and doubles while requests return less than half that.
+    A range of a single block that still fails is retried retry_attempts times before the error
+    is raised.
+    """
+    assert initial_range >= MIN_LOG_RANGE, f"Log range must be at least {MIN_LOG_RANGE}"
+    range_size = min(initial_range, MAX_LOG_RANGE)
+    start = from_block
+    failures = 0
+    while start <= to_block:
+        end = min(start + range_size - 1, to_block)
+        try:
+            logs = get_logs(
+                {
+                    "address": address,
+                    "topics": list(topics),
+                    "fromBlock": start,
+                    "toBlock": end,
+                }
+            )
+        except (ValueError, Web3Exception, requests.RequestException) as e:
+            if range_size > MIN_LOG_RANGE:
+                range_size = max(range_size // 2, MIN_LOG_RANGE)
+                continue
+            failures += 1
+            if failures >= retry_attempts:
+                raise
+            print(
+                f"eth_getLogs failed for block {start}, retrying: {str(e)}",
+                file=sys.stderr,
+            )
+            time.sleep(2**failures)
+            continue
+
+        failures = 0
+        yield logs
+        if progress_bar is not None:
+            progress_bar.update(end - start + 1)
+        start = end + 1
+
+        if len(logs) > TARGET_LOGS_PER_REQUEST:
+            range_size = max(range_size // 2, MIN_LOG_RANGE)
+        elif len(logs) < TARGET_LOGS_PER_REQUEST // 2:
+            range_size = min(range_size * 2, MAX_LOG_RANGE)
+
+
+def changed_tokens(
+    get_logs: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+    address: str,
+    from_block: int,
+    to_block: int,
+    initial_range: int = DEFAULT_LOG_RANGE,
+) -> Dict[int, int]:
+    """
+    Maps the ID of every token touched by an event in TOKEN_EVENTS between from_block and
+    to_block (inclusive) to the last block in which it was touched.
+    """
+    progress_bar = tqdm(
+        total=max(to_block - from_block + 1, 0),
+        desc="Reading unicorn events",
+    )
+    last_changed: Dict[int, int] = {}
+    topics = [["0x" + topic for topic in TOKEN_EVENT_LOCATIONS]]
+    for logs in iter_logs(
+        get_logs,
+        Web3.to_checksum_address(address),
+        topics,
+        from_block,
+        to_block,
+        initial_range=initial_range,
+        progress_bar=progress_bar,
+    ):
+        for log in logs:
+            block_number = int(log["blockNumber"])
+            for token_id in log_token_ids(log):
+                if block_number > last_changed.get(token_id, -1):
+                    last_changed[token_id] = block_number
+    progress_bar.close()
+    return last_changed
+
+
+def expire_changed_checkpoint_data(
+    checkpoint_data: List[Dict[str, Any]], last_changed: Dict[int, int]
+) -> List[Dict[str, Any]]:
+    """
+    Drops checkpoint items for tokens that changed after the block the item was crawled at.
+    """
+    return [
+        item
+        for item in checkpoint_data
+        if last_changed.get(item.get("token_id"), -1) <= item.get("block_number", 0)  # type: ignore
+    ]
+
+
+def checkpoint_start_block(*checkpoints: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    First block an incremental crawl needs to read events from for the given checkpoints, or None
+    if none of their items has a block number (in which case there is no block to start from, and
+    the checkpoints should be left as they are).
+    """
+    block_numbers = [
+        item["block_number"]
+        for checkpoint in checkpoints
+        for item in checkpoint
+        if item.get("block_number") is not None
+    ]
+    if not block_numbers:
+        return None
+    return min(block_numbers) + 1
+
+
+def add_incremental_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only recrawl checkpointed tokens that events show have changed since they were crawled (instead of expiring stale checkpoint items and leaking with --leak-rate)",
+    )
+    parser.add_argument(
+        "--log-range",
+        type=int,
+        default=DEFAULT_LOG_RANGE,
+        help=f"Number of blocks in the first eth_getLogs request of an incremental crawl. Later requests adapt their ranges to the number of events. (default: {DEFAULT_LOG_RANGE})",
+    )
@@ -1,11 +1,30 @@
+"""
+Client for the Moonstream Query API.
+
+Running a query takes two steps: a POST to /queries/<name>/update_data asks Moonstream to
+regenerate the query's results and returns a presigned URL for them, and the results are then
+polled from that URL until a version generated after the request shows up.
+
+Polls start INITIAL_INTERVAL seconds apart and back off exponentially up to a maximum interval, so
+small queries come back in a few seconds without hammering the data URL while large ones run.
+Requests share a pooled aiohttp session.
+
+Freshness is judged by the clock of the server: polls carry an If-Modified-Since header with the
+Date of the update_data response (less a second, since HTTP dates have second resolution), and a
+response only counts if its Last-Modified is no earlier than that Date.
+"""
+
+import asyncio
 import datetime
-import json
+from email.utils import format_datetime, parsedate_to_datetime
 import logging
 import os
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Awaitable, Dict, Iterator, Optional, Tuple, TypeVar
+
+import aiohttp
 
-import requests
+from .jsonl import loads
 
 logging.basicConfig()
 logger = logging.getLogger("autocorns.moonstream")
@@ -18,64 +37,265 @@ logger.setLevel(log_level)
 if log_level == logging.DEBUG:
     logger.debug(f"DEBUG mode")
 
+T = TypeVar("T")
+
+DEFAULT_API_URL = "https://api.moonstream.to"
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONNECTIONS = 8
+INITIAL_INTERVAL = 0.5
+BACKOFF_FACTOR = 2.0
+DEFAULT_MAX_INTERVAL = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class MoonstreamQueryError(Exception):
+    pass
+
+
+class QueryResponse:
+    """
+    Raw results of a Moonstream query, and how long it took to get them.
+    """
+
+    def __init__(
+        self,
+        content: bytes,
+        last_modified: Optional[str],
+        attempts: int,
+        polls: int,
+        seconds: float,
+    ) -> None:
+        self.content = content
+        self.last_modified = last_modified
+        self.attempts = attempts
+        self.polls = polls
+        self.seconds = seconds
+
+    def json(self) -> Any:
+        return loads(self.content)
+
+
+def polling_intervals(
+    initial_interval: float = INITIAL_INTERVAL,
+    max_interval: float = DEFAULT_MAX_INTERVAL,
+    backoff_factor: float = BACKOFF_FACTOR,
+) -> Iterator[float]:
+    interval = min(initial_interval, max_interval)
+    while True:
+        yield interval
+        interval = min(interval * backoff_factor, max_interval)
+
+
+def utc_now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+
+def parse_http_date(value: Optional[str]) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def http_date(value: datetime.datetime) -> str:
+    return format_datetime(value.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+class MoonstreamClient:
+    """
+    Runs Moonstream queries over a pooled aiohttp session. Use it as an async context manager:
+
+        async with MoonstreamClient(access_token) as client:
+            results = await client.query("query_name", {"param": "value"})
+
+    Any number of queries can run on one client concurrently.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        api_url: str = DEFAULT_API_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        connections: int = DEFAULT_CONNECTIONS,
+    ) -> None:
+        assert connections >= 1, "Need at least one connection"
+        self.access_token = access_token
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.connections = connections
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "MoonstreamClient":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connections),
+            # Like requests' timeouts: the download of a large result can take longer than
+            # timeout, as long as data keeps coming.
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=self.timeout, sock_read=self.timeout
+            ),
+        )
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def update_data(
+        self, query_name: str, params: Dict[str, Any]
+    ) -> Tuple[str, datetime.datetime]:
+        """
+        Asks Moonstream to regenerate the results of a query. Returns the URL to poll for them, and
+        the time of the request according to the server.
+        """
+        assert self.session is not None, "MoonstreamClient is not open"
+        async with self.session.post(
+            f"{self.api_url}/queries/{query_name}/update_data",
+            json={"params": params},
+            headers={
+                "Authorization": f"Bearer {self.access_token}",
+                "Content-Type": "application/json",
+            },
+        ) as response:
+            response.raise_for_status()
+            response_body = loads(await response.read())
+            requested_at = parse_http_date(response.headers.get("Date"))
+        if requested_at is None:
+            requested_at = utc_now()
+        return response_body["url"], requested_at
+
+    async def poll_data(
+        self,
+        data_url: str,
+        requested_at: datetime.datetime,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        max_polls: int = 0,
+    ) -> Tuple[Optional[bytes], Optional[str], int]:
+        """
+        Polls data_url for results generated no earlier than requested_at, at most max_polls times
+        (no limit if 0). Returns the results (None if they did not show up), their Last-Modified
+        header and the number of polls.
+        """
+        assert self.session is not None, "MoonstreamClient is not open"
+        if_modified_since = http_date(requested_at - datetime.timedelta(seconds=1))
+        logger.debug(f"If-Modified-Since: {if_modified_since}")
+        polls = 0
+        for interval in polling_intervals(max_interval=max_interval):
+            if max_polls > 0 and polls >= max_polls:
+                break
+            await asyncio.sleep(interval)
+            polls += 1
+            try:
+                async with self.session.get(
+                    data_url, headers={"If-Modified-Since": if_modified_since}
+                ) as response:
+                    last_modified = response.headers.get("Last-Modified")
+                    logger.debug(
+                        f"Status code: {response.status}, Last-Modified: {last_modified}"
+                    )
+                    if response.status != 200:
+                        # 304 until the new results are written (and 403 or 404 from the object
+                        # store if there were no results before).
+                        continue
+                    modified_at = parse_http_date(last_modified)
+                    if modified_at is not None and modified_at < requested_at:
+                        continue
+                    return await response.read(), last_modified, polls
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Failed to get data from {data_url}: {str(e)}")
+        return None, None, polls
+
+    async def fetch(
+        self,
+        query_name: str,
+        params: Dict[str, Any],
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        max_polls: int = 0,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> QueryResponse:
+        """
+        Runs a query and returns its raw results. If the results do not show up within max_polls
+        polls, the query is requested again, up to max_attempts times in all. Raises a
+        MoonstreamQueryError if they never show up.
+        """
+        assert max_attempts >= 1, "Need at least one attempt"
+        started_at = time.perf_counter()
+        total_polls = 0
+        for attempt in range(1, max_attempts + 1):
+            data_url, requested_at = await self.update_data(query_name, params)
+            content, last_modified, polls = await self.poll_data(
+                data_url, requested_at, max_interval, max_polls
+            )
+            total_polls += polls
+            if content is not None:
+                return QueryResponse(
+                    content,
+                    last_modified,
+                    attempt,
+                    total_polls,
+                    time.perf_counter() - started_at,
+                )
+            logger.warning(
+                f"No results for query {query_name} after {polls} polls (attempt {attempt} of {max_attempts})"
+            )
+        raise MoonstreamQueryError(
+            f"Failed to retrieve results for query {query_name} after {max_attempts} attempts"
+        )
+
+    async def query(
+        self,
+        query_name: str,
+        params: Dict[str, Any],
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        max_polls: int = 0,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ) -> Any:
+        response = await self.fetch(
+            query_name, params, max_interval, max_polls, max_attempts
+        )
+        return response.json()
+
+
+def run(coroutine: Awaitable[T]) -> T:
+    """
+    Runs a coroutine to completion on a new event loop.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
 
 def get_results_for_moonstream_query(
     moonstream_access_token: str,
     query_name: str,
     params: Dict[str, Any],
-    api_url: str = "https://api.moonstream.to",
+    api_url: str = DEFAULT_API_URL,
     max_retries: int = 100,
-    interval: float = 30.0,
+    interval: float = DEFAULT_MAX_INTERVAL,
 ) -> Optional[Dict[str, Any]]:
-    result: Optional[Dict[str, Any]] = None
-
-    api_url = api_url.rstrip("/")
-    request_url = f"{api_url}/queries/{query_name}/update_data"
-    headers = {
-        "Authorization": f"Bearer {moonstream_access_token}",
-        "Content-Type": "application/json",
-    }
-    # Assume our clock is not drifting too much from AWS clocks.
-    if_modified_since_datetime = datetime.datetime.utcnow()
-    if_modified_since = if_modified_since_datetime.strftime("%a, %d %b %Y %H:%M:%S GMT")
-
-    request_body = {"params": params}
-
-    success = False
-    attempts = 0
-
-    while not success and attempts < max_retries:
-        attempts += 1
-        response = requests.post(
-            request_url, json=request_body, headers=headers, timeout=10
-        )
-        response.raise_for_status()
-        response_body = response.json()
-        data_url = response_body["url"]
+    """
+    Runs a query and returns its results, or None if they never showed up. Results are polled for
+    at most max_retries times per attempt (no limit if 0), at most interval seconds apart.
+    """
 
-        keep_going = True
-        num_retries = 0
-
-        logging.debug(f"If-Modified-Since: {if_modified_since}")
-        while keep_going:
-            time.sleep(interval)
-            num_retries += 1
+    async def results() -> Optional[Dict[str, Any]]:
+        async with MoonstreamClient(moonstream_access_token, api_url) as client:
             try:
-                data_response = requests.get(
-                    data_url,
-                    headers={"If-Modified-Since": if_modified_since},
-                    timeout=10,
+                return await client.query(
+                    query_name, params, max_interval=interval, max_polls=max_retries
                 )
-            except:
-                logger.error(f"Failed to get data from {data_url}")
-                continue
-            logger.debug(f"Status code: {data_response.status_code}")
-            logger.debug(f"Last-Modified: {data_response.headers['Last-Modified']}")
-            if data_response.status_code == 200:
-                result = data_response.json()
-                keep_going = False
-                success = True
-            if keep_going and max_retries > 0:
-                keep_going = num_retries <= max_retries
-
-    return result
+            except MoonstreamQueryError as e:
+                logger.error(str(e))
+                return None
+
+    return run(results())
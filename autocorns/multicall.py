@@ -0,0 +1,1017 @@
+"""
+Shared machinery for crawling contract state through Multicall2 tryAggregate calls.
+"""
+
+import argparse
+import atexit
+import collections
+from concurrent.futures import Future, ThreadPoolExecutor
+import itertools
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from brownie import network, web3
+from tqdm import tqdm
+
+from .aiocrawl import (
+    async_group_caller,
+    AsyncEngine,
+    DEFAULT_CONCURRENCY,
+    dispatch_async,
+)
+from .callcache import CallCache, DEFAULT_CALL_CACHE_FILE
+from .decoders import fast_decoder, fast_encoder
+from .jsonrpc import DEFAULT_BATCH_SIZE, JSONRPCBatchTransport
+from .rpcpool import DEFAULT_EJECT_SECONDS, DEFAULT_HEDGE_PERCENTILE, EndpointPool
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+Transport = Union[JSONRPCBatchTransport, EndpointPool]
+
+MULTICALL2_ADDRESS = "0xc8E51042792d7405184DfCa245F2d27B94D013b6"
+
+DEFAULT_NUM_WORKERS = 1
+
+DEFAULT_CHUNK_SIZES_FILE = os.environ.get(
+    "AUTOCORNS_CHUNK_SIZES_FILE",
+    os.path.join(os.path.expanduser("~"), ".autocorns", "chunk-sizes.json"),
+)
+MIN_CHUNK_SIZE = 1
+MAX_CHUNK_SIZE = 5000
+# Multicalls that take longer than this many seconds are treated as a sign that the chunk is too
+# large for the provider, even if they succeed.
+TARGET_CHUNK_LATENCY = 10.0
+
+DEFAULT_RETRY_ATTEMPTS = 3
+DEFAULT_RETRY_BUDGET = 500
+
+
+def call_arguments(input: Any) -> Tuple[Any, ...]:
+    """
+    Inputs to methods that take several arguments are tuples of those arguments.
+    """
+    if isinstance(input, tuple):
+        return input
+    return (input,)
+
+
+def encode_calls(
+    brownie_contract_method: Any, address: str, inputs: Sequence[Any]
+) -> List[Tuple[str, Any]]:
+    encoder = fast_encoder(brownie_contract_method)
+    if encoder is not None:
+        try:
+            return [
+                (address, encoder.encode(*call_arguments(input))) for input in inputs
+            ]
+        except (OverflowError, TypeError, ValueError):
+            # Inputs the fast encoder does not take, e.g. "1 ether". brownie converts them, or
+            # raises its usual errors for values that do not fit the ABI types.
+            pass
+
+    return [
+        (
+            address,
+            brownie_contract_method.encode_input(*call_arguments(input)),
+        )
+        for input in inputs
+    ]
+
+
+def encode_fused_calls(
+    brownie_contract_methods: Sequence[Any], address: str, inputs: Sequence[Any]
+) -> List[Tuple[str, Any]]:
+    """
+    Encodes a call to every one of the given methods for each input. The calls for an input are
+    adjacent, in the same order as the methods.
+    """
+    calls_by_method = [
+        encode_calls(brownie_contract_method, address, inputs)
+        for brownie_contract_method in brownie_contract_methods
+    ]
+    return [call for input_calls in zip(*calls_by_method) for call in input_calls]
+
+
+def aggregate(
+    multicall_method: Any,
+    calls: List[Tuple[str, Any]],
+    block_number: Any = "latest",
+    transport: Optional[Transport] = None,
+) -> Sequence[Tuple[bool, Any]]:
+    if transport is None:
+        return multicall_method.call(
+            False,  # success not required
+            calls,
+            block_identifier=block_number,
+        )
+
+    multicall_result = transport.try_aggregate(
+        multicall_method._address, [calls], block_number
+    )[0]
+    if isinstance(multicall_result, Exception):
+        raise multicall_result
+    return multicall_result
+
+
+def make_multicall(
+    multicall_method: Any,
+    brownie_contract_method: Any,
+    address: str,
+    inputs: List[Any],
+    block_number: str = "latest",
+    transport: Optional[Transport] = None,
+) -> Any:
+    calls = encode_calls(brownie_contract_method, address, inputs)
+    multicall_result = aggregate(multicall_method, calls, block_number, transport)
+    return decode_multicall_result(brownie_contract_method, multicall_result)
+
+
+def decode_multicall_result(
+    brownie_contract_method: Any, multicall_result: Sequence[Tuple[bool, Any]]
+) -> List[Any]:
+    results = []
+
+    decoder = fast_decoder(brownie_contract_method)
+    if decoder is not None:
+        decoded = decoder.decode_many(multicall_result)
+        for encoded_data, value in zip(multicall_result, decoded):
+            if not encoded_data[0]:
+                print(encoded_data, file=sys.stderr)
+                results.append(None)
+            elif value is None:
+                # Malformed return data gets the same treatment as with the generic decoder.
+                results.append(brownie_contract_method.decode_output(encoded_data[1]))
+            else:
+                results.append(value)
+        return results
+
+    # Handle the case with not successful calls
+    for encoded_data in multicall_result:
+        if encoded_data[0]:
+            results.append(brownie_contract_method.decode_output(encoded_data[1]))
+        else:
+            print(encoded_data, file=sys.stderr)
+            results.append(None)
+    return results
+
+
+def decode_fused_multicall_result(
+    brownie_contract_methods: Sequence[Any],
+    multicall_result: Sequence[Tuple[bool, Any]],
+) -> List[Tuple[Any, ...]]:
+    """
+    Decodes the result of a multicall made with encode_fused_calls into one tuple per input, with
+    one output per method (None for unsuccessful calls).
+    """
+    num_methods = len(brownie_contract_methods)
+    outputs_by_method = [
+        decode_multicall_result(
+            brownie_contract_method, multicall_result[i::num_methods]
+        )
+        for i, brownie_contract_method in enumerate(brownie_contract_methods)
+    ]
+    return list(zip(*outputs_by_method))
+
+
+def chunks(items: Sequence[T], chunk_size: int) -> Iterator[Sequence[T]]:
+    for i in range(0, len(items), chunk_size):
+        yield items[i : i + chunk_size]
+
+
+class ChunkSizer:
+    """
+    Learns how many calls to pack into each multicall, separately for every (network, method) key.
+
+    Chunk sizes grow multiplicatively while full-sized chunks succeed quickly, and shrink when a
+    multicall fails or when its latency spikes well above the running average (or above
+    TARGET_CHUNK_LATENCY). If state_file is given, learned sizes are loaded from it and written back
+    by save(), so that the next crawl starts close to the sizes this one converged on.
+    """
+
+    def __init__(
+        self,
+        state_file: Optional[str] = None,
+        min_size: int = MIN_CHUNK_SIZE,
+        max_size: int = MAX_CHUNK_SIZE,
+        growth_factor: float = 1.25,
+        failure_factor: float = 0.5,
+        spike_factor: float = 0.75,
+        spike_threshold: float = 2.0,
+        target_latency: float = TARGET_CHUNK_LATENCY,
+    ) -> None:
+        assert (
+            1 <= min_size <= max_size
+        ), "Chunk size bounds must satisfy 1 <= min <= max"
+        self.state_file = state_file
+        self.min_size = min_size
+        self.max_size = max_size
+        self.growth_factor = growth_factor
+        self.failure_factor = failure_factor
+        self.spike_factor = spike_factor
+        self.spike_threshold = spike_threshold
+        self.target_latency = target_latency
+        self.state: Dict[str, Dict[str, float]] = {}
+        self.lock = threading.Lock()
+
+        if state_file is not None and os.path.exists(state_file):
+            with open(state_file, "r") as ifp:
+                self.state = json.load(ifp)
+
+    def clamp(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def size(self, key: str, default: int) -> int:
+        with self.lock:
+            entry = self.state.setdefault(key, {"chunk_size": self.clamp(default)})
+            return self.clamp(entry["chunk_size"])
+
+    def success(self, key: str, num_calls: int, latency: float) -> None:
+        with self.lock:
+            entry = self.state.setdefault(key, {"chunk_size": self.clamp(num_calls)})
+            average_latency = entry.get("latency")
+            if latency > self.target_latency or (
+                average_latency is not None
+                and latency > self.spike_threshold * average_latency
+            ):
+                entry["chunk_size"] = self.clamp(
+                    entry["chunk_size"] * self.spike_factor
+                )
+            elif num_calls >= entry["chunk_size"]:
+                # Only full-sized chunks are evidence that the current size is safe to grow.
+                entry["chunk_size"] = self.clamp(
+                    max(
+                        entry["chunk_size"] + 1,
+                        entry["chunk_size"] * self.growth_factor,
+                    )
+                )
+
+            if average_latency is None:
+                entry["latency"] = latency
+            else:
+                entry["latency"] = 0.8 * average_latency + 0.2 * latency
+
+    def failure(self, key: str, num_calls: int) -> None:
+        with self.lock:
+            entry = self.state.setdefault(key, {"chunk_size": self.clamp(num_calls)})
+            entry["chunk_size"] = self.clamp(
+                min(entry["chunk_size"], num_calls) * self.failure_factor
+            )
+
+    def save(self) -> None:
+        if self.state_file is None:
+            return
+        with self.lock:
+            state_dir = os.path.dirname(self.state_file)
+            if state_dir:
+                os.makedirs(state_dir, exist_ok=True)
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, "w") as ofp:
+                json.dump(self.state, ofp, indent=2, sort_keys=True)
+            os.replace(temp_file, self.state_file)
+
+
+class RetryBudgetExhausted(Exception):
+    """
+    Raised when a crawl has retried more failed multicalls than its RetryPolicy allows.
+    """
+
+
+class RetryPolicy:
+    """
+    Decides how failed multicalls are retried.
+
+    Every chunk is attempted up to `attempts` times, with exponential backoff and jitter between
+    attempts. A chunk that still fails is split in half, and each half is attempted once before it
+    is split again, until the failing inputs are isolated. Isolated inputs are attempted `attempts`
+    times before they are reported as failures.
+
+    Each retry and each split draws from a budget shared by the whole crawl. Once the budget is
+    spent, the crawl raises RetryBudgetExhausted instead of hammering an unavailable provider.
+    """
+
+    def __init__(
+        self,
+        attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        budget: int = DEFAULT_RETRY_BUDGET,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        jitter: float = 0.5,
+    ) -> None:
+        assert attempts >= 1, "Number of attempts must be at least 1"
+        assert 0 <= jitter <= 1, "Jitter must be between 0 and 1"
+        self.attempts = attempts
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.spent = 0
+        self.lock = threading.Lock()
+
+    def delay(self, attempt: int) -> float:
+        """
+        Number of seconds to wait after the given (0-indexed) failed attempt.
+        """
+        delay = min(self.max_delay, self.base_delay * (2**attempt))
+        return delay * (1 - self.jitter * random.random())
+
+    def spend(self, reason: str) -> None:
+        with self.lock:
+            self.spent += 1
+            if self.spent > self.budget:
+                raise RetryBudgetExhausted(
+                    f"Retry budget of {self.budget} exhausted. Last failure: {reason}"
+                )
+
+
+class MulticallSettings:
+    """
+    Knobs shared by every multicall crawl. The defaults reproduce a plain sequential crawl with
+    each crawl's default chunk size.
+
+    If chunk_size is set, it overrides the default chunk size of every crawl.
+
+    If engine is set, crawls run as coroutines on the engine (see aiocrawl.py) instead of on
+    num_workers threads, and transport is not used.
+
+    If call_cache is set, crawls at fixed block numbers only make the calls that are not already
+    in the cache (see callcache.py).
+    """
+
+    def __init__(
+        self,
+        num_workers: int = DEFAULT_NUM_WORKERS,
+        chunk_size: Optional[int] = None,
+        chunk_sizer: Optional[ChunkSizer] = None,
+        retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+        retry_budget: int = DEFAULT_RETRY_BUDGET,
+        transport: Optional[Transport] = None,
+        engine: Optional[AsyncEngine] = None,
+        call_cache: Optional[CallCache] = None,
+    ) -> None:
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.chunk_sizer = chunk_sizer
+        self.retry_attempts = retry_attempts
+        self.retry_budget = retry_budget
+        self.transport = transport
+        self.engine = engine
+        self.call_cache = call_cache
+
+
+def chunk_size_key(*brownie_contract_methods: Any) -> str:
+    method_names = "+".join(
+        brownie_contract_method.abi["name"]
+        for brownie_contract_method in brownie_contract_methods
+    )
+    return f"{network.show_active()}:{method_names}"
+
+
+def dispatch(
+    fn: Callable[[T], R],
+    jobs: Iterable[T],
+    num_workers: int = DEFAULT_NUM_WORKERS,
+    max_in_flight: Optional[int] = None,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Applies fn to each job on a pool of num_workers threads and yields (job, result) pairs in the
+    order in which the jobs were submitted.
+
+    At most max_in_flight jobs (default: twice the number of workers) are submitted ahead of the
+    job whose result is being waited on, so jobs can be a lazy iterable of any length.
+
+    With a single worker, jobs are processed in the calling thread.
+    """
+    assert num_workers >= 1, "Number of workers must be at least 1"
+    if num_workers == 1:
+        for job in jobs:
+            yield job, fn(job)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = 2 * num_workers
+    assert max_in_flight >= 1, "In-flight limit must be at least 1"
+
+    pending: Deque[Tuple[T, "Future[R]"]] = collections.deque()
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        try:
+            for job in jobs:
+                if len(pending) >= max_in_flight:
+                    head_job, head_future = pending.popleft()
+                    yield head_job, head_future.result()
+                pending.append((job, executor.submit(fn, job)))
+
+            while pending:
+                head_job, head_future = pending.popleft()
+                yield head_job, head_future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def crawl_multicall(
+    multicall_method: Any,
+    brownie_contract_method: Any,
+    address: str,
+    inputs: Sequence[Any],
+    chunk_size: int,
+    block_number: Any = "latest",
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Tuple[List[Any], Dict[int, str]]:
+    """
+    Calls brownie_contract_method on every input through Multicall2 tryAggregate, with up to
+    settings.num_workers chunks in flight at a time.
+
+    If settings has a chunk_sizer, chunk_size is only the starting point for the chunk size, which
+    then adapts to how the provider handles each chunk. Otherwise every chunk has chunk_size inputs.
+    Failed multicalls are retried as described in RetryPolicy.
+
+    If settings has a transport, multicalls bypass brownie and up to transport.batch_size chunks
+    are sent in each HTTP request.
+
+    Returns the decoded outputs in the same order as the inputs (None for unsuccessful calls), and
+    a dictionary mapping the positions of inputs whose multicalls could not be made to the errors
+    they raised.
+    """
+    return crawl_calls(
+        multicall_method,
+        lambda inputs_chunk: encode_calls(
+            brownie_contract_method, address, inputs_chunk
+        ),
+        lambda multicall_result: decode_multicall_result(
+            brownie_contract_method, multicall_result
+        ),
+        chunk_size_key(brownie_contract_method),
+        inputs,
+        chunk_size,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    )
+
+
+def crawl_fused_multicall(
+    multicall_method: Any,
+    brownie_contract_methods: Sequence[Any],
+    address: str,
+    inputs: Sequence[Any],
+    chunk_size: int,
+    block_number: Any = "latest",
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Tuple[List[Tuple[Any, ...]], Dict[int, str]]:
+    """
+    Like crawl_multicall, but calls every one of brownie_contract_methods on each input. The calls
+    for all methods on an input go into the same tryAggregate call, so a crawl of several methods
+    over the same inputs takes as many multicalls as a crawl of one of them (with chunks that
+    hold fewer inputs).
+
+    chunk_size is the number of inputs, not calls, per multicall.
+
+    Returns, in the same order as the inputs, a tuple for each input with the output of each method
+    (None for unsuccessful calls), and a dictionary mapping the positions of inputs whose
+    multicalls could not be made to the errors they raised.
+    """
+    return crawl_calls(
+        multicall_method,
+        lambda inputs_chunk: encode_fused_calls(
+            brownie_contract_methods, address, inputs_chunk
+        ),
+        lambda multicall_result: decode_fused_multicall_result(
+            brownie_contract_methods, multicall_result
+        ),
+        chunk_size_key(*brownie_contract_methods),
+        inputs,
+        chunk_size,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    )
+
+
+def iter_crawl_multicall(
+    multicall_method: Any,
+    brownie_contract_method: Any,
+    address: str,
+    inputs: Iterable[Any],
+    chunk_size: int,
+    block_number: Any = "latest",
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Iterator[Tuple[int, List[Any], List[Any], Dict[int, str]]]:
+    """
+    Streaming version of crawl_multicall, which yields the outputs of each group of chunks as soon
+    as it is crawled. See iter_crawl_calls for what it yields.
+    """
+    return iter_crawl_calls(
+        multicall_method,
+        lambda inputs_chunk: encode_calls(
+            brownie_contract_method, address, inputs_chunk
+        ),
+        lambda multicall_result: decode_multicall_result(
+            brownie_contract_method, multicall_result
+        ),
+        chunk_size_key(brownie_contract_method),
+        inputs,
+        chunk_size,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    )
+
+
+def iter_crawl_fused_multicall(
+    multicall_method: Any,
+    brownie_contract_methods: Sequence[Any],
+    address: str,
+    inputs: Iterable[Any],
+    chunk_size: int,
+    block_number: Any = "latest",
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Iterator[Tuple[int, List[Any], List[Tuple[Any, ...]], Dict[int, str]]]:
+    """
+    Streaming version of crawl_fused_multicall, for crawls whose inputs arrive over time (e.g. from
+    an earlier stage of a pipeline). See iter_crawl_calls for what it yields.
+    """
+    return iter_crawl_calls(
+        multicall_method,
+        lambda inputs_chunk: encode_fused_calls(
+            brownie_contract_methods, address, inputs_chunk
+        ),
+        lambda multicall_result: decode_fused_multicall_result(
+            brownie_contract_methods, multicall_result
+        ),
+        chunk_size_key(*brownie_contract_methods),
+        inputs,
+        chunk_size,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    )
+
+
+def crawl_calls(
+    multicall_method: Any,
+    encode: Callable[[Sequence[Any]], List[Tuple[str, Any]]],
+    decode: Callable[[Sequence[Tuple[bool, Any]]], List[Any]],
+    key: str,
+    inputs: Iterable[Any],
+    chunk_size: int,
+    block_number: Any = "latest",
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Tuple[List[Any], Dict[int, str]]:
+    """
+    The crawl loop behind crawl_multicall and crawl_fused_multicall. encode turns a chunk of inputs
+    into Multicall2 calls, and decode turns the tryAggregate result for those calls back into one
+    output per input. key identifies the crawl to settings.chunk_sizer.
+    """
+    results: List[Any] = []
+    failures: Dict[int, str] = {}
+    for _, _, chunk_results, chunk_failures in iter_crawl_calls(
+        multicall_method,
+        encode,
+        decode,
+        key,
+        inputs,
+        chunk_size,
+        block_number=block_number,
+        settings=settings,
+        progress_bar=progress_bar,
+    ):
+        results.extend(chunk_results)
+        failures.update(chunk_failures)
+    return results, failures
+
+
+def iter_crawl_calls(
+    multicall_method: Any,
+    encode: Callable[[Sequence[Any]], List[Tuple[str, Any]]],
+    decode: Callable[[Sequence[Tuple[bool, Any]]], List[Any]],
+    key: str,
+    inputs: Iterable[Any],
+    chunk_size: int,
+    block_number: Any = "latest",
+    settings: Optional[MulticallSettings] = None,
+    progress_bar: Optional[tqdm] = None,
+) -> Iterator[Tuple[int, List[Any], List[Any], Dict[int, str]]]:
+    """
+    Crawls inputs chunk by chunk, as soon as each chunk is available from the inputs iterable.
+
+    Yields, in input order, (offset, inputs, outputs, failures) for each batch of chunks that
+    completes. offset is the position of the first of those inputs in the crawl, and failures maps
+    the positions (in the crawl, not the batch) of inputs whose multicalls could not be made to the
+    errors they raised.
+    """
+    if settings is None:
+        settings = MulticallSettings()
+    if settings.chunk_size is not None:
+        chunk_size = settings.chunk_size
+    chunk_sizer = settings.chunk_sizer
+    transport = settings.transport
+    engine = settings.engine
+    call_cache = settings.call_cache
+    if call_cache is None:
+        call_cache = CallCache()
+    retry_policy = RetryPolicy(settings.retry_attempts, settings.retry_budget)
+
+    def current_chunk_size() -> int:
+        if chunk_sizer is None:
+            return chunk_size
+        return chunk_sizer.size(key, chunk_size)
+
+    def next_chunks() -> Iterator[Tuple[int, Sequence[Any]]]:
+        inputs_iterator = iter(inputs)
+        offset = 0
+        while True:
+            inputs_chunk = list(itertools.islice(inputs_iterator, current_chunk_size()))
+            if not inputs_chunk:
+                return
+            yield offset, inputs_chunk
+            offset += len(inputs_chunk)
+
+    def next_groups() -> Iterator[List[Tuple[int, Sequence[Any]]]]:
+        group_size = 1
+        if engine is not None:
+            group_size = engine.batch_size
+        elif transport is not None:
+            group_size = transport.batch_size
+        group: List[Tuple[int, Sequence[Any]]] = []
+        for offset_chunk in next_chunks():
+            group.append(offset_chunk)
+            if len(group) >= group_size:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def call_chunk(
+        offset: int, inputs_chunk: Sequence[Any], bisected: bool = False
+    ) -> Tuple[List[Any], Dict[int, str]]:
+        attempts = retry_policy.attempts
+        if bisected and len(inputs_chunk) > 1:
+            attempts = 1
+
+        error: Optional[ValueError] = None
+        for attempt in range(attempts):
+            if attempt > 0:
+                retry_policy.spend(str(error))
+                time.sleep(retry_policy.delay(attempt - 1))
+
+            started_at = time.monotonic()
+            try:
+                calls = encode(inputs_chunk)
+                lookups, to_send = call_cache.prepare([calls], block_number)
+                sent_results = [
+                    aggregate(
+                        multicall_method,
+                        calls_to_send,
+                        block_number=block_number,
+                        transport=transport,
+                    )
+                    for calls_to_send in to_send
+                ]
+                chunk_results = decode(
+                    call_cache.complete([calls], block_number, lookups, sent_results)[0]  # type: ignore
+                )
+            except ValueError as e:
+                error = e
+                if chunk_sizer is not None and not bisected and attempt == 0:
+                    chunk_sizer.failure(key, len(inputs_chunk))
+                continue
+            except Exception as e:
+                print(e, file=sys.stderr)
+                print(list(inputs_chunk), file=sys.stderr)
+                raise e
+
+            if chunk_sizer is not None and not bisected and to_send:
+                chunk_sizer.success(
+                    key, len(inputs_chunk), time.monotonic() - started_at
+                )
+            return chunk_results, {}
+
+        if len(inputs_chunk) == 1:
+            print(
+                f"Giving up on input {inputs_chunk[0]}: {str(error)}", file=sys.stderr
+            )
+            return [None], {offset: str(error)}
+
+        retry_policy.spend(str(error))
+        middle = len(inputs_chunk) // 2
+        left_results, left_failures = call_chunk(
+            offset, inputs_chunk[:middle], bisected=True
+        )
+        right_results, right_failures = call_chunk(
+            offset + middle, inputs_chunk[middle:], bisected=True
+        )
+        return left_results + right_results, {**left_failures, **right_failures}
+
+    def call_group(
+        group: List[Tuple[int, Sequence[Any]]],
+    ) -> Tuple[List[Any], Dict[int, str]]:
+        if transport is None or len(group) == 1:
+            offset, inputs_chunk = group[0]
+            return call_chunk(offset, inputs_chunk)
+
+        started_at = time.monotonic()
+        batches = [encode(inputs_chunk) for _, inputs_chunk in group]
+        lookups, to_send = call_cache.prepare(batches, block_number)
+        sent_results: List[Union[Sequence[Tuple[bool, Any]], Exception, None]] = []
+        if to_send:
+            try:
+                sent_results = list(
+                    transport.try_aggregate(
+                        multicall_method._address, to_send, block_number
+                    )
+                )
+            except ValueError:
+                sent_results = [None] * len(to_send)
+        batch_results = call_cache.complete(
+            batches, block_number, lookups, sent_results
+        )
+        # The chunks of a group share one round trip, so each is credited with its share of it.
+        latency_per_call = (time.monotonic() - started_at) / sum(
+            len(inputs_chunk) for _, inputs_chunk in group
+        )
+
+        group_results: List[Any] = []
+        group_failures: Dict[int, str] = {}
+        for (offset, inputs_chunk), multicall_result in zip(group, batch_results):
+            if multicall_result is None or isinstance(multicall_result, Exception):
+                # Chunks whose eth_calls failed go through the usual retries on their own.
+                chunk_results, chunk_failures = call_chunk(offset, inputs_chunk)
+            else:
+                chunk_results = decode(multicall_result)
+                chunk_failures = {}
+                if chunk_sizer is not None:
+                    chunk_sizer.success(
+                        key, len(inputs_chunk), latency_per_call * len(inputs_chunk)
+                    )
+            group_results.extend(chunk_results)
+            group_failures.update(chunk_failures)
+
+        return group_results, group_failures
+
+    if engine is None:
+        completed_groups = dispatch(call_group, next_groups(), settings.num_workers)
+    else:
+        completed_groups = dispatch_async(
+            engine,
+            async_group_caller(
+                engine,
+                multicall_method._address,
+                encode,
+                decode,
+                block_number,
+                retry_policy,
+                chunk_sizer,
+                key,
+                call_cache,
+            ),
+            next_groups(),
+        )
+
+    try:
+        for group, (group_results, group_failures) in completed_groups:
+            group_inputs = [item for _, inputs_chunk in group for item in inputs_chunk]
+            if progress_bar is not None:
+                progress_bar.update(len(group_inputs))
+            yield group[0][0], group_inputs, group_results, group_failures
+    finally:
+        if chunk_sizer is not None:
+            chunk_sizer.save()
+
+
+class EndOfStream:
+    """
+    Marks the end of the items that prefetch puts on its queue.
+    """
+
+    def __init__(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+
+
+def prefetch(items: Iterable[T], max_queued: int) -> Iterator[T]:
+    """
+    Iterates over items in a background thread, up to max_queued items ahead of the consumer. This
+    lets a producer (like a crawl) and its consumer (like a later crawl over its outputs) run at the
+    same time, while the bounded queue between them keeps a slow consumer from piling up the
+    outputs of a fast producer in memory.
+
+    Errors raised by the producer are raised to the consumer once it reaches them.
+    """
+    assert max_queued >= 1, "Queue size must be at least 1"
+    buffer: "queue.Queue[Union[T, EndOfStream]]" = queue.Queue(maxsize=max_queued)
+    stopped = threading.Event()
+
+    def put(item: Union[T, EndOfStream]) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(EndOfStream(e))
+            return
+        put(EndOfStream())
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if isinstance(item, EndOfStream):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+def add_multicall_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=DEFAULT_NUM_WORKERS,
+        help=f"Number of threads to crawl with (default: {DEFAULT_NUM_WORKERS})",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        required=False,
+        default=None,
+        help="Fixed number of calls per multicall. If not set, chunk sizes adapt to the provider and are remembered across runs.",
+    )
+    parser.add_argument(
+        "--chunk-sizes-file",
+        default=DEFAULT_CHUNK_SIZES_FILE,
+        help=f"File in which adaptive chunk sizes are stored (default: {DEFAULT_CHUNK_SIZES_FILE}). Can also be set with the AUTOCORNS_CHUNK_SIZES_FILE environment variable.",
+    )
+    parser.add_argument(
+        "--retry-attempts",
+        type=int,
+        default=DEFAULT_RETRY_ATTEMPTS,
+        help=f"Number of times to attempt each failing multicall before splitting it in half (default: {DEFAULT_RETRY_ATTEMPTS})",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=int,
+        default=DEFAULT_RETRY_BUDGET,
+        help=f"Maximum number of retries and splits of failed multicalls before the crawl is aborted (default: {DEFAULT_RETRY_BUDGET})",
+    )
+    parser.add_argument(
+        "--call-cache",
+        default=None,
+        help="SQLite file in which to cache the results of calls made at a fixed block number, so that repeated crawls at that block only make the calls that are missing. (default: the file in the AUTOCORNS_CALL_CACHE_FILE environment variable if it is set, otherwise no cache)",
+    )
+    parser.add_argument(
+        "--no-call-cache",
+        action="store_true",
+        help="Do not use a call cache, even if AUTOCORNS_CALL_CACHE_FILE is set",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="How to run concurrent multicalls: on --num-workers threads (default), or as up to --concurrency coroutines over raw JSON-RPC batch requests",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of JSON-RPC requests in flight with --engine asyncio (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--transport",
+        choices=["brownie", "jsonrpc"],
+        default="brownie",
+        help="How to send multicalls: through brownie (default), or as raw JSON-RPC batch requests",
+    )
+    parser.add_argument(
+        "--rpc-endpoint",
+        action="append",
+        required=False,
+        default=None,
+        help="JSON-RPC endpoint for --transport jsonrpc (default: the endpoint of the brownie network). Pass this argument several times to spread multicalls over several endpoints.",
+    )
+    parser.add_argument(
+        "--rpc-batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Number of multicalls to send per HTTP request with --transport jsonrpc (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=DEFAULT_HEDGE_PERCENTILE,
+        help=f"With several --rpc-endpoint, requests slower than this percentile of recent latencies are also sent to a second endpoint. Set to 1 to disable hedging. (default: {DEFAULT_HEDGE_PERCENTILE})",
+    )
+    parser.add_argument(
+        "--eject-seconds",
+        type=float,
+        default=DEFAULT_EJECT_SECONDS,
+        help=f"With several --rpc-endpoint, number of seconds for which an endpoint that keeps failing is taken out of rotation (default: {DEFAULT_EJECT_SECONDS})",
+    )
+
+
+def multicall_settings_from_args(args: argparse.Namespace) -> MulticallSettings:
+    """
+    Builds crawl settings from arguments added by add_multicall_arguments. Must be called after
+    connecting to the brownie network.
+    """
+    chunk_sizer: Optional[ChunkSizer] = None
+    if args.chunk_size is None:
+        chunk_sizer = ChunkSizer(args.chunk_sizes_file)
+
+    call_cache_file = (
+        args.call_cache if args.call_cache is not None else DEFAULT_CALL_CACHE_FILE
+    )
+    call_cache: Optional[CallCache] = None
+    if call_cache_file is not None and not args.no_call_cache:
+        call_cache = CallCache(call_cache_file, network.show_active())
+        atexit.register(call_cache.close)
+
+    if args.engine == "asyncio":
+        endpoint_uris = args.rpc_endpoint
+        if not endpoint_uris:
+            endpoint_uris = [web3.provider.endpoint_uri]
+        engine = AsyncEngine(
+            endpoint_uris,
+            batch_size=args.rpc_batch_size,
+            concurrency=args.concurrency,
+        )
+        atexit.register(engine.close)
+        return MulticallSettings(
+            chunk_size=args.chunk_size,
+            chunk_sizer=chunk_sizer,
+            retry_attempts=args.retry_attempts,
+            retry_budget=args.retry_budget,
+            engine=engine,
+            call_cache=call_cache,
+        )
+
+    assert (
+        args.transport == "jsonrpc" or not args.rpc_endpoint
+    ), "--rpc-endpoint requires --transport jsonrpc or --engine asyncio"
+
+    transport: Optional[Transport] = None
+    if args.transport == "jsonrpc":
+        endpoint_uris = args.rpc_endpoint
+        if not endpoint_uris:
+            endpoint_uris = [web3.provider.endpoint_uri]
+        if len(endpoint_uris) == 1:
+            transport = JSONRPCBatchTransport(
+                endpoint_uris[0],
+                batch_size=args.rpc_batch_size,
+                pool_size=max(10, args.num_workers),
+            )
+        else:
+            transport = EndpointPool(
+                endpoint_uris,
+                batch_size=args.rpc_batch_size,
+                pool_size=max(10, args.num_workers),
+                hedge_percentile=args.hedge_percentile,
+                eject_seconds=args.eject_seconds,
+            )
+            atexit.register(transport.close)
+
+    return MulticallSettings(
+        num_workers=args.num_workers,
+        chunk_size=args.chunk_size,
+        chunk_sizer=chunk_sizer,
+        retry_attempts=args.retry_attempts,
+        retry_budget=args.retry_budget,
+        transport=transport,
+        call_cache=call_cache,
+    )
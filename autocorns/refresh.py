@@ -0,0 +1,259 @@
+"""
+Budgeted refreshes of checkpointed crawl data.
+
+Expiring checkpoint items older than a staleness threshold and leaking a random fraction of the
+rest makes both the cost of a crawl and the age of the data it leaves behind hard to predict. A
+refresh budget instead bounds the number of RPC calls (and, optionally, the wall time) a crawl
+spends on tokens that are already checkpointed, and spends it on the oldest items first.
+
+Each checkpointed token gets a priority: the age, in blocks, of its oldest item, multiplied by the
+weight of its lifecycle stage if lifecycle weights are given (eggs and babies change much more
+often than adults do). Every run refreshes the highest priority tokens that fit in the budget. With
+B tokens refreshed per run and N checkpointed tokens, no unweighted item goes more than N/B runs
+without being refreshed.
+"""
+
+import argparse
+import heapq
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+LIFECYCLE_STAGES = {"egg": 0, "baby": 1, "adult": 2}
+EXAMPLE_LIFECYCLE_WEIGHTS = "egg=4,baby=2,adult=1"
+
+
+def parse_lifecycle_weights(value: str) -> Dict[int, float]:
+    """
+    Parses weights like "egg=4,baby=2,adult=1" into a dictionary mapping lifecycle stage numbers to
+    weights. Stages can also be given by number ("0=4,1=2,2=1"). Stages without a weight have
+    weight 1.
+    """
+    weights: Dict[int, float] = {}
+    for assignment in value.split(","):
+        if not assignment.strip():
+            continue
+        stage, _, weight = assignment.partition("=")
+        stage = stage.strip().lower()
+        if stage in LIFECYCLE_STAGES:
+            stage_number = LIFECYCLE_STAGES[stage]
+        else:
+            try:
+                stage_number = int(stage)
+            except ValueError:
+                raise argparse.ArgumentTypeError(f"Unknown lifecycle stage: {stage}")
+        try:
+            weights[stage_number] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"Invalid weight for lifecycle stage {stage}: {weight}"
+            )
+        if weights[stage_number] <= 0:
+            raise argparse.ArgumentTypeError(
+                f"Weight for lifecycle stage {stage} must be positive"
+            )
+    return weights
+
+
+def lifecycle_stages(*checkpoints: List[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Maps token IDs to the lifecycle stages recorded for them in the given checkpoints (metadata
+    checkpoints record them).
+    """
+    stages: Dict[int, int] = {}
+    for checkpoint_data in checkpoints:
+        for item in checkpoint_data:
+            if item.get("lifecycle_stage") is not None:
+                stages[item["token_id"]] = int(item["lifecycle_stage"])
+    return stages
+
+
+def token_ages(
+    current_block_number: int, *checkpoints: List[Dict[str, Any]]
+) -> Dict[int, int]:
+    """
+    Maps each checkpointed token ID to the age, in blocks, of its oldest item in the given
+    checkpoints.
+    """
+    ages: Dict[int, int] = {}
+    for checkpoint_data in checkpoints:
+        for item in checkpoint_data:
+            token_id = item.get("token_id")
+            age = current_block_number - item.get("block_number", 0)
+            if age > ages.get(token_id, -1):  # type: ignore
+                ages[token_id] = age  # type: ignore
+    return ages
+
+
+class RefreshSchedule:
+    """
+    The checkpointed tokens that a crawl refreshes, in priority order.
+
+    A crawl drops the items for scheduled tokens from its checkpoints (drop), crawls new tokens
+    and then scheduled ones in priority order (iter_scheduled), and stops crawling scheduled tokens
+    once the schedule has expired. Items for scheduled tokens that were not refreshed go back into
+    the checkpoint (unrefreshed), so they keep their place at the front of the next run's schedule.
+    """
+
+    def __init__(self, token_ids: List[int], deadline: Optional[float] = None) -> None:
+        self.token_ids = token_ids
+        self.scheduled: Set[int] = set(token_ids)
+        self.deadline = deadline
+
+    def drop(self, checkpoint_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [
+            item
+            for item in checkpoint_data
+            if item.get("token_id") not in self.scheduled
+        ]
+
+    def unrefreshed(
+        self, checkpoint_data: List[Dict[str, Any]], refreshed_token_ids: Set[int]
+    ) -> List[Dict[str, Any]]:
+        """
+        Items for scheduled tokens that were not refreshed.
+        """
+        return [
+            item
+            for item in checkpoint_data
+            if item.get("token_id") in self.scheduled
+            and item.get("token_id") not in refreshed_token_ids
+        ]
+
+    def split(
+        self, jobs: Iterable[Any], job_key: Optional[str] = None
+    ) -> Tuple[List[Any], List[Any]]:
+        """
+        Splits crawl jobs (token IDs, or items with their token ID under job_key) into the jobs for
+        tokens that are not scheduled (new tokens), in their original order, and the jobs for
+        scheduled tokens, from highest to lowest priority.
+        """
+        ranks = {token_id: rank for rank, token_id in enumerate(self.token_ids)}
+
+        def token_id(job: Any) -> Any:
+            return job if job_key is None else job[job_key]
+
+        new_jobs: List[Any] = []
+        scheduled_jobs: List[Any] = []
+        for job in jobs:
+            if token_id(job) in ranks:
+                scheduled_jobs.append(job)
+            else:
+                new_jobs.append(job)
+        scheduled_jobs.sort(key=lambda job: ranks[token_id(job)])
+        return new_jobs, scheduled_jobs
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.time() >= self.deadline
+
+
+def schedule_refresh(
+    current_block_number: int,
+    checkpoints: List[List[Dict[str, Any]]],
+    max_tokens: Optional[int],
+    max_seconds: Optional[float] = None,
+    weights: Optional[Dict[int, float]] = None,
+    stages: Optional[Dict[int, int]] = None,
+) -> RefreshSchedule:
+    """
+    Schedules the max_tokens checkpointed tokens (all of them if None) with the highest refresh
+    priority, to be refreshed within max_seconds of now (no time limit if None).
+    """
+    assert max_tokens is None or max_tokens >= 0, "Refresh budget must not be negative"
+    ages = token_ages(current_block_number, *checkpoints)
+    if weights is None:
+        weights = {}
+    if stages is None:
+        stages = {}
+
+    def priority(token_id: int) -> float:
+        stage = stages.get(token_id)
+        return ages[token_id] * weights.get(stage, 1.0)  # type: ignore
+
+    if max_tokens is None:
+        max_tokens = len(ages)
+    # Ties go to lower token IDs, so that a run with the same checkpoints schedules the same tokens.
+    token_ids = heapq.nsmallest(
+        max_tokens, ages, key=lambda token_id: (-priority(token_id), token_id)
+    )
+
+    deadline = None
+    if max_seconds is not None:
+        deadline = time.time() + max_seconds
+
+    schedule = RefreshSchedule(token_ids, deadline)
+    if token_ids:
+        oldest_kept_age = max(
+            (
+                age
+                for token_id, age in ages.items()
+                if token_id not in schedule.scheduled
+            ),
+            default=0,
+        )
+        print(
+            f"Refreshing {len(token_ids)} of {len(ages)} checkpointed tokens (oldest kept item: {oldest_kept_age} blocks old)",
+            file=sys.stderr,
+        )
+    return schedule
+
+
+def iter_scheduled(
+    crawl: Callable[[List[Any]], Iterator[Any]],
+    jobs: Iterable[Any],
+    schedule: RefreshSchedule,
+    job_key: Optional[str] = None,
+) -> Iterator[Any]:
+    """
+    Yields what crawl (a streaming crawl, like biologist.iter_unicorn_dnas) yields for the jobs for
+    new tokens, and then for the jobs for scheduled tokens in priority order, until the schedule
+    expires.
+    """
+    new_jobs, scheduled_jobs = schedule.split(jobs, job_key)
+    if new_jobs:
+        yield from crawl(new_jobs)
+    if not scheduled_jobs:
+        return
+
+    chunks = crawl(scheduled_jobs)
+    try:
+        for chunk in chunks:
+            yield chunk
+            if schedule.expired():
+                print(
+                    "Refresh time budget spent, leaving the remaining scheduled tokens in the checkpoint",
+                    file=sys.stderr,
+                )
+                return
+    finally:
+        chunks.close()  # type: ignore
+
+
+def add_refresh_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--refresh-calls",
+        type=int,
+        default=None,
+        help="Budget of RPC calls to spend refreshing checkpointed tokens, oldest first (instead of expiring stale checkpoint items and leaking with --leak-rate). New tokens are crawled on top of this budget.",
+    )
+    parser.add_argument(
+        "--refresh-seconds",
+        type=float,
+        default=None,
+        help="Stop refreshing checkpointed tokens after this many seconds. Tokens that are not refreshed in time stay in the checkpoint.",
+    )
+    parser.add_argument(
+        "--lifecycle-weights",
+        type=parse_lifecycle_weights,
+        default=None,
+        help=f"Refresh tokens in some lifecycle stages sooner than their age alone calls for, e.g. {EXAMPLE_LIFECYCLE_WEIGHTS}. Lifecycle stages are read from the metadata checkpoint (see --refresh-metadata).",
+    )
+    parser.add_argument(
+        "--refresh-metadata",
+        default=None,
+        help="Metadata checkpoint to read lifecycle stages from for --lifecycle-weights (default: the lifecycle stages in the checkpoints being refreshed)",
+    )
+
+
+def refresh_budgeted(args: argparse.Namespace) -> bool:
+    return args.refresh_calls is not None or args.refresh_seconds is not None
@@ -0,0 +1,250 @@
+"""
+Spreads multicall traffic over several JSON-RPC endpoints for the same network.
+
+Each endpoint is picked at random, with a weight that favours endpoints with lower latency and fewer
+errors. Requests that take longer than a given percentile of recent latencies are hedged: the same
+request goes out to a second endpoint, and whichever answers first wins. Endpoints that fail several
+requests in a row are ejected from the pool for a while.
+"""
+
+import collections
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import random
+import sys
+import threading
+import time
+from typing import Any, Deque, List, Optional, Sequence, Tuple, Union
+
+from .jsonrpc import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_TIMEOUT,
+    JSONRPCBatchTransport,
+    JSONRPCError,
+)
+
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_EJECT_AFTER = 3
+DEFAULT_EJECT_SECONDS = 30.0
+# Hedging only starts once this many latencies have been observed across the pool.
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+TryAggregateResult = List[Union[List[Tuple[bool, bytes]], JSONRPCError]]
+
+
+class Endpoint:
+    """
+    A JSON-RPC endpoint in an EndpointPool, with the health statistics the pool keeps for it.
+    """
+
+    def __init__(self, transport: JSONRPCBatchTransport) -> None:
+        self.transport = transport
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def endpoint_uri(self) -> str:
+        return self.transport.endpoint_uri
+
+    def score(self, default_latency: float) -> float:
+        """
+        Expected cost of sending a request to this endpoint. Lower is better.
+        """
+        latency = self.latency if self.latency is not None else default_latency
+        return latency * (1 + 4 * self.error_rate)
+
+
+class EndpointPool:
+    """
+    Drop-in replacement for JSONRPCBatchTransport that sends each request to one of several
+    endpoints, with hedging and ejection as described in the module docstring.
+
+    hedge_percentile is the percentile (between 0 and 1) of recent request latencies after which a
+    request is hedged. Set it to 1 or more to disable hedging. An endpoint is ejected for
+    eject_seconds after eject_after consecutive failed requests.
+    """
+
+    def __init__(
+        self,
+        endpoint_uris: Sequence[str],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        pool_size: int = 10,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        eject_after: int = DEFAULT_EJECT_AFTER,
+        eject_seconds: float = DEFAULT_EJECT_SECONDS,
+    ) -> None:
+        assert len(endpoint_uris) > 0, "At least one endpoint is required"
+        assert eject_after >= 1, "Endpoints must be allowed at least one failure"
+        self.batch_size = batch_size
+        self.hedge_percentile = hedge_percentile
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.endpoints = [
+            Endpoint(
+                JSONRPCBatchTransport(
+                    endpoint_uri,
+                    batch_size=batch_size,
+                    timeout=timeout,
+                    pool_size=pool_size,
+                )
+            )
+            for endpoint_uri in endpoint_uris
+        ]
+        self.latencies: Deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+        # Every request from a crawl worker may have a hedged twin in flight.
+        self.executor = ThreadPoolExecutor(max_workers=2 * pool_size)
+
+    @property
+    def endpoint_uri(self) -> str:
+        return ", ".join(endpoint.endpoint_uri for endpoint in self.endpoints)
+
+    def hedge_after(self) -> Optional[float]:
+        """
+        Number of seconds after which a request should be hedged, or None if it should not be.
+        """
+        if len(self.endpoints) < 2 or self.hedge_percentile >= 1:
+            return None
+        with self.lock:
+            if len(self.latencies) < MIN_HEDGE_SAMPLES:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[int(self.hedge_percentile * (len(latencies) - 1))]
+
+    def choose(self, exclude: Optional[Endpoint] = None) -> Optional[Endpoint]:
+        """
+        Picks an endpoint at random, weighted towards healthy, fast endpoints. If every endpoint is
+        ejected, picks the one whose ejection ends first.
+        """
+        now = time.monotonic()
+        with self.lock:
+            candidates = [
+                endpoint for endpoint in self.endpoints if endpoint is not exclude
+            ]
+            if not candidates:
+                return None
+            available = [
+                endpoint for endpoint in candidates if endpoint.ejected_until <= now
+            ]
+            if not available:
+                return min(candidates, key=lambda endpoint: endpoint.ejected_until)
+
+            measured = [
+                endpoint.latency
+                for endpoint in self.endpoints
+                if endpoint.latency is not None
+            ]
+            default_latency = sum(measured) / len(measured) if measured else 1.0
+            weights = [
+                1 / max(endpoint.score(default_latency), 1e-6) for endpoint in available
+            ]
+        return random.choices(available, weights=weights)[0]
+
+    def record(self, endpoint: Endpoint, latency: float, failed: bool) -> None:
+        with self.lock:
+            endpoint.error_rate = 0.8 * endpoint.error_rate + (0.2 if failed else 0.0)
+            if failed:
+                endpoint.consecutive_failures += 1
+                if endpoint.consecutive_failures >= self.eject_after:
+                    endpoint.consecutive_failures = 0
+                    endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                    print(
+                        f"Ejecting {endpoint.endpoint_uri} for {self.eject_seconds} seconds",
+                        file=sys.stderr,
+                    )
+                return
+
+            endpoint.consecutive_failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency = 0.8 * endpoint.latency + 0.2 * latency
+            self.latencies.append(latency)
+
+    def call_endpoint(
+        self,
+        endpoint: Endpoint,
+        multicall_address: str,
+        batches: Sequence[Sequence[Tuple[str, Union[str, bytes]]]],
+        block_number: Any,
+    ) -> TryAggregateResult:
+        started_at = time.monotonic()
+        try:
+            results = endpoint.transport.try_aggregate(
+                multicall_address, batches, block_number
+            )
+        except JSONRPCError:
+            self.record(endpoint, time.monotonic() - started_at, True)
+            raise
+        # An endpoint that answers with nothing but errors (e.g. rate limit errors) is unhealthy.
+        failed = len(results) > 0 and all(
+            isinstance(result, JSONRPCError) for result in results
+        )
+        self.record(endpoint, time.monotonic() - started_at, failed)
+        return results
+
+    def try_aggregate(
+        self,
+        multicall_address: str,
+        batches: Sequence[Sequence[Tuple[str, Union[str, bytes]]]],
+        block_number: Any = "latest",
+    ) -> TryAggregateResult:
+        """
+        Same as JSONRPCBatchTransport.try_aggregate, on an endpoint from the pool.
+
+        If the request fails on its first endpoint, or takes long enough to be hedged, it is sent
+        to a second endpoint, and the first successful response is returned. Raises JSONRPCError if
+        every endpoint the request went to failed.
+        """
+        primary = self.choose()
+        assert primary is not None
+        secondary: Optional[Endpoint] = None
+
+        def submit(endpoint: Endpoint) -> "Future[TryAggregateResult]":
+            return self.executor.submit(
+                self.call_endpoint, endpoint, multicall_address, batches, block_number
+            )
+
+        pending = {submit(primary)}
+        done, _ = wait(pending, timeout=self.hedge_after())
+        if not done:
+            secondary = self.choose(exclude=primary)
+            if secondary is not None:
+                pending.add(submit(secondary))
+
+        error: Optional[BaseException] = None
+        fallback: Optional[TryAggregateResult] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    continue
+                results = future.result()
+                if all(isinstance(result, JSONRPCError) for result in results):
+                    # Give the request a chance to do better on another endpoint.
+                    fallback = results
+                    continue
+                return results
+
+            if not pending and secondary is None:
+                secondary = self.choose(exclude=primary)
+                if secondary is not None:
+                    pending.add(submit(secondary))
+
+        if fallback is not None:
+            return fallback
+        assert error is not None
+        raise error
+
+    def close(self) -> None:
+        """
+        Shuts down the threads that send requests, and the endpoints' sessions. Hedged requests
+        that lost their race are not waited for.
+        """
+        self.executor.shutdown(wait=False)
+        for endpoint in self.endpoints:
+            endpoint.transport.session.close()
@@ -1,17 +1,22 @@
 import argparse
 import base64
 import enum
-import json
 import sys
-import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from brownie import network
 from tqdm import tqdm
 
-from .biologist import load_checkpoint_data, make_multicall
+from .checkpoints import Checkpoint, index_checkpoint, open_checkpoint
 from .ERC721 import ERC721, add_default_arguments
 from .ERC721WithDiamondStorage import ERC721WithDiamondStorage
+from .jsonl import loads, print_json, write_jsonl
+from .multicall import (
+    add_multicall_arguments,
+    crawl_multicall,
+    multicall_settings_from_args,
+    MulticallSettings,
+)
 from . import Multicall2
 
 METADATA_PREFIX = "data:application/json;base64,"
@@ -35,7 +40,7 @@ def parse_shadowcorn_metadata(encoded_metadata: str) -> Dict[str, Any]:
         METADATA_PREFIX
     ), f"Unexpected metadata:\n{encoded_metadata}"
     decoded_metadata = base64.b64decode(encoded_metadata[len(METADATA_PREFIX) :])
-    metadata = json.loads(decoded_metadata)
+    metadata = loads(decoded_metadata)
     return metadata
 
 
@@ -60,37 +65,41 @@ def handle_metadata(args: argparse.Namespace) -> None:
     shadowcorns = ERC721(args.address)
     token_uri: str = shadowcorns.token_uri(args.token_id)
     metadata = parse_shadowcorn_metadata(token_uri)
-    print(json.dumps(metadata))
+    print_json(metadata)
 
 
 def handle_crawl(args: argparse.Namespace) -> None:
-    checkpoint_data = []
+    checkpoint: Optional[Checkpoint] = None
+    checkpoint_data: List[Dict[str, Any]] = []
     if args.checkpoint:
-        checkpoint_data = load_checkpoint_data(args.checkpoint)
+        checkpoint = open_checkpoint(args.checkpoint)
+        checkpoint_data = index_checkpoint(checkpoint, ["token_id"])
 
     network.connect(args.network)
     shadowcorns = ERC721WithDiamondStorage(args.address)
-    results, errors = crawl(shadowcorns, checkpoint_data)
-    if args.checkpoint:
-        with open(args.checkpoint, "w") as ofp:
-            for result in results + checkpoint_data:
-                print(json.dumps(result), file=ofp)
+    results, errors = crawl(
+        shadowcorns, checkpoint_data, multicall_settings_from_args(args)
+    )
+    if checkpoint is not None:
+        checkpoint.save(results, [item["token_id"] for item in checkpoint_data])
+        checkpoint.close()
     else:
-        for result in results:
-            print(json.dumps(result))
+        write_jsonl(results, sys.stdout)
 
     if errors:
         print("Errors:", file=sys.stderr)
         for error in errors:
-            print(json.dumps(error), file=sys.stderr)
+            print_json(error, file=sys.stderr)
 
 
 def crawl(
-    shadowcorns: ERC721WithDiamondStorage, checkpoint_data: List[Dict[str, Any]]
+    shadowcorns: ERC721WithDiamondStorage,
+    checkpoint_data: List[Dict[str, Any]],
+    settings: Optional[MulticallSettings] = None,
 ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     current_supply = shadowcorns.total_supply()
 
-    existing_token_ids = [item["token_id"] for item in checkpoint_data]
+    existing_token_ids = {item["token_id"] for item in checkpoint_data}
 
     token_ids_to_crawl = [
         i for i in range(1, current_supply + 1) if i not in existing_token_ids
@@ -100,8 +109,6 @@ def crawl(
 
     errors: List[Dict[str, Any]] = []
 
-    token_uris = []
-
     progress_bar = tqdm(
         total=len(token_ids_to_crawl),
         desc="Retrieving new Shadowcorn metadata",
@@ -111,26 +118,20 @@ def crawl(
 
     multicall_method = multicaller.contract.tryAggregate
 
-    for tokens_ids_chunk in [
-        token_ids_to_crawl[i : i + CALL_CHUNK_SIZE]
-        for i in range(0, len(token_ids_to_crawl), CALL_CHUNK_SIZE)
-    ]:
-        while True:
-            try:
-                make_multicall_result = make_multicall(
-                    multicall_method,
-                    shadowcorns.contract.tokenURI,
-                    shadowcorns.address,
-                    tokens_ids_chunk,
-                )
-                token_uris.extend(make_multicall_result)
-                progress_bar.update(len(tokens_ids_chunk))
-                break
-            except ValueError:
-                time.sleep(1)
-                continue
-
-    for token_id, uri in zip(token_ids_to_crawl, token_uris):
+    token_uris, failures = crawl_multicall(
+        multicall_method,
+        shadowcorns.contract.tokenURI,
+        shadowcorns.address,
+        token_ids_to_crawl,
+        CALL_CHUNK_SIZE,
+        settings=settings,
+        progress_bar=progress_bar,
+    )
+
+    for index, (token_id, uri) in enumerate(zip(token_ids_to_crawl, token_uris)):
+        if index in failures:
+            errors.append({"token_id": token_id, "uri": None, "error": failures[index]})
+            continue
         try:
             result = {
                 "token_id": token_id,
@@ -160,8 +161,11 @@ def generate_cli() -> argparse.ArgumentParser:
 
     crawl_parser = subparsers.add_parser("crawl")
     add_default_arguments(crawl_parser, False)
+    add_multicall_arguments(crawl_parser)
     crawl_parser.add_argument(
-        "--checkpoint", default=None, help="Checkpoint file (optional)"
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (optional). Files ending in .sqlite, .sqlite3 or .db are SQLite checkpoints, anything else is JSON lines.",
     )
     crawl_parser.set_defaults(func=handle_crawl)
 
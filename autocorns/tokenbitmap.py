@@ -0,0 +1,206 @@
+"""
+Token existence bitmaps.
+
+Crawls over a range of token IDs spend calls on IDs that were never minted or have been burned,
+and those calls fail or return nothing. A token bitmap records which token IDs of a contract exist,
+one bit per ID, as of a block number. It is built from the contract's Transfer logs (a transfer
+from the zero address mints a token, a transfer to the zero address burns it) and brought up to
+date by reading only the logs after that block.
+
+Layout (all integers little endian):
+
+- A HEADER_SIZE byte header: MAGIC, the format version, the block number of the bitmap, the number
+  of token IDs it covers, the highest token ID ever minted (or -1) and the contract address,
+  followed by padding.
+- The bits, eight token IDs per byte, least significant bit first: bit i is set if token ID i
+  exists.
+"""
+
+import argparse
+import os
+import struct
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+from tqdm import tqdm
+from web3 import Web3
+
+from .logscan import DEFAULT_LOG_RANGE, event_topic, hex_value, iter_logs
+
+MAGIC = b"ACBITMAP"
+VERSION = 1
+HEADER = struct.Struct("<8sIqQq20s")
+HEADER_SIZE = 64
+
+TRANSFER_TOPIC = event_topic("Transfer(address,address,uint256)")
+ZERO_TOPIC = "0" * 64
+
+
+class TokenBitmap:
+    """
+    The IDs of the tokens of a contract that exist as of block_number.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        block_number: int = -1,
+        bits: Optional[np.ndarray] = None,
+        max_token_id: int = -1,
+    ) -> None:
+        self.address = Web3.to_checksum_address(address)
+        self.block_number = block_number
+        self.bits = bits if bits is not None else np.zeros(0, dtype=bool)
+        self.max_token_id = max_token_id
+
+    def __contains__(self, token_id: Any) -> bool:
+        return 0 <= token_id < len(self.bits) and bool(self.bits[token_id])
+
+    def total_supply(self) -> int:
+        return int(np.count_nonzero(self.bits))
+
+    def token_ids(self) -> List[int]:
+        return np.flatnonzero(self.bits).tolist()
+
+    def existing(self, token_ids: Iterable[int]) -> List[int]:
+        """
+        The token IDs from token_ids that exist, in their original order.
+        """
+        return [token_id for token_id in token_ids if token_id in self]
+
+    def set(self, token_id: int, exists: bool) -> None:
+        if token_id >= len(self.bits):
+            bits = np.zeros(max(token_id + 1, 2 * len(self.bits)), dtype=bool)
+            bits[: len(self.bits)] = self.bits
+            self.bits = bits
+        self.bits[token_id] = exists
+        if exists and token_id > self.max_token_id:
+            self.max_token_id = token_id
+
+    def apply_transfer_logs(self, logs: List[Dict[str, Any]]) -> None:
+        """
+        Applies the mints and burns among Transfer logs of the contract, in block order.
+        """
+        for log in sorted(
+            logs, key=lambda log: (int(log["blockNumber"]), int(log["logIndex"]))
+        ):
+            topics = [hex_value(topic) for topic in log["topics"]]
+            # ERC20 Transfer events have the same signature, but not an indexed third argument.
+            if len(topics) != 4 or topics[0] != TRANSFER_TOPIC:
+                continue
+            token_id = int(topics[3], 16)
+            if topics[1] == ZERO_TOPIC:
+                self.set(token_id, True)
+            if topics[2] == ZERO_TOPIC:
+                self.set(token_id, False)
+
+    def update(
+        self,
+        get_logs: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+        to_block: int,
+        initial_range: int = DEFAULT_LOG_RANGE,
+    ) -> None:
+        """
+        Applies the Transfer logs of the contract from the block after the bitmap's block number
+        to to_block (inclusive). get_logs takes an eth_getLogs filter and returns its logs (e.g.
+        web3.eth.get_logs).
+        """
+        from_block = self.block_number + 1
+        if from_block > to_block:
+            return
+        progress_bar = tqdm(
+            total=to_block - from_block + 1, desc="Reading token transfers"
+        )
+        for logs in iter_logs(
+            get_logs,
+            self.address,
+            ["0x" + TRANSFER_TOPIC],
+            from_block,
+            to_block,
+            initial_range=initial_range,
+            progress_bar=progress_bar,
+        ):
+            self.apply_transfer_logs(logs)
+        progress_bar.close()
+        self.block_number = to_block
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "block_number": self.block_number,
+            "total_supply": self.total_supply(),
+            "max_token_id": self.max_token_id,
+        }
+
+
+def load_token_bitmap(path: str, address: str) -> TokenBitmap:
+    """
+    Loads the token bitmap at path, or returns an empty one for address if there is no file
+    there. Raises a ValueError if the file is not a token bitmap or is for another contract.
+    """
+    if not os.path.exists(path):
+        return TokenBitmap(address)
+
+    with open(path, "rb") as ifp:
+        data = ifp.read()
+    if len(data) < HEADER_SIZE or data[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not a token bitmap: {path}")
+    _, version, block_number, num_bits, max_token_id, raw_address = HEADER.unpack(
+        data[: HEADER.size]
+    )
+    if version != VERSION:
+        raise ValueError(f"Unsupported token bitmap version {version}: {path}")
+    bitmap_address = Web3.to_checksum_address(raw_address)
+    if bitmap_address != Web3.to_checksum_address(address):
+        raise ValueError(f"Token bitmap {path} is for {bitmap_address}, not {address}")
+
+    packed_bits = np.frombuffer(data, dtype=np.uint8, offset=HEADER_SIZE)
+    bits = np.unpackbits(packed_bits, count=num_bits, bitorder="little").astype(bool)
+    return TokenBitmap(bitmap_address, block_number, bits, max_token_id)
+
+
+def save_token_bitmap(path: str, bitmap: TokenBitmap) -> None:
+    """
+    Writes the bitmap next to path and then moves it into place.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as ofp:
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            bitmap.block_number,
+            len(bitmap.bits),
+            bitmap.max_token_id,
+            bytes.fromhex(hex_value(bitmap.address)),
+        )
+        ofp.write(header.ljust(HEADER_SIZE, b"\x00"))
+        ofp.write(np.packbits(bitmap.bits, bitorder="little").tobytes())
+        ofp.flush()
+        os.fsync(ofp.fileno())
+    os.replace(temporary_path, path)
+
+
+def updated_token_bitmap(
+    path: str,
+    address: str,
+    get_logs: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+    to_block: int,
+    initial_range: int = DEFAULT_LOG_RANGE,
+) -> TokenBitmap:
+    """
+    Loads the token bitmap at path (starting a new one if there is none), brings it up to
+    to_block and saves it.
+    """
+    bitmap = load_token_bitmap(path, address)
+    if bitmap.block_number < to_block:
+        bitmap.update(get_logs, to_block, initial_range)
+        save_token_bitmap(path, bitmap)
+    return bitmap
+
+
+def add_token_bitmap_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--token-bitmap",
+        default=None,
+        help="Token bitmap file (optional). Only token IDs that exist according to the bitmap are crawled. The bitmap is brought up to date from the contract's Transfer logs first, and created if the file does not exist.",
+    )
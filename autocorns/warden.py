@@ -3,7 +3,6 @@ The warden leads unicorns safely through the Dark Forest.
 """
 
 import argparse
-import json
 import os
 import time
 from typing import List, Tuple
@@ -11,6 +10,7 @@ from typing import List, Tuple
 from brownie import network
 
 from . import DarkForest, ERC721
+from .jsonl import print_json
 
 CU_MAINNET_ADDRESS = "0xdC0479CC5BbA033B3e7De9F178607150B3AbCe1f"
 DARK_FOREST_MAINNET_ADDRESS = "0x8d528e98A69FE27b11bb02Ac264516c4818C3942"
@@ -83,7 +83,7 @@ def escort(corns: List[int], transaction_config) -> List[int]:
 def handle_escort(args: argparse.Namespace) -> None:
     transaction_config = DarkForest.get_transaction_config(args)
     staked_corns = escort(args.corns, transaction_config)
-    print(json.dumps(staked_corns))
+    print_json(staked_corns)
 
 
 def generate_cli() -> argparse.ArgumentParser:
@@ -28,51 +28,22 @@ TOTAL_SUPPLY=$(autocorns biologist total-supply --network $BROWNIE_NETWORK --add
 
 echo "Total supply: $TOTAL_SUPPLY"
 
-time autocorns biologist dnas \
+time autocorns biologist snapshot \
     --network $BROWNIE_NETWORK \
     --address $CU_ADDRESS \
     --start 1 \
     --end $TOTAL_SUPPLY \
-    --checkpoint "$DATA_DIR/dnas.json" \
+    --data-dir "$DATA_DIR" \
+    --checkpoint \
     --leak-rate 0.05
 
-time autocorns biologist metadata \
-    --network $BROWNIE_NETWORK \
-    --address $CU_ADDRESS \
-    --start 1 \
-    --end $TOTAL_SUPPLY \
-    --checkpoint "$DATA_DIR/metadata.json" \
-    --leak-rate 0.05
-
-time autocorns biologist mythic-body-parts \
-    --network $BROWNIE_NETWORK \
-    --address $CU_ADDRESS \
-    --dnas "$DATA_DIR/dnas.json" \
-    --checkpoint "$DATA_DIR/mythic-body-parts.json" \
-    --leak-rate 0.05
-
-time autocorns biologist stats \
-    --network $BROWNIE_NETWORK \
-    --address $CU_ADDRESS \
-    --dnas "$DATA_DIR/dnas.json" \
-    --checkpoint "$DATA_DIR/stats.json" \
-    --leak-rate 0.05
-
-time autocorns biologist moonstream-events \
-    -n breeding_hatching_leaderboard_events \
-    --start 1666828800 \
-    --end 1672531200 \
-    --interval 15 \
-    --max-retries 20 \
-    -o "$DATA_DIR/breeding_hatching_leaderboard_events.json"
-
-time autocorns biologist moonstream-events \
-    -n evolution_leaderboard_events \
+time autocorns biologist moonstream-queries \
+    -q breeding_hatching_leaderboard_events "$DATA_DIR/breeding_hatching_leaderboard_events.json" \
+    -q evolution_leaderboard_events "$DATA_DIR/evolution_leaderboard_events.json" \
     --start 1666828800 \
     --end 1672531200 \
     --interval 15 \
-    --max-retries 20 \
-    -o "$DATA_DIR/evolution_leaderboard_events.json"
+    --max-retries 20
 
 time autocorns biologist fall-event-2022  \
     --mythic-body-parts "$DATA_DIR/mythic-body-parts.json" \
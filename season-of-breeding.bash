@@ -67,21 +67,13 @@ time autocorns biologist merge \
     --mythic-body-parts $DATA_DIR/mythic-body-parts.json \
     >$DATA_DIR/merged.json
 
-time autocorns biologist moonstream-events \
+time autocorns biologist moonstream-queries \
     --start 1651363200 \
     $END_TIMESTAMP_ARG \
-    -n breeding_hatching_leaderboard_events \
+    -q breeding_hatching_leaderboard_events $DATA_DIR/moonstream.json \
+    -q evolution_leaderboard_events $DATA_DIR/evolution.json \
     --interval 5.0 \
-    --max-retries 6 \
-    -o $DATA_DIR/moonstream.json
-
-time autocorns biologist moonstream-events \
-    --start 1651363200 \
-    $END_TIMESTAMP_ARG \
-    -n evolution_leaderboard_events \
-    --interval 5.0 \
-    --max-retries 6 \
-    -o $DATA_DIR/evolution.json
+    --max-retries 6
 
 time autocorns biologist sob \
     --merged $DATA_DIR/merged.json \
@@ -10,13 +10,15 @@ setup(
     packages=find_packages(),
     package_data={"autocorns": ["build/contracts/*.json", "autocorns/*.sql"]},
     include_package_data=True,
-    install_requires=["eth-brownie", "requests", "tqdm", "web3"],
+    install_requires=["aiohttp", "eth-brownie", "numpy", "requests", "tqdm", "web3"],
     extras_require={
         "dev": [
             "black",
             "moonworm >= 0.1.14",
+            "pytest",
         ],
         "distribute": ["setuptools", "twine", "wheel"],
+        "fast": ["orjson"],
     },
     description="A team of Crypto Unicorn bots",
     long_description=long_description,
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+from autocorns.aiocrawl import async_group_caller
+from autocorns.callcache import CallCache
+from autocorns.multicall import RetryPolicy
+
+ADDRESS = "0x" + "ab" * 20
+
+
+class FakeEngine:
+    """
+    Stands in for an AsyncEngine. Answers every call in a batch with its calldata, as bytes.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+
+    async def try_aggregate(self, multicall_address, batches, block_number="latest"):
+        self.sent.append(batches)
+        await asyncio.sleep(self.delay)
+        return [
+            [(True, bytes.fromhex(calldata[2:])) for _, calldata in calls]
+            for calls in batches
+        ]
+
+
+def encode(inputs_chunk):
+    return [(ADDRESS, "0x{:08x}".format(value)) for value in inputs_chunk]
+
+
+def decode(results):
+    return [return_data for _, return_data in results]
+
+
+class RecordingChunkSizer:
+    """
+    Stands in for a ChunkSizer. Records the latency each successful chunk is credited with.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+
+    def success(self, key, size, latency):
+        self.latencies[size] = latency
+
+    def failure(self, key, size):
+        pass
+
+
+def test_chunks_of_a_batch_share_its_latency():
+    chunk_sizer = RecordingChunkSizer()
+    call_group = async_group_caller(
+        FakeEngine(delay=0.2),
+        ADDRESS,
+        encode,
+        decode,
+        "latest",
+        RetryPolicy(),
+        chunk_sizer,
+        "test",
+        CallCache(),
+    )
+    loop = asyncio.new_event_loop()
+    try:
+        results, failures = loop.run_until_complete(
+            call_group([(0, [1, 2, 3, 4]), (4, [5, 6])])
+        )
+    finally:
+        loop.close()
+
+    assert len(results) == 6
+    assert failures == {}
+    assert chunk_sizer.latencies[4] == 2 * chunk_sizer.latencies[2]
+    assert chunk_sizer.latencies[4] + chunk_sizer.latencies[2] >= 0.2
+
+
+def test_call_cache_runs_off_the_event_loop(tmp_path):
+    call_cache = CallCache(str(tmp_path / "calls.sqlite"), "test")
+    lookup = call_cache.lookup
+    lookup_threads = []
+
+    def recording_lookup(calls, block_number):
+        lookup_threads.append(threading.current_thread())
+        return lookup(calls, block_number)
+
+    call_cache.lookup = recording_lookup
+    engine = FakeEngine()
+    call_group = async_group_caller(
+        engine, ADDRESS, encode, decode, 100, RetryPolicy(), None, "test", call_cache
+    )
+
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.current_thread()
+    try:
+        first = loop.run_until_complete(call_group([(0, [1, 2]), (2, [3])]))
+        second = loop.run_until_complete(call_group([(0, [1, 2]), (2, [3])]))
+    finally:
+        loop.close()
+        call_cache.close()
+
+    assert first == second
+    assert len(engine.sent) == 1
+    assert call_cache.hits == 3
+    assert lookup_threads and all(
+        thread is not loop_thread for thread in lookup_threads
+    )
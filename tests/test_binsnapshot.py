@@ -0,0 +1,112 @@
+import pytest
+
+from autocorns.binsnapshot import (
+    BinarySnapshot,
+    BinarySnapshotIndex,
+    is_binary_snapshot,
+    STATS_ORDER,
+    write_binary_snapshot,
+)
+
+
+def stats_item(token_id, block_number, dna, base):
+    item = {"token_id": token_id, "block_number": block_number, "dna": str(dna)}
+    item.update({name: base + i for i, name in enumerate(STATS_ORDER)})
+    item["sum_stats"] = sum(base + i for i in range(len(STATS_ORDER)))
+    return item
+
+
+def snapshot_parts():
+    dna = (1 << 200) + 12345
+    return {
+        "dnas": [
+            {"token_id": 10, "block_number": 100, "dna": str(dna)},
+            {"token_id": 12, "block_number": 150, "dna": "None"},
+        ],
+        "metadata": [
+            {
+                "token_id": 10,
+                "block_number": 90,
+                "lifecycle_stage": 2,
+                "class_number": 4,
+            },
+            {
+                "token_id": 12,
+                "block_number": 150,
+                "lifecycle_stage": 0,
+                "class_number": 1,
+            },
+        ],
+        "mythic_body_parts": [
+            {
+                "token_id": 10,
+                "block_number": 101,
+                "dna": str(dna),
+                "num_mythic_body_parts": 3,
+            }
+        ],
+        "stats": [stats_item(10, 102, dna, 1000)],
+    }
+
+
+def write(path, parts):
+    return write_binary_snapshot(
+        str(path),
+        parts["dnas"],
+        parts["metadata"],
+        parts["mythic_body_parts"],
+        parts["stats"],
+    )
+
+
+def test_round_trip_keeps_block_number_of_each_item(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    parts = snapshot_parts()
+    assert write(path, parts) == 3
+    assert is_binary_snapshot(str(path))
+
+    snapshot = BinarySnapshot(str(path))
+    assert snapshot.block_number == 150
+    assert snapshot.items("dnas") == parts["dnas"][:1]
+    assert snapshot.items("metadata") == parts["metadata"]
+    assert snapshot.items("mythic_body_parts") == parts["mythic_body_parts"]
+    assert snapshot.items("stats") == parts["stats"]
+    assert snapshot.item("metadata", 10) == parts["metadata"][0]
+    assert snapshot.item("stats", 10) == parts["stats"][0]
+    assert snapshot.item("dnas", 11) is None
+    assert snapshot.item("dnas", 12) is None
+
+    index = BinarySnapshotIndex(snapshot, "metadata", str)
+    assert list(index) == ["10", "12"]
+    assert index["12"] == parts["metadata"][1]
+    assert "11" not in index
+    snapshot.close()
+
+
+def test_values_out_of_range_are_rejected(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    parts = snapshot_parts()
+    parts["stats"][0]["magic"] = 1 << 16
+    with pytest.raises(AssertionError):
+        write(path, parts)
+
+    parts = snapshot_parts()
+    parts["stats"][0]["attack"] = -1
+    with pytest.raises(AssertionError):
+        write(path, parts)
+
+    parts = snapshot_parts()
+    parts["metadata"][0]["class_number"] = 256
+    with pytest.raises(AssertionError):
+        write(path, parts)
+    assert not path.exists()
+
+
+def test_largest_stat_fits(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    parts = snapshot_parts()
+    parts["stats"][0]["magic"] = (1 << 16) - 1
+    write(path, parts)
+    snapshot = BinarySnapshot(str(path))
+    assert snapshot.item("stats", 10)["magic"] == (1 << 16) - 1
+    snapshot.close()
@@ -0,0 +1,192 @@
+import os
+import threading
+
+import pytest
+
+from autocorns.checkpoints import (
+    CheckpointStore,
+    JSONLCheckpoint,
+    index_checkpoint,
+    iter_journal,
+    open_checkpoint,
+)
+from autocorns.jsonl import read_jsonl
+
+
+def item(token_id, block_number, value=None):
+    return {"token_id": token_id, "block_number": block_number, "value": value}
+
+
+@pytest.fixture(params=["checkpoint.json", "checkpoint.sqlite"])
+def checkpoint_path(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_open_checkpoint_picks_format(tmp_path):
+    assert isinstance(open_checkpoint(str(tmp_path / "a.json")), JSONLCheckpoint)
+    store = open_checkpoint(str(tmp_path / "a.db"))
+    assert isinstance(store, CheckpointStore)
+    store.close()
+
+
+def test_commit_keeps_results_and_kept_items(checkpoint_path):
+    checkpoint = open_checkpoint(checkpoint_path)
+    checkpoint.append([item(1, 10), item(2, 10), item(3, 10)])
+    checkpoint.commit([])
+    checkpoint.close()
+
+    # Token 1 is kept, token 2 is recrawled and token 3 expired without being recrawled.
+    checkpoint = open_checkpoint(checkpoint_path)
+    loaded = checkpoint.load()
+    assert sorted(loaded, key=lambda x: x["token_id"]) == [
+        item(1, 10),
+        item(2, 10),
+        item(3, 10),
+    ]
+    checkpoint.append([item(2, 20, "new")])
+    checkpoint.commit([1])
+    checkpoint.close()
+
+    checkpoint = open_checkpoint(checkpoint_path)
+    assert sorted(checkpoint.load(), key=lambda x: x["token_id"]) == [
+        item(1, 10),
+        item(2, 20, "new"),
+    ]
+    checkpoint.close()
+
+
+def test_save_matches_commit(checkpoint_path):
+    checkpoint = open_checkpoint(checkpoint_path)
+    checkpoint.save([item(1, 10), item(2, 10)], [])
+    checkpoint.close()
+
+    checkpoint = open_checkpoint(checkpoint_path)
+    checkpoint.save([item(3, 20)], [2])
+    assert sorted(checkpoint.load(), key=lambda x: x["token_id"]) == [
+        item(2, 10),
+        item(3, 20),
+    ]
+    checkpoint.close()
+
+
+def test_interrupted_crawl_resumes_from_appended_results(checkpoint_path):
+    checkpoint = open_checkpoint(checkpoint_path)
+    checkpoint.append([item(1, 10)])
+    checkpoint.commit([])
+    checkpoint.close()
+
+    checkpoint = open_checkpoint(checkpoint_path)
+    checkpoint.append([item(2, 20), item(1, 20, "new")])
+    # The crawl dies here, without committing.
+    checkpoint.close()
+
+    checkpoint = open_checkpoint(checkpoint_path)
+    assert sorted(checkpoint.load(), key=lambda x: x["token_id"]) == [
+        item(1, 20, "new"),
+        item(2, 20),
+    ]
+    checkpoint.close()
+
+
+def test_recover_folds_journal_into_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = JSONLCheckpoint(path)
+    checkpoint.save([item(1, 10), item(2, 10)], [])
+    checkpoint.append([item(2, 20, "new"), item(3, 20)])
+    checkpoint.close()
+    # A crash in the middle of a write leaves a partial last line in the journal.
+    with open(checkpoint.journal_path, "a") as ofp:
+        ofp.write('{"token_id": 4, "block')
+
+    assert [entry["token_id"] for entry in iter_journal(checkpoint.journal_path)] == [
+        2,
+        3,
+    ]
+    checkpoint.recover()
+    assert not os.path.exists(checkpoint.journal_path)
+    assert sorted(read_jsonl(path), key=lambda x: x["token_id"]) == [
+        item(1, 10),
+        item(2, 20, "new"),
+        item(3, 20),
+    ]
+
+
+def test_recover_without_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = JSONLCheckpoint(path)
+    checkpoint.append([item(1, 10)])
+    checkpoint.close()
+    assert checkpoint.load() == [item(1, 10)]
+    assert not os.path.exists(checkpoint.journal_path)
+
+
+def test_store_keeps_latest_item_per_token(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoint.sqlite"))
+    store.upsert([item(1, 10, "old"), item(1, 20, "new"), item(2, 5), item(3, 7)])
+    assert len(store) == 3
+    assert 2 in store
+    assert 4 not in store
+    assert store.get(1) == item(1, 20, "new")
+    assert store.get(4) is None
+    assert [entry["token_id"] for entry in store.scan(2, 3)] == [2, 3]
+    assert store.compact() == 1
+    assert store.get(1) == item(1, 20, "new")
+    store.close()
+
+
+def test_store_scan_reads_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr("autocorns.checkpoints.SCAN_BATCH_SIZE", 3)
+    store = CheckpointStore(str(tmp_path / "checkpoint.sqlite"))
+    store.upsert([item(token_id, 1) for token_id in range(10)])
+    assert [entry["token_id"] for entry in store.scan()] == list(range(10))
+    store.close()
+
+
+def test_store_reads_while_appending_from_another_thread(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoint.sqlite"))
+    store.upsert([item(token_id, 1) for token_id in range(100)])
+
+    def append():
+        for token_id in range(100, 200):
+            store.append([item(token_id, 2)])
+
+    thread = threading.Thread(target=append)
+    thread.start()
+    for _ in range(50):
+        assert len(list(store.scan(0, 99))) == 100
+        assert 0 in store
+    thread.join()
+    assert len(store) == 200
+    store.close()
+
+
+def test_scan_and_index_stream_the_checkpoint(checkpoint_path):
+    checkpoint = open_checkpoint(checkpoint_path)
+    checkpoint.append([item(token_id, 10, "value") for token_id in range(5)])
+    checkpoint.commit([])
+    checkpoint.append([dict(item(3, 20), lifecycle_stage=2)])
+    checkpoint.close()
+
+    # Scanning recovers the journal of the crawl that did not commit.
+    checkpoint = open_checkpoint(checkpoint_path)
+    assert sorted(entry["token_id"] for entry in checkpoint.scan(1, 3)) == [1, 2, 3]
+    assert sorted(
+        index_checkpoint(checkpoint), key=lambda entry: entry["token_id"]
+    ) == [
+        {"token_id": 0, "block_number": 10},
+        {"token_id": 1, "block_number": 10},
+        {"token_id": 2, "block_number": 10},
+        {"token_id": 3, "block_number": 20, "lifecycle_stage": 2},
+        {"token_id": 4, "block_number": 10},
+    ]
+    checkpoint.append([item(4, 30, "new")])
+    checkpoint.commit(token_id for token_id in [0, 3, 9])
+    checkpoint.close()
+
+    checkpoint = open_checkpoint(checkpoint_path)
+    assert sorted(checkpoint.load(), key=lambda entry: entry["token_id"]) == [
+        item(0, 10, "value"),
+        dict(item(3, 20), lifecycle_stage=2),
+        item(4, 30, "new"),
+    ]
+    checkpoint.close()
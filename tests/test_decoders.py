@@ -0,0 +1,128 @@
+import eth_abi
+import numpy as np
+import pytest
+
+from autocorns.decoders import (
+    FixedLayoutDecoder,
+    FixedLayoutEncoder,
+    has_fixed_layout,
+    word_decoder,
+    word_encoder,
+)
+from autocorns.multicall import encode_calls
+
+
+class FakeMethod:
+    """
+    Stands in for a brownie ContractCall: a signature, an ABI and eth-abi encoding of inputs.
+    """
+
+    def __init__(self, signature, input_types):
+        self.signature = signature
+        self.abi = {"inputs": [{"type": input_type} for input_type in input_types]}
+        self.input_types = input_types
+        self.slow_calls = 0
+
+    def encode_input(self, *args):
+        self.slow_calls += 1
+        return (
+            "0x"
+            + (
+                bytes.fromhex(self.signature[2:])
+                + eth_abi.encode(self.input_types, args)
+            ).hex()
+        )
+
+
+@pytest.mark.parametrize(
+    "abi_type,value",
+    [
+        ("uint256", 0),
+        ("uint256", 2**256 - 1),
+        ("uint8", 255),
+        ("int256", -(2**255)),
+        ("int256", 2**255 - 1),
+        ("int8", -128),
+        ("int8", 127),
+        ("int", -1),
+        ("uint", 12345),
+    ],
+)
+def test_word_encoder_matches_eth_abi(abi_type, value):
+    word = word_encoder(abi_type)(value)
+    assert word == eth_abi.encode([abi_type], [value])
+    assert word_decoder(abi_type)(word) == value
+
+
+def test_word_encoder_takes_decimal_strings_and_numpy_integers():
+    encode = word_encoder("uint256")
+    assert encode("42") == eth_abi.encode(["uint256"], [42])
+    assert encode(np.uint64(42)) == eth_abi.encode(["uint256"], [42])
+
+
+@pytest.mark.parametrize(
+    "abi_type,value",
+    [
+        ("uint256", -1),
+        ("uint256", 2**256),
+        ("uint8", 256),
+        ("int8", 128),
+        ("int8", -129),
+        ("int256", 2**255),
+        ("uint256", 1.9),
+        ("uint256", True),
+        ("uint256", "1 ether"),
+        ("uint256", None),
+    ],
+)
+def test_word_encoder_rejects_values_outside_the_type(abi_type, value):
+    with pytest.raises(ValueError):
+        word_encoder(abi_type)(value)
+
+
+def test_bool_round_trip():
+    assert word_encoder("bool")(True) == eth_abi.encode(["bool"], [True])
+    assert word_decoder("bool")(word_encoder("bool")(False)) is False
+
+
+def test_fixed_layout():
+    assert has_fixed_layout(["uint256", "bool", "int8"])
+    assert not has_fixed_layout(["string"])
+    assert not has_fixed_layout([])
+
+
+def test_fixed_layout_decoder():
+    decoder = FixedLayoutDecoder(["uint256", "bool"])
+    data = eth_abi.encode(["uint256", "bool"], [7, True])
+    assert decoder.decode(data) == (7, True)
+    assert decoder.decode_many([(True, data), (False, data), (True, data[:32])]) == [
+        (7, True),
+        None,
+        None,
+    ]
+    with pytest.raises(ValueError):
+        decoder.decode(data[:32])
+
+
+def test_fixed_layout_encoder():
+    encoder = FixedLayoutEncoder(b"\x12\x34\x56\x78", ["uint256", "uint8"])
+    assert encoder.encode(1, 2) == b"\x12\x34\x56\x78" + eth_abi.encode(
+        ["uint256", "uint8"], [1, 2]
+    )
+
+
+def test_encode_calls_uses_fast_encoder():
+    method = FakeMethod("0x11111111", ["uint256"])
+    calls = encode_calls(method, "0xaddress", [1, "2", 3])
+    assert method.slow_calls == 0
+    expected = [bytes.fromhex(method.encode_input(value)[2:]) for value in [1, 2, 3]]
+    assert [data for _, data in calls] == expected
+
+
+def test_encode_calls_falls_back_for_values_out_of_range():
+    method = FakeMethod("0x22222222", ["uint256"])
+    with pytest.raises(Exception) as error:
+        encode_calls(method, "0xaddress", [1, -1])
+    # The error comes from the slow encoder, not from int.to_bytes.
+    assert not isinstance(error.value, OverflowError)
+    assert method.slow_calls > 0
@@ -0,0 +1,46 @@
+import argparse
+
+from autocorns import dnacache
+from autocorns.dnacache import DNACache, add_dna_cache_arguments, memoized
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--address", default="0xabc")
+    add_dna_cache_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def test_dna_cache_is_off_unless_asked_for(tmp_path, monkeypatch):
+    monkeypatch.setattr(dnacache, "DEFAULT_DNA_CACHE_FILE", None)
+    assert dnacache.dna_cache_from_args(parse([]), "mainnet") is None
+
+    cache_file = str(tmp_path / "dna-cache.sqlite")
+    dna_cache = dnacache.dna_cache_from_args(
+        parse(["--dna-cache", cache_file]), "mainnet"
+    )
+    assert isinstance(dna_cache, DNACache)
+    dna_cache.close()
+
+
+def test_environment_variable_turns_dna_cache_on(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        dnacache, "DEFAULT_DNA_CACHE_FILE", str(tmp_path / "dna-cache.sqlite")
+    )
+    dna_cache = dnacache.dna_cache_from_args(parse([]), "mainnet")
+    assert isinstance(dna_cache, DNACache)
+    dna_cache.close()
+    assert dnacache.dna_cache_from_args(parse(["--no-dna-cache"]), "mainnet") is None
+
+
+def test_memoized_splits_hits_and_misses(tmp_path):
+    dna_cache = DNACache(str(tmp_path / "dna-cache.sqlite"), "mainnet", "0xabc")
+    dna_cache.put_many("getStats", [1, 2], [(2, 3), (4, 5)])
+    dna_cache.put_many("getUnicornBodyParts", [1], [(6,)])
+
+    hits, misses = memoized(dna_cache, ["getStats", "getUnicornBodyParts"], [1, 2, 3])
+    assert hits == {0: ((2, 3), (6,))}
+    assert misses == [1, 2]
+
+    assert memoized(None, ["getStats"], [1, 2]) == ({}, [0, 1])
+    dna_cache.close()
@@ -0,0 +1,195 @@
+import pytest
+
+from autocorns.binsnapshot import STATS_ORDER
+from autocorns.dnadecoder import (
+    BODY_PART_SLOTS,
+    DNA_FIELD_OFFSETS,
+    DNADecoder,
+    GENE_FIELDS,
+    NUM_CLASSES,
+    NUM_GENE_BONUS_SLOTS,
+    NUM_GENE_IDS,
+    NUM_LOCAL_PART_IDS,
+    STAT_IDS,
+    STATS_OUTPUT_IDS,
+    compare_with_contract,
+)
+
+
+def make_dna(**fields):
+    dna = 0
+    for name, value in fields.items():
+        offset, width = DNA_FIELD_OFFSETS[name]
+        assert value < (1 << width)
+        dna |= value << offset
+    return dna
+
+
+def global_part_id(class_id, slot_id, local_id):
+    return class_id * 1000 + slot_id * 100 + local_id + 1
+
+
+def make_tables():
+    part_global_ids = [
+        global_part_id(class_id, slot_id, local_id)
+        for class_id in range(NUM_CLASSES)
+        for slot_id in range(1, len(BODY_PART_SLOTS) + 1)
+        for local_id in range(NUM_LOCAL_PART_IDS)
+    ]
+    # Base stat of a class for a stat: 100 * class + stat ID, in the order of getStats.
+    base_stats = [
+        100 * class_id + stat_id
+        for class_id in range(NUM_CLASSES)
+        for stat_id in STATS_OUTPUT_IDS
+    ]
+    # Gene 1 adds 5 vitality, gene 2 adds 7 magic and 1 attack speed, other genes add nothing.
+    gene_bonuses = [[0, 0]] * (NUM_GENE_IDS * NUM_GENE_BONUS_SLOTS)
+    gene_bonuses[1 * NUM_GENE_BONUS_SLOTS] = [STAT_IDS["vitality"], 5]
+    gene_bonuses[2 * NUM_GENE_BONUS_SLOTS] = [STAT_IDS["magic"], 7]
+    gene_bonuses[2 * NUM_GENE_BONUS_SLOTS + 2] = [STAT_IDS["attack_speed"], 1]
+    return {
+        "part_global_ids": part_global_ids,
+        "mythic_part_ids": [global_part_id(2, 1, 3), global_part_id(2, 6, 4)],
+        "stat_ids": STATS_OUTPUT_IDS,
+        "base_stats": base_stats,
+        "gene_bonuses": gene_bonuses,
+    }
+
+
+def test_stat_ids_follow_get_stats_outputs():
+    assert STATS_ORDER[:3] == ["attack", "accuracy", "movement_speed"]
+    assert STATS_OUTPUT_IDS == [2, 4, 7, 8, 3, 1, 6, 5]
+    assert sorted(STAT_IDS.values()) == list(range(1, 9))
+
+
+def test_decode_body_parts_and_stats():
+    decoder = DNADecoder(make_tables())
+    dna = make_dna(
+        **{"class": 2, "body_part": 3, "tail_part": 4, "horn_part": 9},
+        body_major_gene=1,
+        face_minor_gene=1,
+        tail_mid_gene=2,
+    )
+    body_parts, stats, decodable = decoder.decode([dna])
+    assert decodable.tolist() == [True]
+    assert body_parts[0].tolist() == [
+        global_part_id(2, 1, 3),
+        global_part_id(2, 2, 0),
+        global_part_id(2, 3, 9),
+        global_part_id(2, 4, 0),
+        global_part_id(2, 5, 0),
+        global_part_id(2, 6, 4),
+        2,
+    ]
+    named_stats = dict(zip(STATS_ORDER, stats[0].tolist()))
+    assert named_stats == {
+        "attack": 200 + STAT_IDS["attack"],
+        "accuracy": 200 + STAT_IDS["accuracy"],
+        "movement_speed": 200 + STAT_IDS["movement_speed"],
+        "attack_speed": 200 + STAT_IDS["attack_speed"] + 1,
+        "defense": 200 + STAT_IDS["defense"],
+        "vitality": 200 + STAT_IDS["vitality"] + 10,
+        "resistance": 200 + STAT_IDS["resistance"],
+        "magic": 200 + STAT_IDS["magic"] + 7,
+    }
+
+
+def test_decode_marks_missing_body_parts():
+    tables = make_tables()
+    tables["part_global_ids"][0] = 0
+    decoder = DNADecoder(tables)
+    _, _, decodable = decoder.decode(
+        [make_dna(**{"class": 0}), make_dna(**{"class": 1})]
+    )
+    assert decodable.tolist() == [False, True]
+
+
+def test_decode_items_skips_missing_dnas():
+    decoder = DNADecoder(make_tables())
+    dna = make_dna(**{"class": 1})
+    results = decoder.decode_items(
+        [{"token_id": 1, "dna": str(dna)}, {"token_id": 2, "dna": "None"}]
+    )
+    assert results[1] is None
+    body_parts, stats = results[0]
+    assert body_parts[0] == global_part_id(1, 1, 0)
+    assert stats[STATS_ORDER.index("vitality")] == 100 + STAT_IDS["vitality"]
+
+
+def test_tables_with_another_stat_layout_are_rejected():
+    tables = make_tables()
+    tables["stat_ids"] = sorted(STATS_OUTPUT_IDS)
+    with pytest.raises(AssertionError):
+        DNADecoder(tables)
+
+
+def contract_record(token_id, dna, decoder):
+    """
+    What the contract would return for a token, if it agreed with the decoder.
+    """
+    body_parts, stats, _ = decoder.decode([dna])
+    local_parts = [
+        (dna >> DNA_FIELD_OFFSETS[f"{slot}_part"][0]) & (NUM_LOCAL_PART_IDS - 1)
+        for slot in BODY_PART_SLOTS
+    ]
+    class_offset, class_width = DNA_FIELD_OFFSETS["class"]
+    return {
+        "token_id": token_id,
+        "crawled_dna": str(dna),
+        "dna": dna,
+        "metadata": (
+            False,
+            False,
+            False,
+            0,
+            0,
+            (dna >> class_offset) & ((1 << class_width) - 1),
+            1234,
+        ),
+        "local_parts": tuple(local_parts),
+        "body_parts": tuple(body_parts[0].tolist()),
+        "stats": tuple(stats[0].tolist()),
+    }
+
+
+def test_compare_with_contract_reports_mismatches_by_name():
+    decoder = DNADecoder(make_tables())
+    dnas = [make_dna(**{"class": class_id, "mane_part": 5}) for class_id in range(4)]
+    records = [
+        contract_record(token_id, dna, decoder) for token_id, dna in enumerate(dnas)
+    ]
+
+    report = compare_with_contract(decoder, records)
+    assert report["compared"] == 4
+    assert report["mismatched"] == 0
+    assert report["stale"] == 0
+    assert report["examples"] == []
+
+    stats = list(records[1]["stats"])
+    stats[STATS_ORDER.index("magic")] += 1
+    records[1]["stats"] = tuple(stats)
+    metadata = list(records[2]["metadata"])
+    metadata[5] = 9
+    records[2]["metadata"] = tuple(metadata)
+    records[3]["crawled_dna"] = str(dnas[3] + 1)
+
+    report = compare_with_contract(decoder, records)
+    assert report["mismatched"] == 2
+    assert report["stale"] == 1
+    assert report["mismatches_by_output"]["magic"] == 1
+    assert report["mismatches_by_output"]["class"] == 1
+    assert report["mismatches_by_output"]["vitality"] == 0
+    assert [example["token_id"] for example in report["examples"]] == [1, 2]
+    assert report["examples"][0]["mismatches"] == {
+        "magic": {"on_chain": stats[STATS_ORDER.index("magic")], "decoded": 105}
+    }
+
+
+def test_compare_with_contract_without_records():
+    report = compare_with_contract(DNADecoder(make_tables()), [])
+    assert report["compared"] == 0
+    assert report["mismatched"] == 0
+
+
+def test_gene_fields_cover_every_slot():
+    assert len(GENE_FIELDS) == 3 * len(BODY_PART_SLOTS)
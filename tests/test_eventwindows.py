@@ -0,0 +1,128 @@
+import asyncio
+import io
+import json
+import time
+
+import pytest
+
+from autocorns import jsonl
+from autocorns.eventwindows import (
+    fetch_windows,
+    time_windows,
+    WindowCache,
+    write_merged_results,
+)
+
+
+def test_time_windows_are_aligned():
+    assert time_windows(5, 34, 10) == [(5, 9), (10, 19), (20, 29), (30, 34)]
+    assert time_windows(10, 19, 10) == [(10, 19)]
+    assert time_windows(7, 7, 10) == [(7, 7)]
+
+
+def test_time_windows_cover_the_range():
+    windows = time_windows(123, 98765, 1000)
+    assert windows[0][0] == 123
+    assert windows[-1][1] == 98765
+    for (_, end), (start, _) in zip(windows, windows[1:]):
+        assert start == end + 1
+        assert start % 1000 == 0
+
+
+def test_time_windows_validate_arguments():
+    with pytest.raises(AssertionError):
+        time_windows(10, 5, 10)
+    with pytest.raises(AssertionError):
+        time_windows(0, 5, 0)
+
+
+def test_window_cache(tmp_path, monkeypatch):
+    cache = WindowCache(str(tmp_path))
+    params = {"season": 3, "address": "0xabc"}
+    assert cache.get("https://api", "events", params, (0, 9)) is None
+    cache.put("https://api", "events", params, (0, 9), b'{"data":[]}')
+    assert cache.get("https://api", "events", params, (0, 9)) == b'{"data":[]}'
+    assert cache.get("https://api", "events", params, (10, 19)) is None
+    assert cache.get("https://other", "events", params, (0, 9)) is None
+    assert cache.get("https://api", "events", {"season": 4}, (0, 9)) is None
+
+    # The same parameters map to the same file whatever their order and JSON codec.
+    path = cache.path("https://api", "events", params, (0, 9))
+    reordered = {"address": "0xabc", "season": 3}
+    monkeypatch.setattr(jsonl, "orjson", None)
+    assert cache.path("https://api", "events", reordered, (0, 9)) == path
+
+
+def test_write_merged_results():
+    contents = [
+        json.dumps({"data": [{"a": 1}, {"a": 2}], "block_number": 1}).encode(),
+        json.dumps({"data": [], "block_number": 2}).encode(),
+        json.dumps({"data": [{"a": 3, "big": 2**70}], "block_number": 3}).encode(),
+    ]
+    ofp = io.StringIO()
+    assert write_merged_results(contents, ofp) == 3
+    assert json.loads(ofp.getvalue()) == {
+        "data": [{"a": 1}, {"a": 2}, {"a": 3, "big": 2**70}],
+        "block_number": 3,
+    }
+
+
+def test_write_merged_results_without_windows():
+    ofp = io.StringIO()
+    assert write_merged_results([], ofp) == 0
+    assert json.loads(ofp.getvalue()) == {"data": []}
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeClient:
+    api_url = "https://api"
+
+    def __init__(self):
+        self.fetched = []
+
+    async def fetch(self, query_name, params, **kwargs):
+        self.fetched.append((params["start_timestamp"], params["end_timestamp"]))
+        return FakeResponse(
+            json.dumps({"data": [params["start_timestamp"]]}).encode("utf-8")
+        )
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_fetch_windows_caches_closed_windows(tmp_path):
+    now = int(time.time())
+    windows = time_windows(now - 3000, now, 1000)
+    cache = WindowCache(str(tmp_path))
+    client = FakeClient()
+
+    contents, summary = run(
+        fetch_windows(client, "events", {}, windows, cache, finality_seconds=1000)
+    )
+    assert [json.loads(content)["data"] for content in contents] == [
+        [start] for start, _ in windows
+    ]
+    assert summary["cached_windows"] == 0
+    assert sorted(client.fetched) == windows
+
+    client = FakeClient()
+    contents, summary = run(
+        fetch_windows(client, "events", {}, windows, cache, finality_seconds=1000)
+    )
+    closed = [window for window in windows if window[1] < now - 1000]
+    assert summary["cached_windows"] == len(closed)
+    assert sorted(client.fetched) == [
+        window for window in windows if window not in closed
+    ]
+    assert [json.loads(content)["data"] for content in contents] == [
+        [start] for start, _ in windows
+    ]
@@ -0,0 +1,149 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from autocorns import jsonl
+from autocorns.jsonl import (
+    dumps,
+    iter_json_array,
+    iter_jsonl,
+    loads,
+    StreamDecoder,
+    write_jsonl,
+)
+
+
+@pytest.fixture(params=["default", "json"])
+def codec(request, monkeypatch):
+    """
+    Runs a test with the installed codec and with the json module alone.
+    """
+    if request.param == "json":
+        monkeypatch.setattr(jsonl, "orjson", None)
+    return request.param
+
+
+def test_round_trip(codec):
+    obj = {"token_id": 12, "dna": "1" * 70, "stats": [1, 2], "ok": True, "x": None}
+    assert loads(dumps(obj)) == obj
+    assert loads(dumps(obj).encode("utf-8")) == obj
+    assert json.loads(dumps(obj, indent=True)) == obj
+
+
+def test_stdlib_output_matches_json_dumps(monkeypatch):
+    monkeypatch.setattr(jsonl, "orjson", None)
+    obj = {"a": [1, 2, {"b": "c"}], "d": 1.5}
+    assert dumps(obj) == json.dumps(obj)
+    assert dumps(obj, indent=True) == json.dumps(obj, indent=2)
+
+
+def test_big_integers(codec):
+    obj = {"a": 2**70, "b": [-(2**64), 1.5], "c": 1}
+    encoded = dumps(obj)
+    assert json.loads(encoded) == obj
+    decoded = loads(encoded)
+    assert decoded == obj
+    assert isinstance(decoded["a"], int)
+
+
+def test_numpy_values(codec):
+    obj = {
+        "a": np.uint64(5),
+        "b": 2**70,
+        "c": np.float32(1.5),
+        "d": np.arange(3),
+        "e": np.bool_(True),
+    }
+    assert loads(dumps(obj)) == {
+        "a": 5,
+        "b": 2**70,
+        "c": 1.5,
+        "d": [0, 1, 2],
+        "e": True,
+    }
+
+
+def test_unknown_types_raise_type_error(codec):
+    with pytest.raises(TypeError):
+        dumps({"a": object()})
+    with pytest.raises(TypeError):
+        dumps({"a": object(), "b": 2**70})
+
+
+def test_jsonl_round_trip(codec, tmp_path):
+    items = [
+        {"token_id": token_id, "dna": str(2**200 + token_id)} for token_id in range(5)
+    ]
+    path = tmp_path / "items.json"
+    with open(path, "w") as ofp:
+        write_jsonl(items, ofp, batch_size=2)
+        ofp.write("\n")
+    assert list(iter_jsonl(str(path))) == items
+
+
+def decode_all(text, chunk_size):
+    decoder = StreamDecoder(io.StringIO(text), chunk_size)
+    values = []
+    while decoder.peek():
+        values.append(decoder.value())
+    return values
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_stream_decoder_across_chunk_boundaries(chunk_size):
+    text = ' 12  -3e10 1.25 "a\\"b" [1, {"c": 2}] true null 123456789012345678901234567890 '
+    assert decode_all(text, chunk_size) == [
+        12,
+        -3e10,
+        1.25,
+        'a"b',
+        [1, {"c": 2}],
+        True,
+        None,
+        123456789012345678901234567890,
+    ]
+
+
+def test_stream_decoder_rejects_invalid_json():
+    with pytest.raises(json.JSONDecodeError):
+        decode_all("[1, 2", 2)
+    decoder = StreamDecoder(io.StringIO("[1]"), 2)
+    with pytest.raises(json.JSONDecodeError):
+        decoder.expect("{")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 1 << 16])
+def test_iter_json_array(tmp_path, chunk_size):
+    data = [
+        {"event_type": "x", "block_number": i, "points": 2**70 + i} for i in range(20)
+    ]
+    path = tmp_path / "results.json"
+    with open(path, "w") as ofp:
+        json.dump({"meta": {"data": [1]}, "data": data, "block_number": 5}, ofp)
+    assert list(iter_json_array(str(path), chunk_size=chunk_size)) == data
+
+
+def test_iter_json_array_empty(tmp_path):
+    path = tmp_path / "results.json"
+    with open(path, "w") as ofp:
+        json.dump({"data": []}, ofp)
+    assert list(iter_json_array(str(path))) == []
+
+
+@pytest.mark.parametrize("document", [{}, {"other": [1, 2]}])
+def test_iter_json_array_without_key(tmp_path, document):
+    path = tmp_path / "results.json"
+    with open(path, "w") as ofp:
+        json.dump(document, ofp)
+    with pytest.raises(KeyError):
+        list(iter_json_array(str(path)))
+
+
+@pytest.mark.parametrize("text", ['{"data": [1, 2]', '{"data": {"a": 1}}', "[1, 2]"])
+def test_iter_json_array_rejects_invalid_documents(tmp_path, text):
+    path = tmp_path / "results.json"
+    path.write_text(text)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(str(path), chunk_size=4))
@@ -0,0 +1,144 @@
+import pytest
+
+from autocorns.logscan import (
+    checkpoint_start_block,
+    event_topic,
+    expire_changed_checkpoint_data,
+    iter_logs,
+    log_token_ids,
+)
+
+
+def test_checkpoint_start_block():
+    assert checkpoint_start_block([]) is None
+    assert (
+        checkpoint_start_block(
+            [{"token_id": 1, "block_number": 20}],
+            [{"token_id": 2, "block_number": 10}, {"token_id": 3}],
+        )
+        == 11
+    )
+
+
+def test_checkpoint_start_block_without_block_numbers():
+    assert checkpoint_start_block([{"token_id": 1}, {"token_id": 2}]) is None
+    assert checkpoint_start_block([{"token_id": 1, "block_number": None}]) is None
+
+
+def test_expire_changed_checkpoint_data():
+    checkpoint = [
+        {"token_id": 1, "block_number": 10},
+        {"token_id": 2, "block_number": 10},
+        {"token_id": 3, "block_number": 10},
+    ]
+    assert expire_changed_checkpoint_data(checkpoint, {1: 11, 2: 10}) == [
+        {"token_id": 2, "block_number": 10},
+        {"token_id": 3, "block_number": 10},
+    ]
+
+
+def word(value):
+    return format(value, "064x")
+
+
+def make_log(signature, topics=(), data=(), block_number=0):
+    return {
+        "topics": ["0x" + event_topic(signature)] + ["0x" + word(t) for t in topics],
+        "data": "0x" + "".join(word(d) for d in data),
+        "blockNumber": block_number,
+    }
+
+
+def test_log_token_ids_reads_topics_and_data_words():
+    assert log_token_ids(
+        make_log("Transfer(address,address,uint256)", [0xA, 0xB, 42])
+    ) == [42]
+    assert log_token_ids(
+        make_log("UnicornEggCreated(uint256,uint256,uint256,address)", [7], [5, 6, 0xC])
+    ) == [5, 6, 7]
+    assert log_token_ids(
+        make_log(
+            "UnicornUnlockedOutOfGameForcefully(uint256,uint256,address)", [], [1, 9]
+        )
+    ) == [9]
+
+
+def test_log_token_ids_skips_short_data_and_missing_topics():
+    # Only the first of the two parent IDs fits in the data.
+    assert log_token_ids(
+        make_log("UnicornEggCreated(uint256,uint256,uint256,address)", [7], [5])
+    ) == [5, 7]
+    assert log_token_ids(make_log("BreedingStarted(uint256,uint256,address)", [3])) == [
+        3
+    ]
+
+
+def test_log_token_ids_ignores_unknown_events():
+    assert log_token_ids(make_log("Approval(address,address,uint256)", [1, 2, 3])) == []
+    assert log_token_ids({"topics": [], "data": "0x"}) == []
+
+
+class FakeGetLogs:
+    """
+    Stands in for web3.eth.get_logs. Returns logs_per_block(block) logs for each block in the
+    range of a filter, and raises ValueError for ranges of more than max_range blocks and for
+    ranges that include a failing block.
+    """
+
+    def __init__(self, logs_per_block=lambda block: 0, max_range=None, failing=()):
+        self.logs_per_block = logs_per_block
+        self.max_range = max_range
+        self.failing = set(failing)
+        self.ranges = []
+
+    def __call__(self, log_filter):
+        start, end = log_filter["fromBlock"], log_filter["toBlock"]
+        self.ranges.append((start, end))
+        if self.max_range is not None and end - start + 1 > self.max_range:
+            raise ValueError("query returned more than 10000 results")
+        if any(start <= block <= end for block in self.failing):
+            raise ValueError("internal error")
+        return [
+            {"blockNumber": block}
+            for block in range(start, end + 1)
+            for _ in range(self.logs_per_block(block))
+        ]
+
+
+def test_iter_logs_halves_failing_ranges():
+    get_logs = FakeGetLogs(max_range=100)
+    batches = list(iter_logs(get_logs, "0x0", [], 0, 399, initial_range=1000))
+    # Failures halve the range until it fits, and successes grow it back.
+    assert get_logs.ranges[:7] == [
+        (0, 399),
+        (0, 399),
+        (0, 249),
+        (0, 124),
+        (0, 61),
+        (62, 185),
+        (62, 123),
+    ]
+    assert len(batches) == 6
+    succeeded = [(start, end) for start, end in get_logs.ranges if end - start < 100]
+    assert succeeded[0][0] == 0
+    assert succeeded[-1][1] == 399
+    assert all(a[1] + 1 == b[0] for a, b in zip(succeeded, succeeded[1:]))
+
+
+def test_iter_logs_sizes_ranges_around_target(monkeypatch):
+    monkeypatch.setattr("autocorns.logscan.TARGET_LOGS_PER_REQUEST", 10)
+    # 1 log per block up to block 19, then 4 logs per block.
+    get_logs = FakeGetLogs(logs_per_block=lambda block: 1 if block < 20 else 4)
+    batches = list(iter_logs(get_logs, "0x0", [], 0, 35, initial_range=4))
+    assert [end - start + 1 for start, end in get_logs.ranges] == [4, 8, 8, 8, 4, 2, 2]
+    assert [len(logs) for logs in batches] == [4, 8, 8, 32, 16, 8, 8]
+
+
+def test_iter_logs_raises_after_retry_attempts(monkeypatch):
+    monkeypatch.setattr("autocorns.logscan.time.sleep", lambda seconds: None)
+    get_logs = FakeGetLogs(failing=[5])
+    logs = iter_logs(get_logs, "0x0", [], 0, 9, initial_range=8, retry_attempts=3)
+    with pytest.raises(ValueError):
+        list(logs)
+    assert get_logs.ranges.count((5, 5)) == 3
+    assert (4, 4) in get_logs.ranges
@@ -0,0 +1,227 @@
+import json
+import time
+
+import pytest
+
+from autocorns.multicall import (
+    ChunkSizer,
+    crawl_calls,
+    MulticallSettings,
+    RetryBudgetExhausted,
+    RetryPolicy,
+)
+
+KEY = "matic:getDNA"
+
+
+def test_chunk_sizer_starts_from_default_within_bounds():
+    sizer = ChunkSizer(min_size=10, max_size=100)
+    assert sizer.size(KEY, 50) == 50
+    assert sizer.size("matic:other", 1000) == 100
+    assert sizer.size("matic:another", 1) == 10
+
+
+def test_chunk_sizer_grows_on_fast_full_chunks():
+    sizer = ChunkSizer(min_size=1, max_size=1000, growth_factor=2)
+    assert sizer.size(KEY, 100) == 100
+    sizer.success(KEY, 100, 1.0)
+    assert sizer.size(KEY, 100) == 200
+    # Chunks smaller than the current size say nothing about larger ones.
+    sizer.success(KEY, 50, 1.0)
+    assert sizer.size(KEY, 100) == 200
+    for _ in range(10):
+        sizer.success(KEY, sizer.size(KEY, 100), 1.0)
+    assert sizer.size(KEY, 100) == 1000
+
+
+def test_chunk_sizer_grows_small_sizes():
+    sizer = ChunkSizer(min_size=1, max_size=1000, growth_factor=1.25)
+    sizer.size(KEY, 1)
+    sizer.success(KEY, 1, 0.1)
+    assert sizer.size(KEY, 1) == 2
+
+
+def test_chunk_sizer_shrinks_on_failures():
+    sizer = ChunkSizer(min_size=10, max_size=1000, failure_factor=0.5)
+    sizer.size(KEY, 400)
+    sizer.failure(KEY, 400)
+    assert sizer.size(KEY, 400) == 200
+    # A smaller chunk failing shrinks the size below that chunk.
+    sizer.failure(KEY, 100)
+    assert sizer.size(KEY, 400) == 50
+    for _ in range(10):
+        sizer.failure(KEY, sizer.size(KEY, 400))
+    assert sizer.size(KEY, 400) == 10
+
+
+def test_chunk_sizer_shrinks_on_latency_spikes():
+    sizer = ChunkSizer(
+        min_size=1,
+        max_size=1000,
+        spike_factor=0.5,
+        spike_threshold=2.0,
+        target_latency=10.0,
+    )
+    sizer.size(KEY, 100)
+    sizer.success(KEY, 50, 1.0)
+    assert sizer.size(KEY, 100) == 100
+    sizer.success(KEY, 50, 3.0)
+    assert sizer.size(KEY, 100) == 50
+    sizer.success(KEY, 10, 11.0)
+    assert sizer.size(KEY, 100) == 25
+
+
+def test_chunk_sizer_state_file(tmp_path):
+    state_file = str(tmp_path / "state" / "chunk-sizes.json")
+    sizer = ChunkSizer(state_file, min_size=1, max_size=1000, growth_factor=2)
+    sizer.size(KEY, 100)
+    sizer.success(KEY, 100, 1.0)
+    sizer.save()
+    with open(state_file) as ifp:
+        assert json.load(ifp)[KEY]["chunk_size"] == 200
+
+    assert ChunkSizer(state_file).size(KEY, 100) == 200
+
+
+def test_chunk_sizer_validates_bounds():
+    with pytest.raises(AssertionError):
+        ChunkSizer(min_size=10, max_size=5)
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0, jitter=0.5)
+    for attempt, full_delay in [(0, 1.0), (1, 2.0), (2, 4.0), (3, 5.0), (10, 5.0)]:
+        for _ in range(20):
+            assert full_delay / 2 <= policy.delay(attempt) <= full_delay
+    assert RetryPolicy(base_delay=1.0, jitter=0).delay(2) == 4.0
+
+
+def test_retry_policy_budget():
+    policy = RetryPolicy(budget=2)
+    policy.spend("first")
+    policy.spend("second")
+    with pytest.raises(RetryBudgetExhausted):
+        policy.spend("third")
+
+
+class FakeMulticall:
+    """
+    Stands in for Multicall2.tryAggregate. Calls are (address, input) pairs, and a multicall that
+    includes an input in failing raises a ValueError, as a provider error would.
+    """
+
+    def __init__(self, failing=(), failures_left=None):
+        self.failing = set(failing)
+        self.failures_left = failures_left
+        self.calls = []
+
+    def call(self, require_success, calls, block_identifier=None):
+        inputs = [data for _, data in calls]
+        self.calls.append(inputs)
+        if self.failing.intersection(inputs):
+            if self.failures_left is None:
+                raise ValueError("execution reverted")
+            if self.failures_left > 0:
+                self.failures_left -= 1
+                raise ValueError("timeout")
+        return [(True, 2 * data) for data in inputs]
+
+
+def crawl(multicall, inputs, chunk_size, settings):
+    return crawl_calls(
+        multicall,
+        lambda inputs_chunk: [("0xaddress", data) for data in inputs_chunk],
+        lambda result: [data for _, data in result],
+        KEY,
+        inputs,
+        chunk_size,
+        settings=settings,
+    )
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr("autocorns.multicall.time.sleep", lambda seconds: None)
+
+
+def test_crawl_retries_transient_failures(no_sleep):
+    multicall = FakeMulticall(failing=[3], failures_left=2)
+    results, failures = crawl(
+        multicall, list(range(8)), 4, MulticallSettings(retry_attempts=3)
+    )
+    assert results == [2 * i for i in range(8)]
+    assert failures == {}
+    assert len(multicall.calls) == 4
+
+
+def test_crawl_bisects_failing_chunks(no_sleep):
+    multicall = FakeMulticall(failing=[5])
+    results, failures = crawl(
+        multicall, list(range(8)), 8, MulticallSettings(retry_attempts=2)
+    )
+    assert results == [0, 2, 4, 6, 8, None, 12, 14]
+    assert list(failures) == [5]
+    assert "execution reverted" in failures[5]
+
+
+def test_crawl_stops_when_retry_budget_is_spent(no_sleep):
+    multicall = FakeMulticall(failing=range(100))
+    with pytest.raises(RetryBudgetExhausted):
+        crawl(
+            multicall,
+            list(range(100)),
+            10,
+            MulticallSettings(retry_attempts=3, retry_budget=5),
+        )
+
+
+class RecordingChunkSizer:
+    """
+    Stands in for a ChunkSizer. Keeps the default chunk size and records the latency each
+    successful chunk is credited with.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+
+    def size(self, key, default):
+        return default
+
+    def success(self, key, size, latency):
+        self.latencies[size] = latency
+
+    def failure(self, key, size):
+        pass
+
+    def save(self):
+        pass
+
+
+class SlowBatchTransport:
+    """
+    Stands in for a JSONRPCBatchTransport that takes delay seconds to answer each batch request.
+    """
+
+    batch_size = 2
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def try_aggregate(self, multicall_address, batches, block_number="latest"):
+        time.sleep(self.delay)
+        return [[(True, 2 * data) for _, data in calls] for calls in batches]
+
+
+def test_chunks_of_a_batch_share_its_latency():
+    multicall = FakeMulticall()
+    multicall._address = "0xmulticall"
+    chunk_sizer = RecordingChunkSizer()
+    settings = MulticallSettings(
+        chunk_sizer=chunk_sizer, transport=SlowBatchTransport(0.2)
+    )
+    # A chunk of 4 inputs and one of 2, sent in the same batch request.
+    results, failures = crawl(multicall, list(range(6)), 4, settings)
+    assert results == [2 * i for i in range(6)]
+    assert multicall.calls == []
+    assert chunk_sizer.latencies[4] == 2 * chunk_sizer.latencies[2]
+    assert chunk_sizer.latencies[4] + chunk_sizer.latencies[2] >= 0.2
@@ -0,0 +1,144 @@
+import random
+import time
+
+import pytest
+
+from autocorns.jsonrpc import JSONRPCError
+from autocorns.rpcpool import EndpointPool, MIN_HEDGE_SAMPLES
+
+URIS = ["http://a.invalid", "http://b.invalid", "http://c.invalid"]
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTransport:
+    """
+    Stands in for a JSONRPCBatchTransport. Answers every batch with a single successful call, or
+    raises JSONRPCError if it is failing.
+    """
+
+    def __init__(self, endpoint_uri, failing=False, delay=0.0):
+        self.endpoint_uri = endpoint_uri
+        self.failing = failing
+        self.delay = delay
+        self.requests = 0
+        self.session = FakeSession()
+
+    def try_aggregate(self, multicall_address, batches, block_number="latest"):
+        self.requests += 1
+        time.sleep(self.delay)
+        if self.failing:
+            raise JSONRPCError(f"{self.endpoint_uri} is down")
+        return [[(True, self.endpoint_uri.encode())] for _ in batches]
+
+
+@pytest.fixture
+def pool():
+    pool = EndpointPool(URIS, eject_after=2, eject_seconds=60, hedge_percentile=1)
+    for endpoint in pool.endpoints:
+        endpoint.transport = FakeTransport(endpoint.endpoint_uri)
+    yield pool
+    pool.close()
+
+
+def test_choose_favours_fast_healthy_endpoints(pool):
+    fast, slow, flaky = pool.endpoints
+    fast.latency = 0.1
+    slow.latency = 1.0
+    flaky.latency = 0.1
+    flaky.error_rate = 1.0
+    random.seed(0)
+    counts = {endpoint.endpoint_uri: 0 for endpoint in pool.endpoints}
+    for _ in range(2000):
+        counts[pool.choose().endpoint_uri] += 1
+    assert counts[fast.endpoint_uri] > counts[flaky.endpoint_uri]
+    assert counts[flaky.endpoint_uri] > counts[slow.endpoint_uri]
+
+
+def test_choose_excludes_endpoint(pool):
+    first = pool.endpoints[0]
+    for _ in range(50):
+        assert pool.choose(exclude=first) is not first
+    single = EndpointPool(URIS[:1])
+    assert single.choose(exclude=single.endpoints[0]) is None
+    single.executor.shutdown()
+
+
+def test_endpoints_are_ejected_after_consecutive_failures(pool):
+    endpoint = pool.endpoints[0]
+    pool.record(endpoint, 0.1, True)
+    pool.record(endpoint, 0.1, False)
+    pool.record(endpoint, 0.1, True)
+    assert endpoint.ejected_until == 0
+    pool.record(endpoint, 0.1, True)
+    assert endpoint.ejected_until > time.monotonic()
+    for _ in range(50):
+        assert pool.choose() is not endpoint
+
+
+def test_choose_when_every_endpoint_is_ejected(pool):
+    now = time.monotonic()
+    for offset, endpoint in zip([30, 10, 20], pool.endpoints):
+        endpoint.ejected_until = now + offset
+    assert pool.choose() is pool.endpoints[1]
+
+
+def test_try_aggregate_moves_to_another_endpoint_on_failure(pool):
+    down, up, _ = pool.endpoints
+    down.transport.failing = True
+    pool.endpoints = [down, up]
+    random.seed(1)
+    for _ in range(5):
+        assert pool.try_aggregate("0xmulticall", [[("0xa", b"")]]) == [
+            [(True, up.endpoint_uri.encode())]
+        ]
+    assert down.transport.requests >= 1
+
+
+def test_try_aggregate_raises_when_every_endpoint_fails(pool):
+    for endpoint in pool.endpoints:
+        endpoint.transport.failing = True
+    with pytest.raises(JSONRPCError):
+        pool.try_aggregate("0xmulticall", [[("0xa", b"")]])
+
+
+def test_hedge_after():
+    pool = EndpointPool(URIS[:2], hedge_percentile=0.5)
+    assert pool.hedge_after() is None
+    for latency in range(MIN_HEDGE_SAMPLES + 1):
+        pool.record(pool.endpoints[0], float(latency), False)
+    assert pool.hedge_after() == MIN_HEDGE_SAMPLES / 2
+    pool.close()
+
+
+def test_slow_requests_are_hedged():
+    pool = EndpointPool(URIS[:2], hedge_percentile=0.5)
+    slow, fast = pool.endpoints
+    slow.transport = FakeTransport(slow.endpoint_uri, delay=0.5)
+    fast.transport = FakeTransport(fast.endpoint_uri)
+    for _ in range(MIN_HEDGE_SAMPLES):
+        pool.record(fast, 0.01, False)
+    # The slow endpoint looks like the better one, so requests go to it first.
+    slow.latency = 0.001
+    fast.latency = 1000.0
+    started_at = time.monotonic()
+    assert pool.try_aggregate("0xmulticall", [[("0xa", b"")]]) == [
+        [(True, fast.endpoint_uri.encode())]
+    ]
+    assert time.monotonic() - started_at < 0.4
+    assert slow.transport.requests == 1
+    pool.close()
+
+
+def test_close_shuts_down_threads_and_sessions(pool):
+    pool.try_aggregate("0xmulticall", [[("0xa", b"")]])
+    pool.close()
+    assert all(endpoint.transport.session.closed for endpoint in pool.endpoints)
+    with pytest.raises(RuntimeError):
+        pool.try_aggregate("0xmulticall", [[("0xa", b"")]])
@@ -0,0 +1,111 @@
+import argparse
+
+import pytest
+
+from autocorns.tokenbitmap import (
+    load_token_bitmap,
+    save_token_bitmap,
+    TokenBitmap,
+    TRANSFER_TOPIC,
+    ZERO_TOPIC,
+)
+
+ADDRESS = "0xdC0479CC5BbA033B3e7De9F178607150B3AbCe1f"
+OTHER_ADDRESS = "0x0000000000000000000000000000000000000001"
+WALLET_TOPIC = "0" * 24 + "ab" * 20
+
+
+def transfer_log(block_number, log_index, from_topic, to_topic, token_id):
+    return {
+        "blockNumber": block_number,
+        "logIndex": log_index,
+        "topics": [
+            "0x" + TRANSFER_TOPIC,
+            "0x" + from_topic,
+            "0x" + to_topic,
+            "0x" + format(token_id, "064x"),
+        ],
+    }
+
+
+def test_apply_transfer_logs():
+    bitmap = TokenBitmap(ADDRESS)
+    bitmap.apply_transfer_logs(
+        [
+            # Logs are applied in block order, whatever order they come in.
+            transfer_log(12, 0, WALLET_TOPIC, ZERO_TOPIC, 3),
+            transfer_log(10, 0, ZERO_TOPIC, WALLET_TOPIC, 3),
+            transfer_log(10, 1, ZERO_TOPIC, WALLET_TOPIC, 20),
+            transfer_log(11, 0, ZERO_TOPIC, WALLET_TOPIC, 5),
+            transfer_log(11, 1, WALLET_TOPIC, WALLET_TOPIC, 7),
+        ]
+    )
+    assert bitmap.token_ids() == [5, 20]
+    assert bitmap.total_supply() == 2
+    assert bitmap.max_token_id == 20
+    assert 3 not in bitmap
+    assert 7 not in bitmap
+    assert 1000 not in bitmap
+    assert bitmap.existing([20, 3, 5, 6]) == [20, 5]
+
+
+def test_erc20_transfers_are_ignored():
+    bitmap = TokenBitmap(ADDRESS)
+    log = transfer_log(10, 0, ZERO_TOPIC, WALLET_TOPIC, 3)
+    log["topics"] = log["topics"][:3]
+    bitmap.apply_transfer_logs([log])
+    assert bitmap.total_supply() == 0
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "tokens.bitmap")
+    bitmap = TokenBitmap(ADDRESS, block_number=100)
+    for token_id in [1, 8, 9, 100]:
+        bitmap.set(token_id, True)
+    bitmap.set(100, False)
+    save_token_bitmap(path, bitmap)
+
+    loaded = load_token_bitmap(path, ADDRESS.lower())
+    assert loaded.summary() == {
+        "address": ADDRESS,
+        "block_number": 100,
+        "total_supply": 3,
+        "max_token_id": 100,
+    }
+    assert loaded.token_ids() == [1, 8, 9]
+
+
+def test_load_missing_file_starts_empty_bitmap(tmp_path):
+    bitmap = load_token_bitmap(str(tmp_path / "missing.bitmap"), ADDRESS)
+    assert bitmap.block_number == -1
+    assert bitmap.total_supply() == 0
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = str(tmp_path / "tokens.bitmap")
+    save_token_bitmap(path, TokenBitmap(ADDRESS))
+    with pytest.raises(ValueError):
+        load_token_bitmap(path, OTHER_ADDRESS)
+
+    not_a_bitmap = tmp_path / "not.bitmap"
+    not_a_bitmap.write_bytes(b"\x00" * 100)
+    with pytest.raises(ValueError):
+        load_token_bitmap(str(not_a_bitmap), ADDRESS)
+
+
+def test_total_supply_requires_existing_bitmap(tmp_path, capsys):
+    from autocorns.biologist import handle_total_supply
+
+    args = argparse.Namespace(
+        token_bitmap=str(tmp_path / "missing.bitmap"),
+        address=ADDRESS,
+        max_token_id=False,
+    )
+    with pytest.raises(SystemExit) as exit:
+        handle_total_supply(args)
+    assert exit.value.code == 1
+    assert "does not exist" in capsys.readouterr().err
+
+    save_token_bitmap(args.token_bitmap, TokenBitmap(ADDRESS, block_number=1))
+    handle_total_supply(args)
+    assert capsys.readouterr().out == "0\n"